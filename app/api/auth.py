@@ -5,7 +5,11 @@ from datetime import timedelta
 from app.database import get_db
 from app.schemas.user import User, UserCreate, UserLogin, Token, AuthResponse
 from app.crud import user as crud_user
-from app.auth import create_access_token, get_current_user, ACCESS_TOKEN_EXPIRE_MINUTES
+from app.auth import (
+    create_access_token, decode_token, get_current_user,
+    oauth2_scheme, ACCESS_TOKEN_EXPIRE_MINUTES
+)
+from app.services.revocation import revocation_list
 
 router = APIRouter(
     prefix="/auth",
@@ -133,12 +137,19 @@ async def get_me(current_user: User = Depends(get_current_user)):
 
 
 @router.post("/refresh", response_model=Token)
-async def refresh_token(current_user: User = Depends(get_current_user)):
+def refresh_token(
+    token: str = Depends(oauth2_scheme),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
     """
     Обновить access token
     
-    Требует валидный access token в заголовке Authorization
+    Требует валидный access token в заголовке Authorization.
+    Предыдущий токен отзывается.
     """
+    revocation_list.revoke_token(db, decode_token(token))
+    
     # Создаем новый токен доступа
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
@@ -147,3 +158,34 @@ async def refresh_token(current_user: User = Depends(get_current_user)):
     )
     
     return Token(access_token=access_token, token_type="bearer")
+
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+def logout(
+    token: str = Depends(oauth2_scheme),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Выйти из системы: отозвать текущий access token
+    """
+    if not revocation_list.revoke_token(db, decode_token(token)):
+        # Старый токен без jti - отзываем все токены пользователя
+        revocation_list.revoke_user(
+            db, current_user.id, timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+        )
+    return None
+
+
+@router.post("/logout/all", status_code=status.HTTP_204_NO_CONTENT)
+def logout_all(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Выйти на всех устройствах: отозвать все выпущенные токены пользователя
+    """
+    revocation_list.revoke_user(
+        db, current_user.id, timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    return None
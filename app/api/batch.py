@@ -0,0 +1,198 @@
+import asyncio
+from typing import Dict, List, Tuple
+from urllib.parse import parse_qs, urlsplit
+import orjson
+from fastapi import APIRouter, HTTPException, Request, Response, status
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal, shard_map, shared_session
+from app.schemas.batch import BatchRequest, BatchResponse, SubRequest
+
+router = APIRouter(
+    prefix="/batch",
+    tags=["batch"]
+)
+
+# Заголовки внешнего запроса, которые получают все подзапросы
+INHERITED_HEADERS = ("authorization", "cookie", "host", "accept-language")
+
+
+def _track_commits(db: Session) -> None:
+    """
+    Отмечать в db.info["uncommitted"], что в сессию записано, но не закоммичено
+    """
+    def flushed(session, flush_context):
+        session.info["uncommitted"] = True
+
+    def ended(session):
+        session.info.pop("uncommitted", None)
+
+    event.listen(db, "after_flush", flushed)
+    event.listen(db, "after_commit", ended)
+    event.listen(db, "after_rollback", ended)
+
+
+def _cleanup(db: Session, status_code: int) -> None:
+    """
+    Откатить то, что подзапрос оставил в общей сессии: после ошибки
+    или без commit изменения не должны попасть в следующий подзапрос
+    """
+    if status_code >= 400 or db.new or db.dirty or db.deleted or db.info.get("uncommitted"):
+        db.rollback()
+
+
+async def _dispatch(request: Request, sub: SubRequest) -> Tuple[int, Dict[str, str], bytes, List[str]]:
+    """
+    Выполнить подзапрос через ASGI приложение в том же процессе
+    Возвращает статус, заголовки, тело и значения Set-Cookie
+    """
+    url = urlsplit(sub.path)
+    body = orjson.dumps(sub.body) if sub.body is not None else b""
+
+    headers = {name: request.headers[name] for name in INHERITED_HEADERS if name in request.headers}
+    headers.update({name.lower(): value for name, value in sub.headers.items()})
+    if body:
+        headers["content-type"] = "application/json"
+        headers["content-length"] = str(len(body))
+
+    scope = {
+        "type": "http",
+        "asgi": request.scope.get("asgi", {"version": "3.0"}),
+        "http_version": request.scope.get("http_version", "1.1"),
+        "method": sub.method,
+        "scheme": request.url.scheme,
+        "server": request.scope.get("server"),
+        "client": request.scope.get("client"),
+        "root_path": request.scope.get("root_path", ""),
+        "path": url.path,
+        "raw_path": url.path.encode(),
+        "query_string": url.query.encode(),
+        "headers": [(name.encode("latin-1"), value.encode("latin-1")) for name, value in headers.items()],
+        "state": {},
+    }
+
+    body_sent = False
+    disconnected = asyncio.Event()
+
+    async def receive():
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        # Клиент подзапроса не отключается: ждём, пока ответ не будет отправлен
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    result = {"status": None, "headers": {}, "body": [], "cookies": []}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            result["status"] = message["status"]
+            result["headers"] = {
+                name.decode("latin-1"): value.decode("latin-1")
+                for name, value in message.get("headers", [])
+                if name.lower() != b"content-length"
+            }
+            # Несколько Set-Cookie в словаре заголовков не помещаются
+            result["cookies"] = [
+                value.decode("latin-1")
+                for name, value in message.get("headers", [])
+                if name.lower() == b"set-cookie"
+            ]
+        elif message["type"] == "http.response.body":
+            result["body"].append(message.get("body", b""))
+
+    try:
+        await request.app(scope, receive, send)
+    except Exception:
+        # Ошибка уже превращена в ответ 500 (ServerErrorMiddleware)
+        if result["status"] is None:
+            result["status"] = status.HTTP_500_INTERNAL_SERVER_ERROR
+    finally:
+        disconnected.set()
+
+    db = shared_session.get()
+    if db is not None:
+        _cleanup(db, result["status"])
+    return result["status"], result["headers"], b"".join(result["body"]), result["cookies"]
+
+
+def _single_shard(batch: BatchRequest) -> bool:
+    """
+    Все подзапросы читают один шард: только тогда у них может быть общая
+    сессия (id записей на разных шардах совпадают, карта объектов сессии одна)
+    """
+    if not shard_map.sharded:
+        return True
+    shards = set()
+    for sub in batch.requests:
+        for value in parse_qs(urlsplit(sub.path).query).get("user_id", []):
+            if value.isdigit():
+                shards.add(shard_map.shard_for(int(value)))
+    return len(shards) <= 1
+
+
+def _encode_item(sub: SubRequest, status_code: int, headers: Dict[str, str], body: bytes) -> bytes:
+    """
+    JSON элемента ответа: тело JSON подзапроса вставляется как есть, без повторного разбора
+    """
+    head = orjson.dumps({"id": sub.id, "status": status_code, "headers": headers})
+    if not body:
+        encoded = b"null"
+    elif headers.get("content-type", "").startswith("application/json"):
+        encoded = body
+    else:
+        encoded = orjson.dumps(body.decode("utf-8", errors="replace"))
+    return head[:-1] + b',"body":' + encoded + b"}"
+
+
+@router.post("/", response_model=BatchResponse)
+async def run_batch(batch: BatchRequest, request: Request):
+    """
+    Выполнить несколько запросов к API за один HTTP запрос
+
+    Подзапросы выполняются по очереди в этом же процессе и используют одну
+    сессию БД (если все они про пользователей одного шарда). У каждого свой
+    статус, заголовки и тело; ошибка одного подзапроса не прерывает остальные
+    и откатывает всё, что он не закоммитил. Cookie подзапросов (Set-Cookie)
+    переносятся в ответ batch. Вложенные /batch запрещены.
+    """
+    if len(batch.requests) > settings.BATCH_MAX_REQUESTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Too many requests: {len(batch.requests)}, maximum is {settings.BATCH_MAX_REQUESTS}"
+        )
+
+    batch_path = request.scope["path"].rstrip("/")
+    items = []
+    cookies: Dict[str, str] = {}
+    db = SessionLocal() if _single_shard(batch) else None
+    if db is not None:
+        _track_commits(db)
+    token = shared_session.set(db)
+    try:
+        for sub in batch.requests:
+            if urlsplit(sub.path).path.rstrip("/") == batch_path:
+                detail = orjson.dumps({"detail": "Nested batch requests are not allowed"})
+                items.append(_encode_item(
+                    sub, status.HTTP_400_BAD_REQUEST, {"content-type": "application/json"}, detail
+                ))
+                continue
+            status_code, headers, body, sub_cookies = await _dispatch(request, sub)
+            items.append(_encode_item(sub, status_code, headers, body))
+            for cookie in sub_cookies:
+                # Одноимённые cookie: действует последняя
+                cookies[cookie.partition("=")[0].strip()] = cookie
+    finally:
+        shared_session.reset(token)
+        if db is not None:
+            db.close()
+
+    response = Response(
+        content=b'{"responses":[' + b",".join(items) + b"]}",
+        media_type="application/json"
+    )
+    for cookie in cookies.values():
+        response.headers.append("set-cookie", cookie)
+    return response
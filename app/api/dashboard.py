@@ -0,0 +1,31 @@
+from datetime import date
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+from app.database import get_db
+from app.schemas.dashboard import Dashboard
+from app.crud import dashboard as crud_dashboard
+from app.serialization import model_response
+
+router = APIRouter(
+    prefix="/dashboard",
+    tags=["dashboard"]
+)
+
+
+@router.get("/", response_model=Dashboard)
+def read_dashboard(
+    user_id: int,
+    db: Session = Depends(get_db)
+):
+    """
+    Сводка для главного экрана:
+    - Настроение за сегодня
+    - Число задач по статусам и приоритетам, число просроченных
+    - Прогресс привычек за сегодня и лучшие текущие серии
+    - Число заметок за неделю
+    
+    Все разделы считаются агрегирующими запросами (COUNT / GROUP BY),
+    результат кешируется на пользователя и сбрасывается при изменении данных
+    """
+    dashboard = crud_dashboard.get_dashboard(db, user_id=user_id, target_date=date.today())
+    return model_response(Dashboard, dashboard)
@@ -0,0 +1,60 @@
+"""
+Общие зависимости и параметры для роутеров
+"""
+from typing import Iterable, List, Optional, Tuple, Type
+from fastapi import HTTPException, status
+from pydantic import BaseModel
+from app.config import settings
+
+
+def parse_fields(fields: Optional[str], schema: Type[BaseModel]) -> Optional[Tuple[str, ...]]:
+    """
+    Разобрать параметр fields=a,b,c и проверить, что поля есть в схеме ответа
+    """
+    if not fields:
+        return None
+    
+    requested = tuple(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    unknown = [f for f in requested if f not in schema.model_fields]
+    if unknown or not requested:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(unknown)}. "
+                   f"Available: {', '.join(schema.model_fields)}"
+        )
+    return requested
+
+
+def parse_ids(ids: str) -> List[int]:
+    """
+    Разобрать параметр ids=1,2,3: порядок сохраняется, повторы убираются
+    """
+    try:
+        parsed = list(dict.fromkeys(int(i) for i in ids.split(",") if i.strip()))
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="ids must be a comma-separated list of integers"
+        )
+    if not parsed:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="ids must not be empty"
+        )
+    if len(parsed) > settings.BATCH_MAX_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Too many ids: {len(parsed)}, maximum is {settings.BATCH_MAX_IDS}"
+        )
+    return parsed
+
+
+def batch_result(ids: List[int], items: Iterable) -> dict:
+    """
+    Упорядочить найденные записи как в запросе и собрать список ненайденных id
+    """
+    found = {item.id: item for item in items}
+    return {
+        "items": [found[i] for i in ids if i in found],
+        "missing": [i for i in ids if i not in found]
+    }
@@ -0,0 +1,39 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from app.database import get_db
+from app.crud import user as crud_user
+from app.services.export import stream_export, export_filename, export_media_type
+
+router = APIRouter(
+    prefix="/export",
+    tags=["export"]
+)
+
+@router.get("/")
+def export_data(
+    user_id: int,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="ndjson - запись на строку, csv - одна таблица с колонкой type"),
+    gzip: bool = Query(False, description="Сжать выгрузку в gzip на лету"),
+    db: Session = Depends(get_db)
+):
+    """
+    Выгрузить все данные пользователя: заметки, задачи, настроение,
+    привычки и их выполнения
+    
+    Ответ передаётся потоком по мере чтения из БД, память сервера
+    не зависит от объёма дневника. Для больших выгрузок есть фоновый
+    вариант: POST /jobs/export
+    """
+    if crud_user.get_user(db, user_id=user_id) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    
+    filename = export_filename(user_id, format, gzip)
+    return StreamingResponse(
+        stream_export(user_id, format, gzip=gzip),
+        media_type=export_media_type(format, gzip),
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
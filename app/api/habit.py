@@ -8,7 +8,12 @@ from app.schemas.habit import (
     HabitCompletion, HabitCompletionCreate,
     HabitWithStreak, HabitForDate
 )
+from app.schemas.batch import ItemBatch
 from app.crud import habit as crud_habit
+from app.api.deps import parse_ids, batch_result
+from app.serialization import model_response
+from app.conditional import conditional_get
+from app.coalesce import coalesce
 
 router = APIRouter(
     prefix="/habits",
@@ -30,7 +35,7 @@ def create_habit(
     return crud_habit.create_habit(db=db, habit=habit, user_id=user_id)
 
 
-@router.get("/", response_model=List[Habit])
+@router.get("/", response_model=List[Habit], dependencies=[Depends(conditional_get("habit"))])
 def read_habits(
     user_id: int,
     active_only: bool = Query(False, description="Показывать только активные привычки"),
@@ -46,6 +51,21 @@ def read_habits(
     )
 
 
+@router.get("/batch", response_model=ItemBatch[Habit])
+def read_habits_batch(
+    user_id: int,
+    ids: str = Query(..., description="id привычек через запятую, например 1,2,3"),
+    db: Session = Depends(get_db)
+):
+    """
+    Получить несколько привычек по списку id одним запросом
+    Порядок ответа совпадает с порядком ids, ненайденные id перечислены в missing
+    """
+    habit_ids = parse_ids(ids)
+    habits = crud_habit.get_habits_by_ids(db, user_id=user_id, habit_ids=habit_ids)
+    return model_response(ItemBatch[Habit], batch_result(habit_ids, habits))
+
+
 @router.get("/{habit_id}", response_model=Habit)
 def read_habit(
     habit_id: int,
@@ -104,6 +124,7 @@ def delete_habit(
 # ===== Habit Statistics =====
 
 @router.get("/{habit_id}/streak", response_model=dict)
+@coalesce(ttl=1.0)
 def read_habit_streak(
     habit_id: int,
     user_id: int,
@@ -0,0 +1,61 @@
+import shutil
+import tempfile
+from typing import Optional
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile, status
+from sqlalchemy.orm import Session
+from app.database import get_db
+from app.api.jobs import _get_user_job
+from app.crud import user as crud_user
+from app.schemas.job import JobStatus
+from app.services.jobs import job_runner
+
+router = APIRouter(
+    prefix="/import",
+    tags=["import"]
+)
+
+# Размер блока при копировании загрузки во временный файл
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+@router.post("/", response_model=JobStatus, status_code=status.HTTP_202_ACCEPTED)
+def import_data(
+    user_id: int,
+    file: UploadFile = File(..., description="Файл выгрузки /export (NDJSON или CSV, можно .gz)"),
+    format: Optional[str] = Query(None, pattern="^(ndjson|csv)$", description="По умолчанию - по расширению файла"),
+    db: Session = Depends(get_db)
+):
+    """
+    Загрузить выгрузку дневника
+    
+    Файл копируется на диск блоками и импортируется в фоне, записи читаются
+    построчно и вставляются пачками. Прогресс - GET /import/{job_id}
+    """
+    if crud_user.get_user(db, user_id=user_id) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    
+    if format is None:
+        name = (file.filename or "").lower().removesuffix(".gz")
+        format = "csv" if name.endswith(".csv") else "ndjson"
+    
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".import") as tmp:
+        shutil.copyfileobj(file.file, tmp, COPY_CHUNK_SIZE)
+    
+    return job_runner.submit(db, "import", user_id, path=tmp.name, format=format)
+
+
+@router.get("/{job_id}", response_model=JobStatus)
+def read_import_status(job_id: str, user_id: int, db: Session = Depends(get_db)):
+    """
+    Состояние импорта: processed, imported, skipped и первые ошибки с номерами строк
+    """
+    job = _get_user_job(db, job_id, user_id)
+    if job.type != "import":
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Import job not found"
+        )
+    return job
@@ -0,0 +1,94 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+from app.database import get_db
+from app.crud import user as crud_user
+from app.models.job import Job
+from app.schemas.job import JobStatus
+from app.services.job_handlers import job_result_file
+from app.services.jobs import job_runner
+
+router = APIRouter(
+    prefix="/jobs",
+    tags=["jobs"]
+)
+
+
+def _require_user(db: Session, user_id: int) -> None:
+    if crud_user.get_user(db, user_id=user_id) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+
+
+def _get_user_job(db: Session, job_id: str, user_id: int) -> Job:
+    job = job_runner.get(db, job_id)
+    if job is None or job.user_id != user_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    return job
+
+
+@router.post("/export", response_model=JobStatus, status_code=status.HTTP_202_ACCEPTED)
+def create_export_job(
+    user_id: int,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    gzip: bool = Query(False, description="Сжать выгрузку gzip"),
+    db: Session = Depends(get_db)
+):
+    """
+    Выгрузка в фоне: файл готовится на сервере, затем скачивается
+    через GET /jobs/{job_id}/result
+    """
+    _require_user(db, user_id)
+    return job_runner.submit(db, "export", user_id, format=format, gzip=gzip)
+
+
+@router.post("/rebuild-indexes", response_model=JobStatus, status_code=status.HTTP_202_ACCEPTED)
+def create_rebuild_indexes_job(user_id: int, db: Session = Depends(get_db)):
+    """
+    Перестроить индексы поиска, подсказок и дубликатов пользователя в фоне
+    """
+    _require_user(db, user_id)
+    return job_runner.submit(db, "rebuild_indexes", user_id)
+
+
+@router.post("/note-signatures", response_model=JobStatus, status_code=status.HTTP_202_ACCEPTED)
+def create_note_signatures_job(user_id: int, db: Session = Depends(get_db)):
+    """
+    Досчитать сигнатуры для поиска дубликатов у заметок, где их ещё нет
+    """
+    _require_user(db, user_id)
+    return job_runner.submit(db, "note_signatures", user_id)
+
+
+@router.get("/{job_id}", response_model=JobStatus)
+def read_job(job_id: str, user_id: int, db: Session = Depends(get_db)):
+    """
+    Состояние задачи: status, progress, result или error
+    """
+    return _get_user_job(db, job_id, user_id)
+
+
+@router.get("/{job_id}/result")
+def download_job_result(job_id: str, user_id: int, db: Session = Depends(get_db)):
+    """
+    Скачать файл результата завершённой задачи (выгрузки)
+    """
+    job = _get_user_job(db, job_id, user_id)
+    if job.status != "completed":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Job is {job.status}"
+        )
+
+    path = job_result_file(job.id, job.result)
+    if path is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job has no result file"
+        )
+    return FileResponse(path, media_type=job.result["media_type"], filename=job.result["filename"])
@@ -4,11 +4,14 @@ from typing import List, Optional, Union
 from datetime import date
 from app.database import get_db
 from app.schemas.mood import Mood, MoodCreate, MoodUpdate
-from app.schemas.daily_activity import DailyActivity, HabitWithCompletion
+from app.schemas.daily_activity import DailyActivity, DailyActivitySummary, HabitWithCompletion
 from app.crud import mood as crud_mood
 from app.crud import task as crud_task
 from app.crud import note as crud_note
 from app.crud import habit as crud_habit
+from app.serialization import model_response
+from app.conditional import conditional_get
+from app.coalesce import coalesce
 from pydantic import BaseModel
 
 
@@ -50,7 +53,11 @@ def read_moods(
     return crud_mood.get_moods(db, user_id=user_id, skip=skip, limit=limit)
 
 
-@router.get("/today", response_model=Union[Mood, MoodNotFoundResponse])
+@router.get(
+    "/today",
+    response_model=Union[Mood, MoodNotFoundResponse],
+    dependencies=[Depends(conditional_get("mood"))]
+)
 def read_today_mood(
     user_id: int,
     db: Session = Depends(get_db)
@@ -69,10 +76,15 @@ def read_today_mood(
     return db_mood
 
 
-@router.get("/date/{mood_date}", response_model=DailyActivity)
+@router.get(
+    "/date/{mood_date}",
+    response_model=Union[DailyActivity, DailyActivitySummary],
+    dependencies=[Depends(conditional_get("mood", "task", "note", "habit", "habit_completion"))]
+)
 def read_daily_activity(
     mood_date: date,
     user_id: int,
+    view: str = Query("full", pattern="^(full|summary)$", description="full - полные записи, summary - без текстов заметок и описаний задач"),
     db: Session = Depends(get_db)
 ):
     """
@@ -81,15 +93,19 @@ def read_daily_activity(
     - Задачи
     - Заметки
     - Привычки
+    
+    view=summary не читает из БД тексты заметок и описания задач
     """
+    full = view == "full"
+    
     # Получаем настроение за день
     db_mood = crud_mood.get_mood_by_date(db, user_id=user_id, mood_date=mood_date)
     
     # Получаем задачи за день
-    db_tasks = crud_task.get_tasks_by_date(db, user_id=user_id, target_date=mood_date)
+    db_tasks = crud_task.get_tasks_by_date(db, user_id=user_id, target_date=mood_date, with_description=full)
     
     # Получаем заметки за день
-    db_notes = crud_note.get_notes_by_date(db, user_id=user_id, target_date=mood_date)
+    db_notes = crud_note.get_notes_by_date(db, user_id=user_id, target_date=mood_date, with_content=full)
     
     # Получаем привычки за день с информацией о выполнении
     habits_data = crud_habit.get_habits_for_date(db, user_id=user_id, target_date=mood_date)
@@ -112,7 +128,8 @@ def read_daily_activity(
         ))
     
     # Формируем ответ (Pydantic автоматически преобразует ORM модели в схемы)
-    return DailyActivity(
+    schema = DailyActivity if full else DailyActivitySummary
+    return schema(
         date=mood_date,
         mood=db_mood,
         tasks=db_tasks,
@@ -163,10 +180,12 @@ def read_moods_by_range(
             detail="Start date must be before end date"
         )
     
-    return crud_mood.get_moods_by_date_range(db, user_id=user_id, start_date=start_date, end_date=end_date)
+    moods = crud_mood.get_moods_by_date_range(db, user_id=user_id, start_date=start_date, end_date=end_date)
+    return model_response(List[Mood], moods)
 
 
 @router.get("/statistics/", response_model=dict)
+@coalesce(ttl=1.0)
 def read_mood_statistics(
     user_id: int,
     days: int = Query(30, ge=1, le=365, description="Number of days for statistics"),
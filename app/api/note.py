@@ -1,9 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional, Union
 from app.database import get_db
-from app.schemas.note import Note, NoteCreate, NoteUpdate
+from app.schemas.note import (
+    Note, NoteCreate, NoteUpdate, NoteSummary, RelatedNote, DuplicateGroup
+)
+from app.schemas.batch import ItemBatch
 from app.crud import note as crud_note
+from app.api.deps import parse_fields, parse_ids, batch_result
+from app.serialization import model_response, partial_model
+from app.services.related import related_notes
+from app.services.minhash import find_duplicate_groups, find_near_duplicates
 
 router = APIRouter(
     prefix="/notes",
@@ -15,25 +22,87 @@ router = APIRouter(
 def create_note(
     note: NoteCreate,
     user_id: int,
+    response: Response,
+    warn_duplicates: bool = Query(False, description="Проверить, нет ли уже почти такой же заметки"),
     db: Session = Depends(get_db)
 ):
     """
     Создать новую заметку
+    
+    При warn_duplicates=true id найденных почти-дубликатов возвращаются
+    в заголовке X-Near-Duplicates
     """
-    return crud_note.create_note(db=db, note=note, user_id=user_id)
+    db_note = crud_note.create_note(db=db, note=note, user_id=user_id)
+    if warn_duplicates:
+        duplicates = find_near_duplicates(
+            db, user_id=user_id, note_id=db_note.id, signature=db_note.signature.signature
+        )
+        if duplicates:
+            response.headers["X-Near-Duplicates"] = ",".join(str(i) for i, _ in duplicates)
+    return db_note
 
 
-@router.get("/", response_model=List[Note])
+@router.get("/", response_model=Union[List[Note], List[NoteSummary]])
 def read_notes(
     user_id: int,
     skip: int = 0,
     limit: int = 100,
+    view: str = Query("full", pattern="^(full|summary)$", description="full - полные заметки, summary - заголовок и фрагмент текста"),
+    fields: Optional[str] = Query(None, description="Список возвращаемых полей через запятую, например id,title"),
     db: Session = Depends(get_db)
 ):
     """
     Получить список заметок пользователя
+    
+    view=summary и fields= позволяют не передавать (и не читать из БД) полный текст заметок
+    """
+    if view == "summary":
+        field_names = parse_fields(fields, NoteSummary)
+        notes = crud_note.get_note_summaries(db, user_id=user_id, skip=skip, limit=limit)
+        include = {"__all__": set(field_names)} if field_names else None
+        return model_response(List[NoteSummary], notes, include=include)
+    
+    field_names = parse_fields(fields, Note)
+    notes = crud_note.get_notes(db, user_id=user_id, skip=skip, limit=limit, fields=field_names)
+    schema = partial_model(Note, field_names) if field_names else Note
+    return model_response(List[schema], notes)
+
+
+@router.get("/batch", response_model=ItemBatch[Note])
+def read_notes_batch(
+    user_id: int,
+    ids: str = Query(..., description="id заметок через запятую, например 1,2,3"),
+    db: Session = Depends(get_db)
+):
+    """
+    Получить несколько заметок по списку id одним запросом
+    Порядок ответа совпадает с порядком ids, ненайденные id перечислены в missing
+    """
+    note_ids = parse_ids(ids)
+    notes = crud_note.get_notes_by_ids(db, user_id=user_id, note_ids=note_ids)
+    return model_response(ItemBatch[Note], batch_result(note_ids, notes))
+
+
+@router.get("/duplicates", response_model=List[DuplicateGroup])
+def read_duplicate_notes(
+    user_id: int,
+    db: Session = Depends(get_db)
+):
+    """
+    Найти группы почти-дубликатов среди заметок пользователя (MinHash + LSH)
+    Заметки без сигнатуры (старые) учитываются после POST /jobs/note-signatures,
+    заметки без слов не считаются дубликатами
     """
-    return crud_note.get_notes(db, user_id=user_id, skip=skip, limit=limit)
+    groups = find_duplicate_groups(db, user_id=user_id)
+    note_ids = [note_id for members, _ in groups for note_id in members]
+    rows = {row.id: row for row in crud_note.get_note_titles(db, user_id=user_id, note_ids=note_ids)}
+    return [
+        DuplicateGroup(
+            notes=[rows[note_id] for note_id in members if note_id in rows],
+            similarity=round(score, 4)
+        )
+        for members, score in groups
+    ]
 
 
 @router.get("/{note_id}", response_model=Note)
@@ -54,6 +123,30 @@ def read_note(
     return db_note
 
 
+@router.get("/{note_id}/related", response_model=List[RelatedNote])
+def read_related_notes(
+    note_id: int,
+    user_id: int,
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db)
+):
+    """
+    Получить похожие заметки пользователя (TF-IDF, косинусное сходство)
+    """
+    if not crud_note.note_exists(db, note_id=note_id, user_id=user_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Note not found"
+        )
+    
+    scored = related_notes(db, user_id=user_id, note_id=note_id, limit=limit)
+    rows = {row.id: row for row in crud_note.get_note_titles(db, user_id=user_id, note_ids=[i for i, _ in scored])}
+    return [
+        RelatedNote(id=i, title=rows[i].title, score=round(score, 4), created_at=rows[i].created_at)
+        for i, score in scored if i in rows
+    ]
+
+
 @router.put("/{note_id}", response_model=Note)
 def update_note(
     note_id: int,
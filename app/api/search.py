@@ -1,12 +1,20 @@
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from datetime import datetime
 from pydantic import BaseModel
+from app.config import settings
 from app.database import get_db
 from app.models.note import Note
 from app.models.task import Task
-from sqlalchemy import or_
+from app.models.types import compressed_flag, compressed_only
+from app.api.deps import parse_fields
+from app.crud.note import note_matches, note_search_filter
+from app.serialization import model_response
+from app.coalesce import coalesce
+from app.services.suggest import suggest
+from app.services.fuzzy import fuzzy_search
+from sqlalchemy import case, func, or_
 
 router = APIRouter(
     prefix="/search",
@@ -14,6 +22,15 @@ router = APIRouter(
 )
 
 
+class SearchSnippet(BaseModel):
+    """
+    Фрагмент текста вокруг совпадения
+    highlights - позиции совпадений внутри text: [начало, конец)
+    """
+    text: str
+    highlights: List[Tuple[int, int]] = []
+
+
 class SearchResultItem(BaseModel):
     """
     Результат поиска - элемент
@@ -23,6 +40,12 @@ class SearchResultItem(BaseModel):
     title: str
     content: Optional[str] = None
     description: Optional[str] = None
+    # Только для view=summary
+    snippet: Optional[str] = None
+    snippets: Optional[List[SearchSnippet]] = None
+    title_highlights: Optional[List[Tuple[int, int]]] = None
+    # Только для mode=fuzzy
+    score: Optional[float] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
     
@@ -30,6 +53,15 @@ class SearchResultItem(BaseModel):
         from_attributes = True
 
 
+class SuggestItem(BaseModel):
+    """
+    Подсказка для поля ввода
+    """
+    type: str  # "note", "task" или "habit"
+    id: int
+    title: str
+
+
 class SearchResponse(BaseModel):
     """
     Ответ на поисковый запрос
@@ -41,79 +73,241 @@ class SearchResponse(BaseModel):
     results: List[SearchResultItem]
 
 
+def find_matches(text: str, query: str, max_count: Optional[int] = None) -> List[Tuple[int, int]]:
+    """
+    Найти позиции совпадений query в text без учёта регистра
+    """
+    haystack = text.lower()
+    needle = query.lower()
+    if not needle or len(haystack) != len(text):
+        # lower() изменил длину строки - позиции были бы неверными
+        return []
+    
+    matches = []
+    pos = haystack.find(needle)
+    while pos != -1 and (max_count is None or len(matches) < max_count):
+        matches.append((pos, pos + len(needle)))
+        pos = haystack.find(needle, pos + len(needle))
+    return matches
+
+
+def build_snippets(text: str, query: str) -> List[dict]:
+    """
+    Нарезать окна по SEARCH_SNIPPET_RADIUS символов вокруг каждого совпадения
+    (не более SEARCH_MAX_SNIPPETS), перекрывающиеся окна объединяются
+    """
+    radius = settings.SEARCH_SNIPPET_RADIUS
+    matches = find_matches(text, query)
+    
+    windows: List[list] = []
+    for start, end in matches:
+        window_start = max(0, start - radius)
+        window_end = min(len(text), end + radius)
+        if windows and window_start <= windows[-1][1]:
+            windows[-1][1] = window_end
+            windows[-1][2].append((start, end))
+        elif len(windows) < settings.SEARCH_MAX_SNIPPETS:
+            windows.append([window_start, window_end, [(start, end)]])
+        else:
+            break
+    
+    return [
+        {
+            "text": text[window_start:window_end],
+            "highlights": [(s - window_start, e - window_start) for s, e in spans]
+        }
+        for window_start, window_end, spans in windows
+    ]
+
+
+def fetch_region(text: str, query: str) -> str:
+    """
+    То же, что INSTR + SUBSTR в SQL (см. search_content), для сжатых текстов
+    """
+    position = text.lower().find(query.lower()) + 1
+    start = position - settings.SEARCH_SNIPPET_RADIUS if position > settings.SEARCH_SNIPPET_RADIUS else 1
+    return text[start - 1:start - 1 + settings.SEARCH_SNIPPET_FETCH_LENGTH]
+
+
 @router.get("/", response_model=SearchResponse)
+@coalesce()
 def search_content(
     user_id: int,
     q: str = Query(..., min_length=1, description="Поисковый запрос"),
     skip: int = 0,
     limit: int = 100,
+    view: str = Query("full", pattern="^(full|summary)$", description="summary - фрагмент текста вместо полного содержимого"),
+    fields: Optional[str] = Query(None, description="Список полей результата через запятую, например id,type,title"),
+    mode: str = Query("substring", pattern="^(substring|fuzzy)$", description="fuzzy - поиск с опечатками по триграммам"),
     db: Session = Depends(get_db)
 ):
     """
     Глобальный поиск по заметкам и задачам пользователя.
     Ищет по заголовкам, содержимому заметок и описанию задач.
+    
+    Читаются только нужные колонки: при view=summary или fields без content
+    полный текст заметок из БД не передаётся.
+    
+    view=summary возвращает фрагменты вокруг совпадений с позициями подсветки.
+    БД находит первое совпадение (INSTR) и отдаёт ограниченный участок текста
+    начиная с него (SUBSTR), окна нарезаются уже из этого участка.
+    
+    mode=fuzzy ищет по триграммному индексу слов и сортирует по сходству;
+    фрагменты подсвечивают лучшее исправление первого слова запроса.
+    
+    Длинные тексты заметок хранятся сжатыми (CompressedText): SQL отбирает
+    их по словам текста (см. note_search_filter), распаковываются только
+    отобранные. Счётчики считаются по итоговым результатам.
     """
     search_pattern = f"%{q}%"
+    field_names = parse_fields(fields, SearchResultItem)
+    summary = view == "summary"
+    fuzzy = mode == "fuzzy"
+    
+    if fuzzy:
+        scores, corrections = fuzzy_search(db, user_id=user_id, query=q)
+        note_ids = [item_id for kind, item_id in scores if kind == "note"]
+        task_ids = [item_id for kind, item_id in scores if kind == "task"]
+        note_filter = Note.id.in_(note_ids)
+        task_filter = Task.id.in_(task_ids)
+        highlight = corrections[0] if corrections else q
+    else:
+        scores = {}
+        note_filter = note_search_filter(q)
+        task_filter = or_(
+            Task.title.ilike(search_pattern),
+            Task.description.ilike(search_pattern)
+        )
+        highlight = q
+    
+    def wanted(name: str) -> bool:
+        return field_names is None or name in field_names
+    
+    # Колонки заметок: полный текст только если он действительно нужен
+    # (и для отобранных сжатых заметок, совпадение в которых проверяется в Python)
+    note_columns = [
+        Note.id, Note.title, Note.created_at, Note.updated_at,
+        compressed_flag(Note.content_raw).label("compressed")
+    ]
+    if summary:
+        match_pos = func.instr(func.lower(Note.content_raw), highlight.lower())
+        region_start = case(
+            (match_pos > settings.SEARCH_SNIPPET_RADIUS, match_pos - settings.SEARCH_SNIPPET_RADIUS),
+            else_=1
+        )
+        note_columns.append(
+            func.substr(Note.content_raw, region_start, settings.SEARCH_SNIPPET_FETCH_LENGTH).label("region")
+        )
+    if not summary and wanted("content"):
+        note_columns.append(Note.content)
+    else:
+        note_columns.append(compressed_only(Note.content_raw).label("unpacked"))
     
     # Поиск по заметкам
-    notes = db.query(Note).filter(
+    notes = db.query(*note_columns).filter(
         Note.user_id == user_id,
-        or_(
-            Note.title.ilike(search_pattern),
-            Note.content.ilike(search_pattern)
-        )
+        note_filter
     ).all()
     
-    # Поиск по задачам
-    tasks = db.query(Task).filter(
+    # Поиск по задачам (описание ограничено 500 символами)
+    task_columns = [Task.id, Task.title, Task.created_at, Task.updated_at]
+    if summary or wanted("description"):
+        task_columns.append(Task.description)
+    
+    tasks = db.query(*task_columns).filter(
         Task.user_id == user_id,
-        or_(
-            Task.title.ilike(search_pattern),
-            Task.description.ilike(search_pattern)
-        )
+        task_filter
     ).all()
     
     # Формирование результатов
     results = []
     
+    def summary_fields(title: str, text: Optional[str]) -> dict:
+        text = text or ""
+        snippets = build_snippets(text, highlight)
+        return {
+            "snippet": snippets[0]["text"] if snippets else text[:settings.NOTE_SNIPPET_LENGTH],
+            "snippets": snippets,
+            "title_highlights": find_matches(title, highlight)
+        }
+    
     # Добавляем заметки
+    notes_count = 0
     for note in notes:
-        results.append({
+        unpacked = getattr(note, "unpacked", None) or getattr(note, "content", None)
+        if note.compressed and not fuzzy and not note_matches(note.title, unpacked, q):
+            continue
+        notes_count += 1
+        item = {
             "id": note.id,
             "type": "note",
             "title": note.title,
-            "content": note.content,
+            "content": None if summary else getattr(note, "content", None),
             "description": None,
             "created_at": note.created_at,
-            "updated_at": note.updated_at
-        })
+            "updated_at": note.updated_at,
+            "score": scores.get(("note", note.id))
+        }
+        if summary:
+            region = fetch_region(unpacked, highlight) if note.compressed else note.region
+            item.update(summary_fields(note.title, region))
+        results.append(item)
     
     # Добавляем задачи
     for task in tasks:
-        results.append({
+        description = getattr(task, "description", None)
+        item = {
             "id": task.id,
             "type": "task",
             "title": task.title,
             "content": None,
-            "description": task.description,
+            "description": None if summary else description,
             "created_at": task.created_at,
-            "updated_at": task.updated_at
-        })
+            "updated_at": task.updated_at,
+            "score": scores.get(("task", task.id))
+        }
+        if summary:
+            item.update(summary_fields(task.title, description))
+        results.append(item)
     
-    # Сортируем по дате создания (новые первыми)
+    # Сортируем по дате создания (новые первыми), в нечётком режиме - по сходству
     results.sort(key=lambda x: x["created_at"], reverse=True)
+    if fuzzy:
+        results.sort(key=lambda x: x["score"], reverse=True)
     
     # Применяем пагинацию
     total_results = len(results)
     results = results[skip:skip + limit]
     
-    # Преобразуем в модели Pydantic
-    results = [SearchResultItem(**item) for item in results]
+    # Словари валидируются в SearchResponse один раз прямо при сериализации
+    include = None
+    if field_names:
+        include = {
+            "query": True,
+            "total_results": True,
+            "notes_count": True,
+            "tasks_count": True,
+            "results": {"__all__": set(field_names)}
+        }
     
-    return SearchResponse(
-        query=q,
-        total_results=total_results,
-        notes_count=len(notes),
-        tasks_count=len(tasks),
-        results=results
-    )
+    return model_response(SearchResponse, {
+        "query": q,
+        "total_results": total_results,
+        "notes_count": notes_count,
+        "tasks_count": len(tasks),
+        "results": results
+    }, include=include)
+
+
+@router.get("/suggest", response_model=List[SuggestItem])
+def suggest_titles(
+    user_id: int,
+    q: str = Query(..., min_length=1, max_length=255, description="Начало слова в заголовке"),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db)
+):
+    """
+    Подсказки по началу слов в заголовках заметок, задач и привычек.
+    Отвечает из индекса в памяти, самые свежие записи первыми.
+    """
+    return suggest(db, user_id=user_id, prefix=q.strip(), limit=limit)
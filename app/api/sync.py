@@ -0,0 +1,95 @@
+from collections import defaultdict
+from typing import Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+from app.database import get_db, shard_map
+from app.schemas.sync import SyncResponse
+from app.crud import sync as crud_sync
+from app.serialization import model_response
+
+router = APIRouter(
+    prefix="/sync",
+    tags=["sync"]
+)
+
+# Ключ ответа для каждой сущности журнала
+RESPONSE_KEYS = {
+    "note": "notes",
+    "task": "tasks",
+    "mood": "moods",
+    "habit": "habits",
+    "habit_completion": "habit_completions",
+}
+
+
+def encode_page_token(cursor: int, position: Tuple[str, int]) -> str:
+    return f"{cursor}:{position[0]}:{position[1]}"
+
+
+def decode_page_token(token: str) -> Tuple[int, Tuple[str, int]]:
+    try:
+        cursor, entity, last_id = token.split(":")
+        if entity not in crud_sync.SYNC_ENTITIES:
+            raise ValueError(entity)
+        return int(cursor), (entity, int(last_id))
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid page_token")
+
+
+@router.get("/", response_model=SyncResponse)
+def sync_changes(
+    user_id: int,
+    since: int = Query(0, ge=0, description="Курсор из предыдущего ответа (0 - полный снимок)"),
+    limit: int = Query(500, ge=1, le=5000, description="Максимум записей за запрос"),
+    page_token: Optional[str] = Query(None, description="Продолжение полного снимка из предыдущего ответа"),
+    db: Session = Depends(get_db)
+):
+    """
+    Дельта-синхронизация для офлайн-клиентов
+
+    Возвращает записи, созданные или изменённые начиная с курсора since,
+    и tombstone для удалённых. При since=0 - полный снимок данных
+    страницами по limit записей: пока has_more=true, следующий запрос
+    передаёт page_token, курсор всех страниц снимка один и тот же.
+    Объём ответа зависит от числа изменений, а не от объёма данных.
+    Курсор, выданный до переноса пользователя на другой шард, тоже даёт
+    полный снимок: id записей после переноса другие.
+    """
+    resync_below = shard_map.resync_below(user_id)
+    if page_token is not None or since == 0 or since < resync_below:
+        if page_token is not None:
+            cursor, after = decode_page_token(page_token)
+        else:
+            # Курсор берётся до чтения снимка: изменения, сделанные во время
+            # чтения страниц, придут повторно при следующей синхронизации
+            cursor, after = max(crud_sync.get_snapshot_cursor(db, user_id=user_id), resync_below), None
+        page, position = crud_sync.get_snapshot_page(db, user_id=user_id, after=after, limit=limit)
+        content = {RESPONSE_KEYS[entity]: items for entity, items in page.items()}
+        return model_response(SyncResponse, {
+            "cursor": cursor,
+            "full": True,
+            "has_more": position is not None,
+            "page_token": encode_page_token(cursor, position) if position is not None else None,
+            **content
+        })
+
+    entries, has_more, cursor = crud_sync.get_changes(db, user_id=user_id, since=since, limit=limit)
+
+    upserts = defaultdict(list)
+    deleted = []
+    for entry in entries:
+        if entry.op == crud_sync.DELETE:
+            deleted.append({"entity": entry.entity, "id": entry.entity_id, "deleted_at": entry.changed_at})
+        else:
+            upserts[entry.entity].append(entry.entity_id)
+
+    content = {
+        RESPONSE_KEYS[entity]: crud_sync.get_entities(db, user_id=user_id, entity=entity, entity_ids=ids)
+        for entity, ids in upserts.items()
+    }
+    return model_response(SyncResponse, {
+        "cursor": cursor,
+        "has_more": has_more,
+        "deleted": deleted,
+        **content
+    })
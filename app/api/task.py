@@ -1,10 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Union
 from app.database import get_db
-from app.schemas.task import Task, TaskCreate, TaskUpdate
+from app.schemas.task import Task, TaskCreate, TaskUpdate, TaskSummary
+from app.schemas.batch import ItemBatch
 from app.models.task import TaskStatus
 from app.crud import task as crud_task
+from app.api.deps import parse_ids, batch_result
+from app.serialization import model_response
+from app.conditional import conditional_get
 
 router = APIRouter(
     prefix="/tasks",
@@ -24,24 +28,42 @@ def create_task(
     return crud_task.create_task(db=db, task=task, user_id=user_id)
 
 
-@router.get("/", response_model=List[Task])
+@router.get("/", response_model=Union[List[Task], List[TaskSummary]], dependencies=[Depends(conditional_get("task"))])
 def read_tasks(
     user_id: int,
     skip: int = 0,
     limit: int = 100,
     status_filter: Optional[TaskStatus] = None,
+    view: str = Query("full", pattern="^(full|summary)$", description="full - полные задачи, summary - без описаний"),
     db: Session = Depends(get_db)
 ):
     """
     Получить список задач пользователя с возможностью фильтрации по статусу
+    view=summary не читает из БД описания задач
     """
+    full = view == "full"
     if status_filter:
         tasks = crud_task.get_tasks_by_status(
-            db, user_id=user_id, status=status_filter, skip=skip, limit=limit
+            db, user_id=user_id, status=status_filter, skip=skip, limit=limit, with_description=full
         )
     else:
-        tasks = crud_task.get_tasks(db, user_id=user_id, skip=skip, limit=limit)
-    return tasks
+        tasks = crud_task.get_tasks(db, user_id=user_id, skip=skip, limit=limit, with_description=full)
+    return model_response(List[Task] if full else List[TaskSummary], tasks)
+
+
+@router.get("/batch", response_model=ItemBatch[Task])
+def read_tasks_batch(
+    user_id: int,
+    ids: str = Query(..., description="id задач через запятую, например 1,2,3"),
+    db: Session = Depends(get_db)
+):
+    """
+    Получить несколько задач по списку id одним запросом
+    Порядок ответа совпадает с порядком ids, ненайденные id перечислены в missing
+    """
+    task_ids = parse_ids(ids)
+    tasks = crud_task.get_tasks_by_ids(db, user_id=user_id, task_ids=task_ids)
+    return model_response(ItemBatch[Task], batch_result(task_ids, tasks))
 
 
 @router.get("/completed", response_model=List[Task])
@@ -4,6 +4,7 @@ from typing import List
 from app.database import get_db
 from app.schemas.user import User, UserCreate, UserUpdate
 from app.crud import user as crud_user
+from app.services.jobs import job_runner
 
 router = APIRouter(
     prefix="/users",
@@ -54,7 +55,7 @@ def read_user_by_username(username: str, db: Session = Depends(get_db)):
     """
     Получить пользователя по username
     """
-    db_user = crud_user.get_user_by_username(db, username=username)
+    db_user = crud_user.get_user_by_username(db, username=username, active_only=True)
     if db_user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -81,6 +82,9 @@ def update_user(user_id: int, user: UserUpdate, db: Session = Depends(get_db)):
 def delete_user(user_id: int, db: Session = Depends(get_db)):
     """
     Удалить пользователя
+    
+    Ответ возвращается сразу: аккаунт помечается на удаление и больше
+    не виден, а его данные удаляются фоновой задачей purge_user
     """
     success = crud_user.delete_user(db, user_id=user_id)
     if not success:
@@ -88,6 +92,7 @@ def delete_user(user_id: int, db: Session = Depends(get_db)):
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
+    job_runner.submit(db, "purge_user", user_id)
     return None
 
 
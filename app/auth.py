@@ -1,4 +1,5 @@
-from datetime import datetime, timedelta
+import uuid
+from datetime import datetime, timedelta, timezone
 from typing import Optional
 from jose import JWTError, jwt
 from fastapi import Depends, HTTPException, status
@@ -7,6 +8,7 @@ from sqlalchemy.orm import Session
 from app.database import get_db
 from app.crud import user as crud_user
 from app.models.user import User
+from app.services.revocation import revocation_list
 
 # Настройки JWT
 SECRET_KEY = "your-secret-key-change-this-in-production-please-use-environment-variable"
@@ -27,14 +29,17 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     
-    to_encode.update({"exp": expire})
+    # jti позволяет отозвать конкретный токен, iat - все токены пользователя до момента отзыва
+    # iat с миллисекундами: токен, выпущенный в ту же секунду после отзыва, действителен
+    issued_at = datetime.utcnow().replace(tzinfo=timezone.utc).timestamp()
+    to_encode.update({"exp": expire, "iat": round(issued_at, 3), "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 
-def verify_token(token: str) -> Optional[dict]:
+def decode_token(token: str) -> Optional[dict]:
     """
-    Проверить и декодировать JWT токен
+    Декодировать JWT токен без проверки отзыва
     """
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
@@ -43,6 +48,20 @@ def verify_token(token: str) -> Optional[dict]:
         return None
 
 
+def verify_token(token: str, db: Session) -> Optional[dict]:
+    """
+    Проверить и декодировать JWT токен
+    Отозванные токены считаются недействительными; БД запрашивается
+    только при положительном ответе фильтра отзыва
+    """
+    payload = decode_token(token)
+    if payload is None:
+        return None
+    if revocation_list.is_revoked(db, payload):
+        return None
+    return payload
+
+
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db)
@@ -56,7 +75,7 @@ async def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    payload = verify_token(token)
+    payload = verify_token(token, db)
     if payload is None:
         raise credentials_exception
     
@@ -82,7 +101,7 @@ async def get_current_user_optional(
     if token is None:
         return None
     
-    payload = verify_token(token)
+    payload = verify_token(token, db)
     if payload is None:
         return None
     
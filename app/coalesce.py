@@ -0,0 +1,176 @@
+"""
+Объединение одинаковых одновременных запросов (single-flight)
+
+Пока первый запрос с данными параметрами вычисляется, остальные такие же
+ждут его результата, а не считают заново. С ttl > 0 готовый результат
+ещё ttl секунд отдаётся повторным запросам.
+
+Подходит для endpoints, которые возвращают готовые данные (dict, pydantic
+модели, Response): результат разделяется между запросами с разными сессиями БД.
+"""
+import asyncio
+import functools
+import inspect
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional
+from fastapi import BackgroundTasks, Request, Response
+from sqlalchemy.orm import Session
+
+# Сколько записей копится до очистки завершённых и устаревших
+_SWEEP_THRESHOLD = 1024
+
+# Аргументы, которые не влияют на результат и не входят в ключ
+_EXCLUDED_TYPES = (Session, Request, Response, BackgroundTasks)
+
+
+class _Call:
+    __slots__ = ("event", "future", "result", "error", "done", "expires")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.future: Optional[asyncio.Future] = None
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.done = False
+        self.expires = 0.0
+
+    def reusable(self, now: float) -> bool:
+        return not self.done or (self.error is None and self.expires > now)
+
+
+class SingleFlight:
+    """
+    Реестр вычислений в процессе: ключ -> текущий или недавний вызов
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.shared = 0
+
+    def _join(self, key: Hashable) -> tuple:
+        """
+        Найти вызов для ключа или зарегистрировать новый
+        Возвращает (вызов, является ли текущий запрос ведущим)
+        """
+        now = time.monotonic()
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None and call.reusable(now):
+                self.shared += 1
+                return call, False
+            if len(self._calls) >= _SWEEP_THRESHOLD:
+                self._calls = {k: c for k, c in self._calls.items() if c.reusable(now)}
+            call = _Call()
+            self._calls[key] = call
+            self.leaders += 1
+            return call, True
+
+    def _finish(self, key: Hashable, call: _Call, ttl: float) -> None:
+        call.done = True
+        call.expires = time.monotonic() + ttl
+        if ttl <= 0 or call.error is not None:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+
+    def do(self, key: Hashable, fn: Callable[[], Any], ttl: float = 0.0) -> Any:
+        """
+        Выполнить fn один раз для всех одновременных вызовов с ключом key
+        """
+        call, leader = self._join(key)
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            self._finish(key, call, ttl)
+            call.event.set()
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Any], ttl: float = 0.0) -> Any:
+        """
+        То же для корутин: ожидающие запросы не блокируют event loop
+        """
+        call, leader = self._join(key)
+        if not leader:
+            if call.future is None:
+                # Вызов начат синхронной версией в другом потоке
+                await asyncio.get_running_loop().run_in_executor(None, call.event.wait)
+            elif not call.done:
+                await asyncio.shield(call.future)
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        call.future = asyncio.get_running_loop().create_future()
+        try:
+            call.result = await fn()
+            return call.result
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            self._finish(key, call, ttl)
+            call.event.set()
+            call.future.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.leaders + self.shared
+        return {
+            "in_flight": sum(1 for call in list(self._calls.values()) if not call.done),
+            "computed": self.leaders,
+            "shared": self.shared,
+            "shared_ratio": round(self.shared / total, 4) if total else 0.0,
+        }
+
+
+single_flight = SingleFlight()
+
+
+def coalesce(ttl: float = 0.0) -> Callable:
+    """
+    Декоратор endpoint: одинаковые одновременные запросы выполняются один раз
+
+    Ключ - функция и параметры запроса (сессия БД, Request и т.п. не учитываются).
+    ttl - сколько секунд после завершения отдавать готовый результат.
+    Ставится под декоратором роутера: @router.get(...) затем @coalesce(...).
+    """
+
+    def decorator(func: Callable) -> Callable:
+        name = f"{func.__module__}.{func.__qualname__}"
+        signature = inspect.signature(func)
+
+        def make_key(args: tuple, kwargs: dict) -> Hashable:
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            params = tuple(sorted(
+                (param, repr(value))
+                for param, value in bound.arguments.items()
+                if param != "db" and not isinstance(value, _EXCLUDED_TYPES)
+            ))
+            return name, params
+
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                return await single_flight.do_async(
+                    make_key(args, kwargs), lambda: func(*args, **kwargs), ttl
+                )
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return single_flight.do(make_key(args, kwargs), lambda: func(*args, **kwargs), ttl)
+        return wrapper
+
+    return decorator
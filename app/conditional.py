@@ -0,0 +1,97 @@
+"""
+Условные GET запросы (ETag / If-None-Match)
+
+ETag строится по версии данных пользователя из журнала изменений
+(один запрос MAX(seq)), поэтому 304 отдаётся без чтения строк и сериализации.
+"""
+import hashlib
+from datetime import date
+from typing import Callable, Iterable
+from fastapi import Depends, Request, Response, status
+from sqlalchemy.orm import Session
+from app.database import get_db
+from app.crud import sync as crud_sync
+
+
+class NotModified(Exception):
+    """
+    Данные не изменились с версии, которая уже есть у клиента
+    """
+
+    def __init__(self, etag: str):
+        self.etag = etag
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """
+    Слабое сравнение If-None-Match (RFC 9110): префикс W/ игнорируется
+    """
+    if header.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def conditional_get(*entities: str) -> Callable:
+    """
+    Зависимость для GET endpoints: проверяет If-None-Match и выставляет ETag
+
+    entities - сущности журнала изменений, от которых зависит ответ.
+    В ETag входят путь и параметры запроса (разные страницы и фильтры -
+    разные теги) и текущая дата (ответы вида "за сегодня" меняются в полночь).
+    """
+
+    def dependency(request: Request, user_id: int, db: Session = Depends(get_db)) -> str:
+        version = crud_sync.get_version(db, user_id=user_id, entities=entities)
+        key = f"{version}|{request.url.path}|{request.url.query}|{date.today().isoformat()}"
+        etag = f'W/"{hashlib.blake2b(key.encode(), digest_size=12).hexdigest()}"'
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and _etag_matches(if_none_match, etag):
+            raise NotModified(etag)
+
+        request.state.etag = etag
+        return etag
+
+    return dependency
+
+
+async def not_modified_handler(request: Request, exc: NotModified) -> Response:
+    """
+    Ответ 304 без тела
+    """
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": exc.etag})
+
+
+class ETagMiddleware:
+    """
+    ASGI middleware: добавляет ETag, вычисленный зависимостью, к заголовкам ответа
+
+    Заголовки нельзя выставить через параметр Response в endpoint: endpoints,
+    которые сами возвращают Response (model_response), его не учитывают.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_etag(message):
+            if message["type"] == "http.response.start" and message["status"] == status.HTTP_200_OK:
+                etag = scope.get("state", {}).get("etag")
+                if etag:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"etag", etag.encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        await self.app(scope, receive, send_with_etag)
@@ -1,7 +1,8 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import Optional
+from typing import Dict, List, Optional
 from urllib.parse import quote_plus
 import os
+import tempfile
 from pathlib import Path
 
 
@@ -23,9 +24,45 @@ class Settings(BaseSettings):
     MYSQL_PORT: str = "3306"
     MYSQL_DB: str = "1day_db"
     
+    # Полный URL основной БД (вместо MYSQL_*), например sqlite:///./primary.db
+    DATABASE_PRIMARY_URL: Optional[str] = None
+    
+    # Реплики только для чтения (JSON список URL). Пустой список - всё
+    # читается с основной БД. Недоступная реплика пропускается
+    # REPLICA_RETRY_SECONDS секунд; после изменяющего запроса клиент
+    # READ_YOUR_WRITES_SECONDS секунд читает с основной БД
+    DATABASE_REPLICA_URLS: List[str] = []
+    REPLICA_RETRY_SECONDS: float = 30.0
+    READ_YOUR_WRITES_SECONDS: float = 5.0
+    
+    # Шарды по user_id (JSON: имя -> URL) в дополнение к основной БД, которая
+    # называется "default" и хранит аккаунты. Новые пользователи
+    # распределяются по кольцу консистентного хеширования (SHARD_VNODES
+    # точек на шард), перенесённые - по таблице user_shards. Привязка
+    # пользователя кешируется на SHARD_MAP_TTL_SECONDS
+    DATABASE_SHARD_URLS: Dict[str, str] = {}
+    SHARD_VNODES: int = 64
+    SHARD_MAP_TTL_SECONDS: float = 10.0
+    SHARD_MAP_MAX_USERS: int = 100_000
+    SHARD_MIGRATION_BATCH_SIZE: int = 500
+    
+    # Пул соединений на процесс (одинаковый для основной БД, реплик и шардов).
+    # DB_POOL_PRE_PING: "always" - проверка при каждой выдаче соединения,
+    # "idle" - только после DB_POOL_PING_IDLE_SECONDS простоя, "never" - без
+    # проверки. При запуске открывается DB_POOL_WARMUP соединений (см. app.pool)
+    DB_POOL_SIZE: int = 5
+    DB_POOL_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 3600
+    DB_POOL_PRE_PING: str = "idle"
+    DB_POOL_PING_IDLE_SECONDS: float = 30.0
+    DB_POOL_WARMUP: int = 2
+    
     # Формирование DATABASE_URL
     @property
     def DATABASE_URL(self) -> str:
+        if self.DATABASE_PRIMARY_URL:
+            return self.DATABASE_PRIMARY_URL
         # MySQL URL
         if self.MYSQL_PASSWORD:
             return f"mysql+pymysql://{self.MYSQL_USER}:{self.MYSQL_PASSWORD}@{self.MYSQL_SERVER}:{self.MYSQL_PORT}/{self.MYSQL_DB}?charset=utf8mb4"
@@ -37,6 +74,98 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     
+    # Отзыв токенов: фильтр Блума перед таблицей revoked_tokens
+    TOKEN_REVOCATION_FILTER_CAPACITY: int = 100_000
+    TOKEN_REVOCATION_FILTER_ERROR_RATE: float = 0.001
+    TOKEN_REVOCATION_SYNC_SECONDS: int = 30
+    
+    # Длина фрагмента текста в кратком представлении (view=summary)
+    NOTE_SNIPPET_LENGTH: int = 200
+    
+    # Сжатие текста заметок: тексты от NOTE_COMPRESS_MIN_BYTES байт хранятся
+    # сжатыми zlib; при NOTE_COMPRESSION=False новые тексты пишутся как есть,
+    # уже сжатые по-прежнему читаются
+    NOTE_COMPRESSION: bool = True
+    NOTE_COMPRESS_MIN_BYTES: int = 4096
+    NOTE_COMPRESSION_LEVEL: int = 6
+    
+    # Фрагменты поиска: радиус окна вокруг совпадения, число окон
+    # и максимальный участок текста, читаемый из БД для одной заметки
+    SEARCH_SNIPPET_RADIUS: int = 60
+    SEARCH_MAX_SNIPPETS: int = 3
+    SEARCH_SNIPPET_FETCH_LENGTH: int = 1000
+    
+    # Подсказки по заголовкам: число пользователей с индексом в памяти
+    # и время жизни индекса до перестроения
+    SUGGEST_MAX_USERS: int = 1000
+    SUGGEST_TTL_SECONDS: int = 600
+    
+    # Нечёткий поиск (mode=fuzzy): триграммные индексы в памяти
+    FUZZY_MAX_USERS: int = 200
+    FUZZY_TTL_SECONDS: int = 1800
+    FUZZY_SIMILARITY_THRESHOLD: float = 0.3
+    
+    # Похожие заметки: TF-IDF векторы в памяти
+    RELATED_MAX_USERS: int = 100
+    RELATED_TTL_SECONDS: int = 1800
+    
+    # Почти-дубликаты заметок: LSH индексы MinHash сигнатур
+    DUPLICATES_MAX_USERS: int = 200
+    DUPLICATES_TTL_SECONDS: int = 1800
+    DUPLICATE_SIMILARITY_THRESHOLD: float = 0.8
+    
+    # Кеш результатов списковых запросов (LRU в памяти процесса)
+    CACHE_ENABLED: bool = True
+    CACHE_MAX_ITEMS: int = 10_000
+    CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    CACHE_TTL_SECONDS: int = 300
+    
+    # Сводка /dashboard: время жизни в кеше (просроченные задачи зависят от времени)
+    DASHBOARD_CACHE_SECONDS: int = 60
+    DASHBOARD_TOP_STREAKS: int = 3
+    
+    # Синхронизация: курсор не сдвигается за записи журнала моложе
+    # SYNC_SETTLE_SECONDS (должно быть больше самой долгой транзакции записи),
+    # такие записи приходят клиенту повторно
+    SYNC_SETTLE_SECONDS: float = 30.0
+    
+    # Максимум id в одном запросе /batch?ids=
+    BATCH_MAX_IDS: int = 100
+    
+    # Максимум подзапросов в одном POST /batch
+    BATCH_MAX_REQUESTS: int = 20
+    
+    # Импорт: строк в одном многострочном INSERT
+    IMPORT_BATCH_SIZE: int = 1000
+    
+    # Выполнения привычек старше стольких дней переносятся в архив целыми
+    # месяцами; архивация запускается раз в ARCHIVE_INTERVAL_HOURS
+    COMPLETIONS_HOT_DAYS: int = 400
+    ARCHIVE_INTERVAL_HOURS: int = 24
+    ARCHIVE_BATCH_SIZE: int = 1000
+    
+    # Удаление аккаунта: строк в одном DELETE (одна короткая транзакция)
+    PURGE_BATCH_SIZE: int = 1000
+    
+    # Фоновые задачи: потоки для обработчиков, процессы для тяжёлых
+    # вычислений (0 - без пула процессов), лимиты по типам задач,
+    # время на завершение при остановке и каталог для файлов результатов
+    JOB_THREAD_WORKERS: int = 4
+    JOB_PROCESS_WORKERS: int = 0
+    JOB_CONCURRENCY: Dict[str, int] = {
+        "import": 1,
+        "export": 2,
+        "rebuild_indexes": 2,
+        "note_signatures": 1,
+        "purge_user": 1,
+        "archive_completions": 1,
+    }
+    JOB_SHUTDOWN_TIMEOUT: float = 30.0
+    # Аренда выполняющейся задачи: без продления дольше этого задача
+    # считается брошенной (воркер упал) и отмечается failed
+    JOB_LEASE_SECONDS: float = 60.0
+    JOB_RESULT_DIR: str = os.path.join(tempfile.gettempdir(), "diary-jobs")
+    
     # Настройки CORS
     BACKEND_CORS_ORIGINS: list = [
         "http://localhost:3000",
@@ -0,0 +1,183 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from typing import Dict, List, Optional, Set
+from datetime import date, datetime, timedelta
+from app.config import settings
+from app.models.note import Note
+from app.models.task import Task
+from app.models.habit import Habit, HabitCompletion, HabitFrequency
+from app.models.habit_archive import HabitCompletionRollup
+from app.crud.mood import get_mood_by_date
+from app.services import archive
+from app.services.cache import cached
+
+
+def count_tasks_by(db: Session, user_id: int, column) -> Dict[str, int]:
+    """
+    Число задач пользователя по значениям колонки (GROUP BY)
+    """
+    rows = db.query(column, func.count(Task.id)).filter(
+        Task.user_id == user_id
+    ).group_by(column).all()
+    return {value.value: count for value, count in rows}
+
+
+def count_overdue_tasks(db: Session, user_id: int, now: datetime) -> int:
+    """
+    Число незавершённых задач с истёкшим сроком
+    """
+    return db.query(func.count(Task.id)).filter(
+        Task.user_id == user_id,
+        Task.is_completed == False,
+        Task.due_date.isnot(None),
+        Task.due_date < now
+    ).scalar()
+
+
+def is_scheduled(frequency: HabitFrequency, weekdays, weekday: int) -> bool:
+    """
+    Показывается ли привычка в день недели weekday
+    """
+    if frequency == HabitFrequency.WEEKLY:
+        return bool(weekdays) and weekday in weekdays
+    return True
+
+
+def get_habit_progress(db: Session, user_id: int, target_date: date) -> Dict[str, int]:
+    """
+    Прогресс привычек за день: сколько запланировано и сколько выполнено
+    Выполнение weekly-привычки в незапланированный день не учитывается
+    """
+    # daily и custom показываются каждый день, weekly - по дням недели (JSON,
+    # фильтруется в Python, из БД читается только колонка weekdays)
+    total = db.query(func.count(Habit.id)).filter(
+        Habit.user_id == user_id,
+        Habit.is_active == True,
+        Habit.frequency != HabitFrequency.WEEKLY
+    ).scalar()
+    weekday = target_date.weekday()
+    weekly = db.query(Habit.weekdays).filter(
+        Habit.user_id == user_id,
+        Habit.is_active == True,
+        Habit.frequency == HabitFrequency.WEEKLY
+    ).all()
+    total += sum(1 for (weekdays,) in weekly if is_scheduled(HabitFrequency.WEEKLY, weekdays, weekday))
+
+    start = datetime.combine(target_date, datetime.min.time())
+    completed = db.query(Habit.frequency, Habit.weekdays).filter(
+        Habit.id.in_(
+            db.query(HabitCompletion.habit_id).filter(
+                HabitCompletion.completed_at >= start,
+                HabitCompletion.completed_at < start + timedelta(days=1)
+            )
+        ),
+        Habit.user_id == user_id,
+        Habit.is_active == True
+    ).all()
+    done = sum(1 for frequency, weekdays in completed if is_scheduled(frequency, weekdays, weekday))
+    return {"done": done, "total": total}
+
+
+def completion_days(db: Session, habit_ids: List[int], since: Optional[date], until: date) -> Dict[int, Set[date]]:
+    """
+    Уникальные дни выполнений привычек в горячей таблице за [since, until]
+    since=None - без нижней границы
+    """
+    day = func.date(HabitCompletion.completed_at)
+    query = db.query(HabitCompletion.habit_id, day).filter(
+        HabitCompletion.habit_id.in_(habit_ids),
+        HabitCompletion.completed_at < datetime.combine(until + timedelta(days=1), datetime.min.time())
+    )
+    if since is not None:
+        query = query.filter(HabitCompletion.completed_at >= datetime.combine(since, datetime.min.time()))
+
+    days: Dict[int, Set[date]] = {}
+    for habit_id, completed_day in query.distinct():
+        if isinstance(completed_day, str):
+            completed_day = date.fromisoformat(completed_day)
+        days.setdefault(habit_id, set()).add(completed_day)
+    return days
+
+
+def get_top_streaks(db: Session, user_id: int, target_date: date, limit: int) -> List[dict]:
+    """
+    Ежедневные привычки с самыми длинными текущими сериями
+    Серии считаются так же, как в /habits/{id}/streak: по горячей таблице
+    (только уникальные даты), а если серия уходит в архив - по месячным итогам
+    Читаются только привычки, выполненные в target_date, и только дни
+    от hot_boundary(); более старые дни и итоги - для серий, дошедших до неё
+    """
+    # Текущая серия есть только у привычек, выполненных в target_date
+    start = datetime.combine(target_date, datetime.min.time())
+    titles: Dict[int, str] = dict(db.query(Habit.id, Habit.title).filter(
+        Habit.id.in_(
+            db.query(HabitCompletion.habit_id).filter(
+                HabitCompletion.completed_at >= start,
+                HabitCompletion.completed_at < start + timedelta(days=1)
+            )
+        ),
+        Habit.user_id == user_id,
+        Habit.is_active == True,
+        Habit.frequency == HabitFrequency.DAILY
+    ).all())
+    if not titles:
+        return []
+
+    boundary = archive.hot_boundary(target_date)
+    days = completion_days(db, list(titles), boundary, target_date)
+    # Серия без пропусков от boundary до target_date может продолжаться
+    # в ещё не перенесённых строках и в архиве
+    window = (target_date - boundary).days + 1
+    reaching = [habit_id for habit_id, completed in days.items() if len(completed) >= window]
+    rollups: Dict[int, Dict[date, Dict[str, int]]] = {}
+    if reaching:
+        for habit_id, older in completion_days(db, reaching, None, boundary - timedelta(days=1)).items():
+            days[habit_id] |= older
+        for rollup in db.query(HabitCompletionRollup).filter(HabitCompletionRollup.habit_id.in_(reaching)):
+            rollups.setdefault(rollup.habit_id, {})[rollup.month] = {
+                "days": rollup.days,
+                "head_run": rollup.head_run,
+                "tail_run": rollup.tail_run,
+                "longest_run": rollup.longest_run,
+            }
+
+    streaks = []
+    for habit_id, title in titles.items():
+        streak, _ = archive.daily_streaks(
+            target_date,
+            days[habit_id],
+            rollups.get(habit_id, {}),
+            lambda month, habit_id=habit_id: archive.archived_days(db, habit_id, month, archive.next_month(month))
+        )
+        streaks.append({"habit_id": habit_id, "title": title, "current_streak": streak})
+
+    streaks.sort(key=lambda item: item["current_streak"], reverse=True)
+    return streaks[:limit]
+
+
+def count_notes_since(db: Session, user_id: int, since: date) -> int:
+    """
+    Число заметок, созданных начиная с даты
+    """
+    return db.query(func.count(Note.id)).filter(
+        Note.user_id == user_id,
+        Note.created_at >= datetime.combine(since, datetime.min.time())
+    ).scalar()
+
+
+@cached("note", "task", "mood", "habit", "habit_completion", ttl=settings.DASHBOARD_CACHE_SECONDS)
+def get_dashboard(db: Session, user_id: int, target_date: date) -> dict:
+    """
+    Сводка для главного экрана, каждый раздел - один агрегирующий запрос
+    """
+    week_start = target_date - timedelta(days=target_date.weekday())
+    return {
+        "date": target_date,
+        "mood": get_mood_by_date(db, user_id=user_id, mood_date=target_date),
+        "tasks_by_status": count_tasks_by(db, user_id, Task.status),
+        "tasks_by_priority": count_tasks_by(db, user_id, Task.priority),
+        "overdue_tasks": count_overdue_tasks(db, user_id, datetime.now()),
+        "habits_today": get_habit_progress(db, user_id, target_date),
+        "top_streaks": get_top_streaks(db, user_id, target_date, settings.DASHBOARD_TOP_STREAKS),
+        "notes_this_week": count_notes_since(db, user_id, week_start),
+    }
@@ -1,8 +1,14 @@
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Sequence, Union
 from datetime import datetime, date, timedelta
+from sqlalchemy import func
 from app.models.habit import Habit, HabitCompletion, HabitFrequency
+from app.models.habit_archive import HabitCompletionArchive, HabitCompletionRollup
 from app.schemas.habit import HabitCreate, HabitUpdate, HabitCompletionCreate
+from app.crud.sync import record_change, record_changes, DELETE
+from app.services.indexing import on_saved, on_deleted
+from app.services.cache import cached
+from app.services import archive
 
 
 # ===== Habit CRUD =====
@@ -17,6 +23,17 @@ def get_habit(db: Session, habit_id: int, user_id: int) -> Optional[Habit]:
     ).first()
 
 
+def get_habits_by_ids(db: Session, user_id: int, habit_ids: Sequence[int]) -> List[Habit]:
+    """
+    Получить привычки пользователя по списку id одним запросом
+    """
+    return db.query(Habit).filter(
+        Habit.user_id == user_id,
+        Habit.id.in_(habit_ids)
+    ).all()
+
+
+@cached("habit")
 def get_habits(db: Session, user_id: int, skip: int = 0, limit: int = 100, active_only: bool = False) -> List[Habit]:
     """
     Получить список привычек пользователя
@@ -38,8 +55,11 @@ def create_habit(db: Session, habit: HabitCreate, user_id: int) -> Habit:
         user_id=user_id
     )
     db.add(db_habit)
+    db.flush()
+    record_change(db, user_id, "habit", db_habit.id)
     db.commit()
     db.refresh(db_habit)
+    on_saved(user_id, "habit", db_habit)
     return db_habit
 
 
@@ -56,8 +76,10 @@ def update_habit(db: Session, habit_id: int, habit: HabitUpdate, user_id: int) -
     for field, value in update_data.items():
         setattr(db_habit, field, value)
     
+    record_change(db, user_id, "habit", habit_id)
     db.commit()
     db.refresh(db_habit)
+    on_saved(user_id, "habit", db_habit)
     return db_habit
 
 
@@ -69,22 +91,48 @@ def delete_habit(db: Session, habit_id: int, user_id: int) -> bool:
     if not db_habit:
         return False
     
+    # Выполнения удаляются каскадом - для них тоже нужны tombstone
+    completion_ids = [
+        row[0] for row in db.query(HabitCompletion.id).filter(HabitCompletion.habit_id == habit_id)
+    ]
+    completion_ids += [
+        row[0] for row in db.query(HabitCompletionArchive.id).filter(HabitCompletionArchive.habit_id == habit_id)
+    ]
+    
+    # Архив не связан с привычкой через ORM, его строки удаляются явно
+    db.query(HabitCompletionArchive).filter(
+        HabitCompletionArchive.habit_id == habit_id
+    ).delete(synchronize_session=False)
+    db.query(HabitCompletionRollup).filter(
+        HabitCompletionRollup.habit_id == habit_id
+    ).delete(synchronize_session=False)
     db.delete(db_habit)
+    record_change(db, user_id, "habit", habit_id, DELETE)
+    record_changes(db, user_id, "habit_completion", completion_ids, DELETE)
     db.commit()
+    on_deleted(user_id, "habit", habit_id)
     return True
 
 
 # ===== HabitCompletion CRUD =====
 
-def get_completion(db: Session, completion_id: int) -> Optional[HabitCompletion]:
+def get_completion(
+    db: Session, completion_id: int
+) -> Optional[Union[HabitCompletion, HabitCompletionArchive]]:
     """
-    Получить выполнение привычки по ID
+    Получить выполнение привычки по ID (если его нет в основной таблице - из архива)
     """
-    return db.query(HabitCompletion).filter(
+    completion = db.query(HabitCompletion).filter(
         HabitCompletion.id == completion_id
     ).first()
+    if completion is None:
+        completion = db.query(HabitCompletionArchive).filter(
+            HabitCompletionArchive.id == completion_id
+        ).first()
+    return completion
 
 
+@cached("habit", "habit_completion")
 def get_completions_for_habit(
     db: Session, 
     habit_id: int, 
@@ -94,17 +142,33 @@ def get_completions_for_habit(
 ) -> List[HabitCompletion]:
     """
     Получить все выполнения конкретной привычки
+    Сначала новые; когда основная таблица заканчивается, продолжение читается из архива
     """
     # Проверяем, что привычка принадлежит пользователю
     habit = get_habit(db, habit_id, user_id)
     if not habit:
         return []
     
-    return db.query(HabitCompletion).filter(
+    completions = db.query(HabitCompletion).filter(
         HabitCompletion.habit_id == habit_id
     ).order_by(HabitCompletion.completed_at.desc()).offset(skip).limit(limit).all()
+    if len(completions) == limit:
+        return completions
+    
+    if completions:
+        hot_total = skip + len(completions)
+    else:
+        hot_total = db.query(func.count(HabitCompletion.id)).filter(
+            HabitCompletion.habit_id == habit_id
+        ).scalar()
+    return completions + db.query(HabitCompletionArchive).filter(
+        HabitCompletionArchive.habit_id == habit_id
+    ).order_by(HabitCompletionArchive.completed_at.desc()).offset(
+        max(0, skip - hot_total)
+    ).limit(limit - len(completions)).all()
 
 
+@cached("habit", "habit_completion")
 def get_completions_by_date(
     db: Session, 
     user_id: int, 
@@ -120,11 +184,18 @@ def get_completions_by_date(
     habit_ids = db.query(Habit.id).filter(Habit.user_id == user_id).all()
     habit_ids = [h[0] for h in habit_ids]
     
-    return db.query(HabitCompletion).filter(
+    completions = db.query(HabitCompletion).filter(
         HabitCompletion.habit_id.in_(habit_ids),
         HabitCompletion.completed_at >= start_datetime,
         HabitCompletion.completed_at <= end_datetime
     ).all()
+    if archive.needs_archive(target_date):
+        completions += db.query(HabitCompletionArchive).filter(
+            HabitCompletionArchive.habit_id.in_(habit_ids),
+            HabitCompletionArchive.completed_at >= start_datetime,
+            HabitCompletionArchive.completed_at <= end_datetime
+        ).all()
+    return completions
 
 
 def complete_habit(
@@ -147,6 +218,8 @@ def complete_habit(
         note=completion.note
     )
     db.add(db_completion)
+    db.flush()
+    record_change(db, user_id, "habit_completion", db_completion.id)
     db.commit()
     db.refresh(db_completion)
     return db_completion
@@ -169,6 +242,10 @@ def uncomplete_habit(db: Session, completion_id: int, user_id: int) -> bool:
         return False
     
     db.delete(db_completion)
+    if isinstance(db_completion, HabitCompletionArchive):
+        db.flush()
+        archive.refresh_rollup(db, habit.id, archive.month_start(db_completion.completed_at.date()))
+    record_change(db, user_id, "habit_completion", completion_id, DELETE)
     db.commit()
     return True
 
@@ -185,54 +262,45 @@ def get_habit_streak(db: Session, habit_id: int, user_id: int) -> dict:
             "total_completions": 0
         }
     
-    # Получаем все выполнения привычки
-    completions = db.query(HabitCompletion).filter(
-        HabitCompletion.habit_id == habit_id
-    ).order_by(HabitCompletion.completed_at.desc()).all()
+    # Горячие выполнения читаются целиком, архивные - по месячным итогам
+    hot_dates = [
+        completed_at for (completed_at,) in db.query(HabitCompletion.completed_at).filter(
+            HabitCompletion.habit_id == habit_id
+        )
+    ]
+    rollups = archive.get_rollups(db, habit_id)
+    total_completions = len(hot_dates) + sum(rollup.completions for rollup in rollups.values())
     
-    if not completions:
+    if not total_completions:
         return {
             "current_streak": 0,
             "longest_streak": 0,
             "total_completions": 0
         }
     
-    # Считаем текущий streak
+    # Серии считаются только для daily привычек
     current_streak = 0
-    today = date.today()
-    check_date = today
-    
-    completion_dates = set(c.completed_at.date() for c in completions)
-    
-    # Для daily привычек
+    longest_streak = 1
     if habit.frequency == HabitFrequency.DAILY:
-        while check_date in completion_dates:
-            current_streak += 1
-            check_date -= timedelta(days=1)
-    
-    # Считаем самый длинный streak
-    longest_streak = 0
-    temp_streak = 0
-    sorted_dates = sorted(completion_dates, reverse=True)
-    
-    for i, comp_date in enumerate(sorted_dates):
-        if i == 0:
-            temp_streak = 1
-        else:
-            prev_date = sorted_dates[i - 1]
-            if habit.frequency == HabitFrequency.DAILY:
-                if (prev_date - comp_date).days == 1:
-                    temp_streak += 1
-                else:
-                    longest_streak = max(longest_streak, temp_streak)
-                    temp_streak = 1
-    
-    longest_streak = max(longest_streak, temp_streak)
+        current_streak, longest_streak = archive.daily_streaks(
+            date.today(),
+            {completed_at.date() for completed_at in hot_dates},
+            {
+                month: {
+                    "days": rollup.days,
+                    "head_run": rollup.head_run,
+                    "tail_run": rollup.tail_run,
+                    "longest_run": rollup.longest_run,
+                }
+                for month, rollup in rollups.items()
+            },
+            lambda month: archive.archived_days(db, habit_id, month, archive.next_month(month))
+        )
     
     return {
         "current_streak": current_streak,
         "longest_streak": longest_streak,
-        "total_completions": len(completions)
+        "total_completions": total_completions
     }
 
 
@@ -4,6 +4,8 @@ from typing import List, Optional
 from datetime import date, datetime, timedelta
 from app.models.mood import Mood, MoodLevel
 from app.schemas.mood import MoodCreate, MoodUpdate
+from app.crud.sync import record_change, DELETE
+from app.services.cache import cached
 
 
 def get_mood(db: Session, mood_id: int, user_id: int) -> Optional[Mood]:
@@ -26,6 +28,7 @@ def get_mood_by_date(db: Session, user_id: int, mood_date: date) -> Optional[Moo
     ).first()
 
 
+@cached("mood")
 def get_moods(db: Session, user_id: int, skip: int = 0, limit: int = 100) -> List[Mood]:
     """
     Получить список записей настроения пользователя
@@ -35,6 +38,7 @@ def get_moods(db: Session, user_id: int, skip: int = 0, limit: int = 100) -> Lis
     ).order_by(Mood.mood_date.desc()).offset(skip).limit(limit).all()
 
 
+@cached("mood")
 def get_moods_by_date_range(db: Session, user_id: int, start_date: date, end_date: date) -> List[Mood]:
     """
     Получить записи настроения за период
@@ -46,6 +50,7 @@ def get_moods_by_date_range(db: Session, user_id: int, start_date: date, end_dat
     ).order_by(Mood.mood_date.asc()).all()
 
 
+@cached("mood")
 def get_moods_by_month(db: Session, user_id: int, year: int, month: int) -> List[Mood]:
     """
     Получить записи настроения за конкретный месяц
@@ -74,6 +79,7 @@ def create_mood(db: Session, mood: MoodCreate, user_id: int) -> Mood:
         # Обновляем существующую запись
         for field, value in mood.model_dump().items():
             setattr(existing_mood, field, value)
+        record_change(db, user_id, "mood", existing_mood.id)
         db.commit()
         db.refresh(existing_mood)
         return existing_mood
@@ -84,6 +90,8 @@ def create_mood(db: Session, mood: MoodCreate, user_id: int) -> Mood:
         user_id=user_id
     )
     db.add(db_mood)
+    db.flush()
+    record_change(db, user_id, "mood", db_mood.id)
     db.commit()
     db.refresh(db_mood)
     return db_mood
@@ -102,6 +110,7 @@ def update_mood(db: Session, mood_id: int, mood: MoodUpdate, user_id: int) -> Op
     for field, value in update_data.items():
         setattr(db_mood, field, value)
     
+    record_change(db, user_id, "mood", mood_id)
     db.commit()
     db.refresh(db_mood)
     return db_mood
@@ -116,6 +125,7 @@ def delete_mood(db: Session, mood_id: int, user_id: int) -> bool:
         return False
     
     db.delete(db_mood)
+    record_change(db, user_id, "mood", mood_id, DELETE)
     db.commit()
     return True
 
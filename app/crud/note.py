@@ -1,29 +1,121 @@
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from sqlalchemy import and_, exists, or_
+from sqlalchemy.orm import Session, load_only, undefer
+from itertools import islice
+from typing import List, Optional, Sequence
 from datetime import datetime, date
+from app.config import settings
 from app.models.note import Note
+from app.models.note_signature import NoteSignature
+from app.models.note_words import NoteWords
+from app.models.types import compressed_flag, is_compressed, text_prefix
 from app.schemas.note import NoteCreate, NoteUpdate
+from app.crud.sync import record_change, DELETE
+from app.services.indexing import on_saved, on_deleted
+from app.services.minhash import signature_bytes
+from app.services.cache import cached
 
 
-def get_note(db: Session, note_id: int, user_id: int) -> Optional[Note]:
+def get_note(db: Session, note_id: int, user_id: int, with_content: bool = True) -> Optional[Note]:
     """
     Получить заметку по ID
+    with_content=False - не читать текст (Note.content_raw загружается отложенно)
     """
-    return db.query(Note).filter(
+    query = db.query(Note).filter(
         Note.id == note_id,
         Note.user_id == user_id
-    ).first()
+    )
+    if with_content:
+        query = query.options(undefer(Note.content_raw))
+    return query.first()
+
+
+def get_notes_by_ids(db: Session, user_id: int, note_ids: Sequence[int]) -> List[Note]:
+    """
+    Получить заметки пользователя по списку id одним запросом
+    """
+    return db.query(Note).options(undefer(Note.content_raw)).filter(
+        Note.user_id == user_id,
+        Note.id.in_(note_ids)
+    ).all()
+
+
+def note_exists(db: Session, note_id: int, user_id: int) -> bool:
+    """
+    Проверить, что заметка существует и принадлежит пользователю (без чтения текста)
+    """
+    return db.query(Note.id).filter(
+        Note.id == note_id,
+        Note.user_id == user_id
+    ).first() is not None
 
 
-def get_notes(db: Session, user_id: int, skip: int = 0, limit: int = 100) -> List[Note]:
+def get_note_titles(db: Session, user_id: int, note_ids: Sequence[int]) -> list:
+    """
+    Получить id, заголовок и дату создания для списка заметок
+    """
+    if not note_ids:
+        return []
+    return db.query(Note.id, Note.title, Note.created_at).filter(
+        Note.user_id == user_id,
+        Note.id.in_(note_ids)
+    ).all()
+
+
+def _note_column(field: str):
+    # content - вычисляемый атрибут поверх хранимой колонки content_raw
+    return Note.content_raw if field == "content" else getattr(Note, field)
+
+
+@cached("note")
+def get_notes(
+    db: Session,
+    user_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    fields: Optional[Sequence[str]] = None
+) -> List[Note]:
     """
     Получить список заметок пользователя с пагинацией
+    fields - загрузить только перечисленные колонки (остальные не читаются из БД)
+    """
+    query = db.query(Note).filter(Note.user_id == user_id)
+    
+    if fields:
+        query = query.options(load_only(*[_note_column(field) for field in fields]))
+    else:
+        query = query.options(undefer(Note.content_raw))
+    
+    return query.offset(skip).limit(limit).all()
+
+
+@cached("note")
+def get_note_summaries(db: Session, user_id: int, skip: int = 0, limit: int = 100) -> list:
     """
-    return db.query(Note).filter(
+    Получить краткие записи заметок: id, заголовок, фрагмент текста и даты
+    Фрагмент вырезается на стороне БД, полный текст не передаётся
+    """
+    return db.query(
+        Note.id,
+        Note.title,
+        text_prefix(Note.content_raw, settings.NOTE_SNIPPET_LENGTH).label("snippet"),
+        Note.created_at,
+        Note.updated_at
+    ).filter(
         Note.user_id == user_id
     ).offset(skip).limit(limit).all()
 
 
+def _update_signature(db_note: Note, user_id: int) -> None:
+    """
+    Пересчитать MinHash сигнатуру заметки (для поиска дубликатов)
+    """
+    data = signature_bytes(f"{db_note.title} {db_note.content}")
+    if db_note.signature is not None:
+        db_note.signature.signature = data
+    else:
+        db_note.signature = NoteSignature(user_id=user_id, signature=data)
+
+
 def create_note(db: Session, note: NoteCreate, user_id: int) -> Note:
     """
     Создать новую заметку
@@ -32,9 +124,13 @@ def create_note(db: Session, note: NoteCreate, user_id: int) -> Note:
         **note.model_dump(),
         user_id=user_id
     )
+    _update_signature(db_note, user_id)
     db.add(db_note)
+    db.flush()
+    record_change(db, user_id, "note", db_note.id)
     db.commit()
     db.refresh(db_note)
+    on_saved(user_id, "note", db_note)
     return db_note
 
 
@@ -51,8 +147,13 @@ def update_note(db: Session, note_id: int, note: NoteUpdate, user_id: int) -> Op
     for field, value in update_data.items():
         setattr(db_note, field, value)
     
+    if "title" in update_data or "content" in update_data:
+        _update_signature(db_note, user_id)
+    
+    record_change(db, user_id, "note", note_id)
     db.commit()
     db.refresh(db_note)
+    on_saved(user_id, "note", db_note)
     return db_note
 
 
@@ -60,35 +161,77 @@ def delete_note(db: Session, note_id: int, user_id: int) -> bool:
     """
     Удалить заметку
     """
-    db_note = get_note(db, note_id, user_id)
+    db_note = get_note(db, note_id, user_id, with_content=False)
     if not db_note:
         return False
     
     db.delete(db_note)
+    record_change(db, user_id, "note", note_id, DELETE)
     db.commit()
+    on_deleted(user_id, "note", note_id)
     return True
 
 
+def note_search_filter(query: str):
+    """
+    Условие поиска подстроки query в заголовке или тексте заметки
+
+    Несжатые тексты проверяет LIKE, сжатые - LIKE по словам текста
+    (таблица note_words). Для запроса без пробелов условие точное, для фразы
+    сжатые заметки только отбираются, совпадение проверяет note_matches.
+    """
+    search_pattern = f"%{query}%"
+    compressed = compressed_flag(Note.content_raw)
+    return or_(
+        Note.title.ilike(search_pattern),
+        and_(~compressed, Note.content_raw.ilike(search_pattern)),
+        and_(compressed, exists().where(
+            NoteWords.note_id == Note.id,
+            *[NoteWords.words.like(f"%{word}%") for word in query.lower().split()]
+        ))
+    )
+
+
+def note_matches(title: str, text: str, query: str) -> bool:
+    """
+    Проверка сжатой заметки, отобранной note_search_filter
+    """
+    needle = query.lower()
+    return needle in title.lower() or needle in text.lower()
+
+
 def search_notes(db: Session, user_id: int, query: str, skip: int = 0, limit: int = 100) -> List[Note]:
     """
     Поиск заметок по заголовку или содержимому
+    Сжатые тексты распаковываются только у отобранных по словам заметок,
+    совпадающих не по заголовку
     """
-    search_pattern = f"%{query}%"
-    return db.query(Note).filter(
+    rows = db.query(Note).options(undefer(Note.content_raw)).filter(
         Note.user_id == user_id,
-        (Note.title.ilike(search_pattern) | Note.content.ilike(search_pattern))
-    ).offset(skip).limit(limit).all()
+        note_search_filter(query)
+    ).order_by(Note.id.asc()).yield_per(100)
+    
+    matches = (
+        note for note in rows
+        if not is_compressed(note.content_raw) or note_matches(note.title, note.content, query)
+    )
+    return list(islice(matches, skip, skip + limit))
 
 
-def get_notes_by_date(db: Session, user_id: int, target_date: date) -> List[Note]:
+@cached("note")
+def get_notes_by_date(db: Session, user_id: int, target_date: date, with_content: bool = True) -> List[Note]:
     """
     Получить заметки, созданные в определенную дату
+    with_content=False - без текста заметок (для краткого вида дня)
     """
     start_datetime = datetime.combine(target_date, datetime.min.time())
     end_datetime = datetime.combine(target_date, datetime.max.time())
     
-    return db.query(Note).filter(
+    query = db.query(Note).filter(
         Note.user_id == user_id,
         Note.created_at >= start_datetime,
         Note.created_at <= end_datetime
-    ).order_by(Note.created_at.desc()).all()
\ No newline at end of file
+    )
+    if with_content:
+        query = query.options(undefer(Note.content_raw))
+    return query.order_by(Note.created_at.desc()).all()
\ No newline at end of file
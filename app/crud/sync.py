@@ -0,0 +1,210 @@
+from sqlalchemy.orm import Session, undefer
+from sqlalchemy import func, insert
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+from app.config import settings
+from app.models.change_log import ChangeLog
+from app.models.note import Note
+from app.models.task import Task
+from app.models.mood import Mood
+from app.models.habit import Habit, HabitCompletion
+from app.models.habit_archive import HabitCompletionArchive
+from app.services.cache import PENDING_CHANGES_KEY
+
+UPSERT = "upsert"
+DELETE = "delete"
+
+# Синхронизируемые сущности: имя в журнале -> модель
+SYNC_ENTITIES = {
+    "note": Note,
+    "task": Task,
+    "mood": Mood,
+    "habit": Habit,
+    "habit_completion": HabitCompletion,
+}
+
+# Архивные таблицы: их записи для клиента ничем не отличаются от основных
+ARCHIVED_ENTITIES = {
+    "habit_completion": HabitCompletionArchive,
+}
+
+
+def record_change(db: Session, user_id: int, entity: str, entity_id: int, op: str = UPSERT) -> None:
+    """
+    Записать изменение в журнал
+    Вызывается до commit, чтобы запись и журнал фиксировались одной транзакцией
+    """
+    db.info.setdefault(PENDING_CHANGES_KEY, set()).add((user_id, entity))
+    db.query(ChangeLog).filter(
+        ChangeLog.user_id == user_id,
+        ChangeLog.entity == entity,
+        ChangeLog.entity_id == entity_id
+    ).delete(synchronize_session=False)
+    db.add(ChangeLog(user_id=user_id, entity=entity, entity_id=entity_id, op=op))
+
+
+def record_changes(db: Session, user_id: int, entity: str, entity_ids: Sequence[int], op: str = UPSERT) -> None:
+    """
+    Записать одинаковое изменение для нескольких записей
+    """
+    if not entity_ids:
+        return
+    db.info.setdefault(PENDING_CHANGES_KEY, set()).add((user_id, entity))
+    db.query(ChangeLog).filter(
+        ChangeLog.user_id == user_id,
+        ChangeLog.entity == entity,
+        ChangeLog.entity_id.in_(entity_ids)
+    ).delete(synchronize_session=False)
+    db.execute(insert(ChangeLog), [
+        {"user_id": user_id, "entity": entity, "entity_id": entity_id, "op": op}
+        for entity_id in entity_ids
+    ])
+
+
+def record_moved(db: Session, user_id: int, changes: Dict[str, Sequence[int]], first_seq: int) -> None:
+    """
+    Журнал для записей, перенесённых с другого шарда: upsert каждой записи
+    с номерами от first_seq (больше любого курсора, выданного старым шардом)
+    """
+    db.info.setdefault(PENDING_CHANGES_KEY, set()).update((user_id, entity) for entity in changes)
+    rows = [
+        {"user_id": user_id, "entity": entity, "entity_id": entity_id, "op": UPSERT}
+        for entity, entity_ids in changes.items()
+        for entity_id in entity_ids
+    ]
+    for offset, row in enumerate(rows):
+        row["seq"] = first_seq + offset
+    if rows:
+        db.execute(insert(ChangeLog), rows)
+
+
+def get_last_seq(db: Session) -> int:
+    """
+    Последний номер журнала в БД (по всем пользователям)
+    """
+    return db.query(func.max(ChangeLog.seq)).scalar() or 0
+
+
+def settled_cutoff(db: Session) -> datetime:
+    """
+    Момент по часам БД, раньше которого все записи журнала уже видны
+
+    seq выдаётся при вставке, а не при commit: параллельные транзакции
+    могут зафиксироваться не по порядку номеров. Курсор не сдвигается
+    за записи моложе SYNC_SETTLE_SECONDS - транзакция с меньшим номером
+    могла ещё не завершиться. Такие записи отдаются повторно при
+    следующей синхронизации (повтор upsert и tombstone безопасен).
+    """
+    return db.query(func.now()).scalar() - timedelta(seconds=settings.SYNC_SETTLE_SECONDS)
+
+
+def get_snapshot_cursor(db: Session, user_id: int) -> int:
+    """
+    Курсор для полного снимка: следующий номер после последнего
+    устоявшегося изменения пользователя (не меньше 1)
+    """
+    last = db.query(ChangeLog.seq).filter(
+        ChangeLog.user_id == user_id,
+        ChangeLog.changed_at <= settled_cutoff(db)
+    ).order_by(ChangeLog.seq.desc()).limit(1).scalar()
+    return (last or 0) + 1
+
+
+def get_version(db: Session, user_id: int, entities: Sequence[str]) -> int:
+    """
+    Версия данных пользователя по набору сущностей: номер последнего изменения
+    Меняется при любой записи или удалении, строки самих сущностей не читаются
+    """
+    return db.query(func.max(ChangeLog.seq)).filter(
+        ChangeLog.user_id == user_id,
+        ChangeLog.entity.in_(entities)
+    ).scalar() or 0
+
+
+def get_changes(db: Session, user_id: int, since: int, limit: int) -> Tuple[List[ChangeLog], bool, int]:
+    """
+    Изменения с номером не меньше курсора since в порядке seq
+    Возвращает не больше limit записей, признак, что есть ещё, и новый курсор
+    (номер после последней устоявшейся записи, см. settled_cutoff)
+    """
+    entries = db.query(ChangeLog).filter(
+        ChangeLog.user_id == user_id,
+        ChangeLog.seq >= since
+    ).order_by(ChangeLog.seq.asc()).limit(limit + 1).all()
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    cursor = since
+    if entries:
+        cutoff = settled_cutoff(db)
+        for entry in entries:
+            if entry.changed_at is None or entry.changed_at > cutoff:
+                break
+            cursor = entry.seq + 1
+    # Страница из одних неустоявшихся записей: курсор не сдвинулся, клиенту
+    # не нужно сразу запрашивать её снова
+    return entries, has_more and cursor > since, cursor
+
+
+def _user_query(db: Session, model, user_id: int):
+    # Синхронизация и выгрузка отдают записи целиком, включая отложенные колонки
+    query = db.query(model).options(undefer("*"))
+    if model is HabitCompletion or model is HabitCompletionArchive:
+        return query.join(Habit, Habit.id == model.habit_id).filter(Habit.user_id == user_id)
+    return query.filter(model.user_id == user_id)
+
+
+def _entity_models(entity: str) -> list:
+    models = [SYNC_ENTITIES[entity]]
+    if entity in ARCHIVED_ENTITIES:
+        models.append(ARCHIVED_ENTITIES[entity])
+    return models
+
+
+def get_entities(db: Session, user_id: int, entity: str, entity_ids: Sequence[int]) -> list:
+    """
+    Загрузить записи одного типа по списку id (и из архива, если он есть)
+    """
+    if not entity_ids:
+        return []
+    return [
+        item
+        for model in _entity_models(entity)
+        for item in _user_query(db, model, user_id).filter(model.id.in_(entity_ids))
+    ]
+
+
+def get_snapshot_page(
+    db: Session,
+    user_id: int,
+    after: Optional[Tuple[str, int]],
+    limit: int
+) -> Tuple[Dict[str, list], Optional[Tuple[str, int]]]:
+    """
+    Страница полного снимка: не больше limit записей по порядку
+    (сущность в порядке SYNC_ENTITIES, затем id) после позиции after
+    Возвращает записи по сущностям и позицию для следующей страницы
+    (None - снимок закончился)
+    """
+    entities = list(SYNC_ENTITIES)
+    start = entities.index(after[0]) if after is not None else 0
+    page: Dict[str, list] = {}
+    remaining = limit
+    for entity in entities[start:]:
+        after_id = after[1] if after is not None and entity == after[0] else 0
+        items = sorted(
+            (
+                item
+                for model in _entity_models(entity)
+                for item in _user_query(db, model, user_id).filter(
+                    model.id > after_id
+                ).order_by(model.id.asc()).limit(remaining + 1)
+            ),
+            key=lambda item: item.id
+        )
+        page[entity] = items[:remaining]
+        if len(items) > remaining:
+            last_id = page[entity][-1].id if page[entity] else after_id
+            return page, (entity, last_id)
+        remaining -= len(items)
+    return page, None
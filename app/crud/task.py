@@ -1,44 +1,81 @@
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from sqlalchemy.orm import Session, undefer
+from typing import List, Optional, Sequence
 from datetime import datetime, date
 from app.models.task import Task, TaskStatus
 from app.schemas.task import TaskCreate, TaskUpdate
+from app.crud.sync import record_change, DELETE
+from app.services.indexing import on_saved, on_deleted
+from app.services.cache import cached
 
 
-def get_task(db: Session, task_id: int, user_id: int) -> Optional[Task]:
+def get_task(db: Session, task_id: int, user_id: int, with_description: bool = True) -> Optional[Task]:
     """
     Получить задачу по ID
+    with_description=False - не читать описание (Task.description загружается отложенно)
     """
-    return db.query(Task).filter(
+    query = db.query(Task).filter(
         Task.id == task_id,
         Task.user_id == user_id
-    ).first()
+    )
+    if with_description:
+        query = query.options(undefer(Task.description))
+    return query.first()
+
+
+def get_tasks_by_ids(db: Session, user_id: int, task_ids: Sequence[int]) -> List[Task]:
+    """
+    Получить задачи пользователя по списку id одним запросом
+    """
+    return db.query(Task).options(undefer(Task.description)).filter(
+        Task.user_id == user_id,
+        Task.id.in_(task_ids)
+    ).all()
 
 
-def get_tasks(db: Session, user_id: int, skip: int = 0, limit: int = 100) -> List[Task]:
+@cached("task")
+def get_tasks(
+    db: Session,
+    user_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    with_description: bool = True
+) -> List[Task]:
     """
     Получить список задач пользователя с пагинацией
     """
-    return db.query(Task).filter(
-        Task.user_id == user_id
-    ).order_by(Task.created_at.desc()).offset(skip).limit(limit).all()
+    query = db.query(Task).filter(Task.user_id == user_id)
+    if with_description:
+        query = query.options(undefer(Task.description))
+    return query.order_by(Task.created_at.desc()).offset(skip).limit(limit).all()
 
 
-def get_tasks_by_status(db: Session, user_id: int, status: TaskStatus, skip: int = 0, limit: int = 100) -> List[Task]:
+@cached("task")
+def get_tasks_by_status(
+    db: Session,
+    user_id: int,
+    status: TaskStatus,
+    skip: int = 0,
+    limit: int = 100,
+    with_description: bool = True
+) -> List[Task]:
     """
     Получить задачи по статусу
     """
-    return db.query(Task).filter(
+    query = db.query(Task).filter(
         Task.user_id == user_id,
         Task.status == status
-    ).order_by(Task.created_at.desc()).offset(skip).limit(limit).all()
+    )
+    if with_description:
+        query = query.options(undefer(Task.description))
+    return query.order_by(Task.created_at.desc()).offset(skip).limit(limit).all()
 
 
+@cached("task")
 def get_completed_tasks(db: Session, user_id: int, skip: int = 0, limit: int = 100) -> List[Task]:
     """
     Получить завершенные задачи
     """
-    return db.query(Task).filter(
+    return db.query(Task).options(undefer(Task.description)).filter(
         Task.user_id == user_id,
         Task.is_completed == True
     ).order_by(Task.completed_at.desc()).offset(skip).limit(limit).all()
@@ -53,8 +90,11 @@ def create_task(db: Session, task: TaskCreate, user_id: int) -> Task:
         user_id=user_id
     )
     db.add(db_task)
+    db.flush()
+    record_change(db, user_id, "task", db_task.id)
     db.commit()
     db.refresh(db_task)
+    on_saved(user_id, "task", db_task)
     return db_task
 
 
@@ -77,8 +117,10 @@ def update_task(db: Session, task_id: int, task: TaskUpdate, user_id: int) -> Op
     for field, value in update_data.items():
         setattr(db_task, field, value)
     
+    record_change(db, user_id, "task", task_id)
     db.commit()
     db.refresh(db_task)
+    on_saved(user_id, "task", db_task)
     return db_task
 
 
@@ -86,12 +128,14 @@ def delete_task(db: Session, task_id: int, user_id: int) -> bool:
     """
     Удалить задачу
     """
-    db_task = get_task(db, task_id, user_id)
+    db_task = get_task(db, task_id, user_id, with_description=False)
     if not db_task:
         return False
     
     db.delete(db_task)
+    record_change(db, user_id, "task", task_id, DELETE)
     db.commit()
+    on_deleted(user_id, "task", task_id)
     return True
 
 
@@ -107,20 +151,26 @@ def mark_task_completed(db: Session, task_id: int, user_id: int) -> Optional[Tas
     setattr(db_task, "completed_at", datetime.now())
     setattr(db_task, "status", TaskStatus.COMPLETED)
     
+    record_change(db, user_id, "task", task_id)
     db.commit()
     db.refresh(db_task)
     return db_task
 
 
-def get_tasks_by_date(db: Session, user_id: int, target_date: date) -> List[Task]:
+@cached("task")
+def get_tasks_by_date(db: Session, user_id: int, target_date: date, with_description: bool = True) -> List[Task]:
     """
     Получить задачи, созданные в определенную дату
+    with_description=False - без описаний (для краткого вида дня)
     """
     start_datetime = datetime.combine(target_date, datetime.min.time())
     end_datetime = datetime.combine(target_date, datetime.max.time())
     
-    return db.query(Task).filter(
+    query = db.query(Task).filter(
         Task.user_id == user_id,
         Task.created_at >= start_datetime,
         Task.created_at <= end_datetime
-    ).order_by(Task.created_at.desc()).all()
\ No newline at end of file
+    )
+    if with_description:
+        query = query.options(undefer(Task.description))
+    return query.order_by(Task.created_at.desc()).all()
\ No newline at end of file
@@ -1,7 +1,21 @@
+from sqlalchemy import delete, exists, insert
 from sqlalchemy.orm import Session
-from typing import Optional
+from typing import Callable, Dict, List, Optional
 from passlib.context import CryptContext
+from app.database import shard_map
+from app.sharding import DEFAULT_SHARD
 from app.models.user import User
+from app.models.note import Note
+from app.models.note_signature import NoteSignature
+from app.models.note_words import NoteWords
+from app.models.task import Task
+from app.models.mood import Mood
+from app.models.habit import Habit, HabitCompletion
+from app.models.habit_archive import HabitCompletionArchive, HabitCompletionRollup
+from app.models.change_log import ChangeLog
+from app.models.job import Job
+from app.models.pending_deletion import PendingDeletion
+from app.models.user_shard import UserShard
 from app.schemas.user import UserCreate, UserUpdate
 
 # Контекст для хеширования паролей
@@ -26,11 +40,16 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+# Условие "аккаунт не ожидает удаления"
+NOT_PENDING_DELETION = ~exists().where(PendingDeletion.user_id == User.id)
+
+
 def get_user(db: Session, user_id: int) -> Optional[User]:
     """
     Получить пользователя по ID
+    Аккаунты, ожидающие удаления, не возвращаются
     """
-    return db.query(User).filter(User.id == user_id).first()
+    return db.query(User).filter(User.id == user_id, NOT_PENDING_DELETION).first()
 
 
 def get_user_by_email(db: Session, email: str) -> Optional[User]:
@@ -40,11 +59,16 @@ def get_user_by_email(db: Session, email: str) -> Optional[User]:
     return db.query(User).filter(User.email == email).first()
 
 
-def get_user_by_username(db: Session, username: str) -> Optional[User]:
+def get_user_by_username(db: Session, username: str, active_only: bool = False) -> Optional[User]:
     """
     Получить пользователя по username
+    active_only - не возвращать аккаунт, ожидающий удаления
+    (без него username занят, пока аккаунт не удалён полностью)
     """
-    return db.query(User).filter(User.username == username).first()
+    query = db.query(User).filter(User.username == username)
+    if active_only:
+        query = query.filter(NOT_PENDING_DELETION)
+    return query.first()
 
 
 def create_user(db: Session, user: UserCreate) -> User:
@@ -58,11 +82,51 @@ def create_user(db: Session, user: UserCreate) -> User:
         hashed_password=hashed_password
     )
     db.add(db_user)
+    
+    shard = None
+    if shard_map.sharded:
+        db.flush()
+        shard = shard_map.place(db_user.id)
+        db.add(UserShard(user_id=db_user.id, shard=shard))
+    
     db.commit()
     db.refresh(db_user)
+    if shard is not None and shard != DEFAULT_SHARD:
+        try:
+            copy_user_row(db_user, shard)
+        except Exception:
+            # Без копии строки users на шарде данные пользователя не записать:
+            # аккаунт удаляется, регистрацию можно повторить
+            user_id = db_user.id
+            db.rollback()
+            db.query(UserShard).filter(UserShard.user_id == user_id).delete(synchronize_session=False)
+            db.query(User).filter(User.id == user_id).delete(synchronize_session=False)
+            db.commit()
+            shard_map.forget(user_id)
+            raise
     return db_user
 
 
+def copy_user_row(db_user: User, shard: str) -> None:
+    """
+    Копия строки users на шарде пользователя (для внешних ключей его данных)
+    """
+    values = {column.key: getattr(db_user, column.key) for column in User.__table__.columns}
+    with shard_map.engines[shard].begin() as conn:
+        conn.execute(delete(User.__table__).where(User.__table__.c.id == db_user.id))
+        conn.execute(insert(User.__table__).values(**values))
+
+
+def delete_user_row_copy(user_id: int, shard: str) -> None:
+    """
+    Удалить копию строки users на шарде (повторный вызов ничего не делает)
+    """
+    if shard == DEFAULT_SHARD:
+        return
+    with shard_map.engines[shard].begin() as conn:
+        conn.execute(delete(User.__table__).where(User.__table__.c.id == user_id))
+
+
 def update_user(db: Session, user_id: int, user: UserUpdate) -> Optional[User]:
     """
     Обновить данные пользователя
@@ -88,23 +152,116 @@ def update_user(db: Session, user_id: int, user: UserUpdate) -> Optional[User]:
 
 def delete_user(db: Session, user_id: int) -> bool:
     """
-    Удалить пользователя
+    Пометить пользователя на удаление
+    С этого момента аккаунт скрыт, данные удаляет purge_user в фоне
     """
     db_user = get_user(db, user_id)
     if not db_user:
         return False
     
-    db.delete(db_user)
+    db.add(PendingDeletion(user_id=user_id))
     db.commit()
     return True
 
 
+def get_pending_deletions(db: Session) -> List[int]:
+    """
+    id аккаунтов, ожидающих удаления
+    """
+    return [user_id for (user_id,) in db.query(PendingDeletion.user_id)]
+
+
+def purge_user(
+    db: Session,
+    user_id: int,
+    batch_size: int,
+    on_batch: Optional[Callable[[str, int], None]] = None
+) -> Dict[str, int]:
+    """
+    Удалить все данные пользователя и сам аккаунт
+    
+    Записи удаляются пачками по batch_size id, каждая пачка в своей
+    транзакции: память и время блокировок не зависят от объёма данных.
+    Повторный запуск после сбоя продолжает с того же места.
+    on_batch(тип, удалено всего) вызывается после каждой пачки
+    
+    Шард и основная БД фиксируются отдельно, поэтому порядок важен:
+    сначала данные и копия строки users на шарде, затем одной транзакцией
+    на основной БД аккаунт, запись user_shards и отметка pending_deletions.
+    Если сбой случился между ними, отметка и запись о шарде остаются,
+    resume_purges снова ставит задачу, а повторное удаление на шарде
+    ничего не находит. Задачи пользователя (в том числе текущая задача
+    удаления) в той же транзакции теряют user_id.
+    """
+    deleted = purge_user_data(db, user_id, batch_size, on_batch)
+    delete_user_row_copy(user_id, shard_map.shard_for(user_id))
+    
+    db.query(User).filter(User.id == user_id).delete(synchronize_session=False)
+    db.query(UserShard).filter(UserShard.user_id == user_id).delete(synchronize_session=False)
+    db.query(PendingDeletion).filter(PendingDeletion.user_id == user_id).delete(synchronize_session=False)
+    db.query(Job).filter(Job.user_id == user_id).update({"user_id": None}, synchronize_session=False)
+    db.commit()
+    shard_map.forget(user_id)
+    return deleted
+
+
+def purge_user_data(
+    db: Session,
+    user_id: int,
+    batch_size: int,
+    on_batch: Optional[Callable[[str, int], None]] = None
+) -> Dict[str, int]:
+    """
+    Удалить данные пользователя (без аккаунта) пачками, см. purge_user
+    Сессия должна быть привязана к шарду пользователя
+    """
+    steps = [
+        ("habit_completion", HabitCompletion.id, db.query(HabitCompletion.id).join(
+            Habit, Habit.id == HabitCompletion.habit_id
+        ).filter(Habit.user_id == user_id)),
+        ("habit_completion_archive", HabitCompletionArchive.id, db.query(HabitCompletionArchive.id).join(
+            Habit, Habit.id == HabitCompletionArchive.habit_id
+        ).filter(Habit.user_id == user_id)),
+        ("note_signature", NoteSignature.note_id, db.query(NoteSignature.note_id).filter(
+            NoteSignature.user_id == user_id
+        )),
+        ("note_words", NoteWords.note_id, db.query(NoteWords.note_id).join(
+            Note, Note.id == NoteWords.note_id
+        ).filter(Note.user_id == user_id)),
+        ("note", Note.id, db.query(Note.id).filter(Note.user_id == user_id)),
+        ("task", Task.id, db.query(Task.id).filter(Task.user_id == user_id)),
+        ("mood", Mood.id, db.query(Mood.id).filter(Mood.user_id == user_id)),
+        ("habit", Habit.id, db.query(Habit.id).filter(Habit.user_id == user_id)),
+        ("change_log", ChangeLog.seq, db.query(ChangeLog.seq).filter(ChangeLog.user_id == user_id)),
+    ]
+    
+    # Месячные итоги архива невелики (строка на привычку в месяц) - одним запросом
+    db.query(HabitCompletionRollup).filter(HabitCompletionRollup.habit_id.in_(
+        db.query(Habit.id).filter(Habit.user_id == user_id).scalar_subquery()
+    )).delete(synchronize_session=False)
+    db.commit()
+    
+    deleted = {}
+    for name, key, query in steps:
+        deleted[name] = 0
+        while True:
+            ids = [row[0] for row in query.limit(batch_size)]
+            if not ids:
+                break
+            db.query(key.class_).filter(key.in_(ids)).delete(synchronize_session=False)
+            db.commit()
+            deleted[name] += len(ids)
+            if on_batch is not None:
+                on_batch(name, deleted[name])
+    return deleted
+
+
 def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
     """
     Аутентификация пользователя
     Проверка username и пароля
     """
-    user = get_user_by_username(db, username)
+    user = get_user_by_username(db, username, active_only=True)
     if not user:
         return None
     if not verify_password(password, str(user.hashed_password)):
@@ -1,31 +1,109 @@
+from contextvars import ContextVar
+from typing import Dict, Optional
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 from app.config import settings
+from app.pool import InstrumentedQueuePool, instrument
+from app.replicas import ReplicaSet, RoutingSession
+from app.sharding import DEFAULT_SHARD, ShardMap
 
-# Создаём движок базы данных MySQL
-engine = create_engine(
-    settings.DATABASE_URL,
-    pool_pre_ping=True,  # Проверка соединения перед использованием
-    pool_recycle=3600,  # Пересоздание соединений каждый час
-    echo=True  # Логирование SQL запросов (отключить в production)
+
+def make_engine(url: str) -> Engine:
+    """
+    Создать движок для основной БД, реплики или шарда
+    Размер пула, таймауты и проверка соединений - из настроек DB_POOL_*
+    SQLite (локальные копии вместо MySQL) - без проверки потока соединения
+    """
+    pool_options = {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_POOL_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+    }
+    if url.startswith("sqlite"):
+        if make_url(url).database in (None, "", ":memory:"):
+            # БД в памяти живёт в одном соединении - пул по умолчанию
+            return create_engine(url, connect_args={"check_same_thread": False}, echo=True)
+        sqlite_engine = create_engine(url, connect_args={"check_same_thread": False}, echo=True, **pool_options)
+        return instrument(sqlite_engine, pre_ping="never", idle_seconds=0)
+    return instrument(
+        create_engine(
+            url,
+            pool_pre_ping=settings.DB_POOL_PRE_PING == "always",
+            pool_recycle=settings.DB_POOL_RECYCLE,  # Пересоздание старых соединений
+            echo=True,  # Логирование SQL запросов (отключить в production)
+            **pool_options
+        ),
+        pre_ping=settings.DB_POOL_PRE_PING,
+        idle_seconds=settings.DB_POOL_PING_IDLE_SECONDS
+    )
+
+
+# Создаём движок основной базы данных MySQL
+engine = make_engine(settings.DATABASE_URL)
+
+# Реплики для чтения (см. app.replicas)
+replica_set = ReplicaSet(
+    [make_engine(url) for url in settings.DATABASE_REPLICA_URLS],
+    retry_seconds=settings.REPLICA_RETRY_SECONDS
+)
+
+# Шарды с данными пользователей (см. app.sharding)
+shard_map = ShardMap(
+    {DEFAULT_SHARD: engine, **{name: make_engine(url) for name, url in settings.DATABASE_SHARD_URLS.items()}},
+    vnodes=settings.SHARD_VNODES,
+    ttl_seconds=settings.SHARD_MAP_TTL_SECONDS,
+    max_users=settings.SHARD_MAP_MAX_USERS
 )
 
-# Создаём фабрику сессий
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def all_engines() -> Dict[str, Engine]:
+    """
+    Все движки по именам: primary, replica_N, shard_<имя> (для прогрева и метрик)
+    """
+    engines = {"primary": engine}
+    engines.update((f"replica_{index}", replica) for index, replica in enumerate(replica_set.engines))
+    engines.update((f"shard_{name}", shard_engine) for name, shard_engine in shard_map.data_engines().items())
+    return engines
+
+
+# Создаём фабрику сессий: чтение с реплик, запись в основную БД,
+# данные пользователей - на их шарде
+# SessionLocal(primary_only=True) - без реплик (очередь задач)
+# SessionLocal(user_id=...) / SessionLocal(shard=...) - шард вне HTTP запроса
+SessionLocal = sessionmaker(
+    class_=RoutingSession,
+    replicas=replica_set,
+    shards=shard_map,
+    autocommit=False,
+    autoflush=False,
+    bind=engine
+)
 
 # Базовый класс для моделей
 Base = declarative_base()
 
 
+# Сессия, общая для всех подзапросов одного POST /batch (см. app.api.batch)
+shared_session: ContextVar[Optional[Session]] = ContextVar("shared_session", default=None)
+
+
 # Dependency для получения сессии БД
 def get_db():
     """
     Генератор сессии базы данных
     Используется как dependency в FastAPI endpoints
     """
+    db = shared_session.get()
+    if db is not None:
+        # Сессией владеет внешний запрос, он её и закроет
+        yield db
+        return
+    
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
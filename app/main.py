@@ -1,14 +1,24 @@
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from app.config import settings
-from app.database import engine, Base
+from app.database import engine, Base, SessionLocal, replica_set, shard_map, all_engines
+from app.pool import warm_up, pool_stats
+from app.replicas import ReadYourWritesMiddleware
+from app.sharding import ShardRoutingMiddleware
+from app.services import archive, revocation
+from app.services.revocation import revocation_list
+from app.services.cache import result_cache
+from app.coalesce import single_flight
+from app.services.job_handlers import job_runner, resume_purges
+from app.conditional import ETagMiddleware, NotModified, not_modified_handler
 
 # Импорт моделей (необходимо для создания таблиц)
-from app.models import User, Note, Task, Mood, Habit, HabitCompletion
+from app.models import User, Note, NoteSignature, Task, Mood, Habit, HabitCompletion, HabitCompletionArchive, HabitCompletionRollup, RevokedToken, ChangeLog, Job, PendingDeletion, UserShard
 
 # Импорт роутеров
-from app.api import user, note, task, mood, habit, search, auth
+from app.api import user, note, task, mood, habit, search, auth, sync, batch, dashboard, export, imports, jobs
 
 
 @asynccontextmanager
@@ -20,19 +30,58 @@ async def lifespan(app: FastAPI):
     print("🚀 Запуск приложения...")
     try:
         Base.metadata.create_all(bind=engine)
+        for shard_engine in shard_map.data_engines().values():
+            Base.metadata.create_all(bind=shard_engine)
         print("✅ Таблицы базы данных созданы успешно")
     except Exception as e:
         print(f"⚠️ Ошибка при создании таблиц: {e}")
     
+    # Индексы и счётчики уже существующих таблиц (create_all их не меняет)
+    for name, data_engine in {"primary": engine, **shard_map.data_engines()}.items():
+        try:
+            archive.ensure_schema(data_engine)
+        except Exception as e:
+            print(f"⚠️ Ошибка при обновлении схемы {name}: {e}")
+    try:
+        revocation.ensure_schema(engine)
+    except Exception as e:
+        print(f"⚠️ Ошибка при обновлении схемы revoked_tokens: {e}")
+    
+    # Прогрев пулов: первые запросы не ждут установки соединений
+    for name, pool_engine in all_engines().items():
+        try:
+            opened = warm_up(pool_engine, settings.DB_POOL_WARMUP)
+            print(f"✅ Пул {name}: открыто соединений {opened}")
+        except Exception as e:
+            print(f"⚠️ Ошибка при прогреве пула {name}: {e}")
+    
+    # Построение фильтра отозванных токенов
+    try:
+        with SessionLocal() as db:
+            revocation_list.rebuild(db)
+        print("✅ Фильтр отозванных токенов построен")
+    except Exception as e:
+        print(f"⚠️ Ошибка при построении фильтра отозванных токенов: {e}")
+    
+    # Очередь фоновых задач: незавершённые задачи подхватываются здесь
+    await job_runner.start()
+    try:
+        resume_purges()
+        print("✅ Очередь фоновых задач запущена")
+    except Exception as e:
+        print(f"⚠️ Ошибка при возобновлении удаления аккаунтов: {e}")
+    
     yield
     
     # Shutdown: действия при остановке
     print("🛑 Остановка приложения...")
+    await job_runner.stop(settings.JOB_SHUTDOWN_TIMEOUT)
 
 
 # Инициализация FastAPI приложения
 app = FastAPI(
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
     description="API для дневника с трекером задач и настроения",
@@ -48,8 +97,19 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Near-Duplicates"],
 )
 
+# ETag для условных GET запросов (см. app.conditional)
+app.add_middleware(ETagMiddleware)
+app.add_exception_handler(NotModified, not_modified_handler)
+
+# Чтение своих записей при чтении с реплик (см. app.replicas)
+app.add_middleware(ReadYourWritesMiddleware, replicas=replica_set, seconds=settings.READ_YOUR_WRITES_SECONDS)
+
+# Шард данных пользователя по параметру user_id (см. app.sharding)
+app.add_middleware(ShardRoutingMiddleware, shards=shard_map)
+
 
 # Корневой endpoint
 @app.get("/")
@@ -76,6 +136,24 @@ async def health_check():
     }
 
 
+# Метрики для мониторинга
+@app.get("/metrics")
+async def metrics():
+    """
+    Внутренние метрики: попадания в кеш результатов, объединённые запросы,
+    очередь фоновых задач, чтение с реплик, справочник шардов,
+    пулы соединений с БД
+    """
+    return {
+        "cache": result_cache.stats(),
+        "coalescing": single_flight.stats(),
+        "jobs": job_runner.stats(),
+        "replicas": replica_set.stats(),
+        "shards": shard_map.stats(),
+        "pools": {name: pool_stats(pool_engine) for name, pool_engine in all_engines().items()}
+    }
+
+
 # Подключение роутеров
 app.include_router(auth.router, prefix=f"{settings.API_V1_STR}")
 app.include_router(user.router, prefix=f"{settings.API_V1_STR}")
@@ -84,6 +162,12 @@ app.include_router(task.router, prefix=f"{settings.API_V1_STR}")
 app.include_router(mood.router, prefix=f"{settings.API_V1_STR}")
 app.include_router(habit.router, prefix=f"{settings.API_V1_STR}")
 app.include_router(search.router, prefix=f"{settings.API_V1_STR}")
+app.include_router(sync.router, prefix=f"{settings.API_V1_STR}")
+app.include_router(batch.router, prefix=f"{settings.API_V1_STR}")
+app.include_router(dashboard.router, prefix=f"{settings.API_V1_STR}")
+app.include_router(export.router, prefix=f"{settings.API_V1_STR}")
+app.include_router(imports.router, prefix=f"{settings.API_V1_STR}")
+app.include_router(jobs.router, prefix=f"{settings.API_V1_STR}")
 
 
 if __name__ == "__main__":
@@ -1,12 +1,22 @@
 from app.models.user import User
 from app.models.note import Note
+from app.models.note_signature import NoteSignature
+from app.models.note_words import NoteWords
 from app.models.task import Task, TaskPriority, TaskStatus
 from app.models.mood import Mood, MoodLevel
 from app.models.habit import Habit, HabitCompletion, HabitFrequency
+from app.models.habit_archive import HabitCompletionArchive, HabitCompletionRollup
+from app.models.revoked_token import RevokedToken
+from app.models.change_log import ChangeLog
+from app.models.job import Job, JobLease, JobSlot
+from app.models.pending_deletion import PendingDeletion
+from app.models.user_shard import UserShard
 
 __all__ = [
     "User",
     "Note", 
+    "NoteSignature",
+    "NoteWords",
     "Task",
     "TaskPriority",
     "TaskStatus",
@@ -14,5 +24,14 @@ __all__ = [
     "MoodLevel",
     "Habit",
     "HabitCompletion",
-    "HabitFrequency"
+    "HabitFrequency",
+    "HabitCompletionArchive",
+    "HabitCompletionRollup",
+    "RevokedToken",
+    "ChangeLog",
+    "Job",
+    "JobLease",
+    "JobSlot",
+    "PendingDeletion",
+    "UserShard"
 ]
\ No newline at end of file
@@ -0,0 +1,37 @@
+from sqlalchemy import Column, Integer, String, DateTime, Index
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class ChangeLog(Base):
+    """
+    Журнал изменений для дельта-синхронизации клиентов
+
+    seq - монотонно растущий номер изменения; курсор синхронизации - номер
+    следующего непрочитанного изменения (см. crud.sync.get_changes).
+    На каждую запись хранится только последнее изменение: при новой записи
+    предыдущая удаляется, поэтому журнал растёт с числом записей, а не правок.
+    Удаления остаются в журнале как tombstone (op="delete").
+    """
+    __tablename__ = "change_log"
+    __table_args__ = (
+        Index("ix_change_log_user_seq", "user_id", "seq"),
+        Index("ix_change_log_entity", "user_id", "entity", "entity_id"),
+        # SQLite без AUTOINCREMENT переиспользует номер удалённой последней строки
+        {"sqlite_autoincrement": True},
+    )
+    
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, nullable=False)
+    
+    # Тип записи ("note", "task", "mood", "habit", "habit_completion") и её id
+    entity = Column(String(32), nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    
+    # "upsert" - создана или изменена, "delete" - удалена
+    op = Column(String(10), nullable=False)
+    
+    changed_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    def __repr__(self):
+        return f"<ChangeLog(seq={self.seq}, entity={self.entity}, id={self.entity_id}, op={self.op})>"
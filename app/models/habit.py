@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Enum, Time, JSON
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Enum, Time, JSON, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -51,7 +51,7 @@ class Habit(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     # Внешний ключ на пользователя
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     
     # Связи
     owner = relationship("User", back_populates="habits")
@@ -64,13 +64,21 @@ class Habit(Base):
 class HabitCompletion(Base):
     """
     Модель выполнения привычки (факт выполнения в конкретный день)
+    Старые выполнения переносятся в архив (см. app.models.habit_archive)
     """
     __tablename__ = "habit_completions"
+    __table_args__ = (
+        Index("ix_habit_completions_habit_time", "habit_id", "completed_at"),
+        Index("ix_habit_completions_completed_at", "completed_at"),
+        # id не должны переиспользоваться: перенесённые в архив строки сохраняют свой id
+        # Для уже созданных таблиц индекс и счётчик id - app.services.archive.ensure_schema
+        {"sqlite_autoincrement": True},
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     
     # Привычка
-    habit_id = Column(Integer, ForeignKey("habits.id"), nullable=False)
+    habit_id = Column(Integer, ForeignKey("habits.id", ondelete="CASCADE"), nullable=False)
     
     # Когда выполнено
     completed_at = Column(DateTime(timezone=True), server_default=func.now())
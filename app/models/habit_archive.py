@@ -0,0 +1,50 @@
+from sqlalchemy import Column, Integer, String, Date, DateTime, ForeignKey, Index
+from app.database import Base
+
+
+class HabitCompletionArchive(Base):
+    """
+    Архив выполнений привычек старше COMPLETIONS_HOT_DAYS
+
+    Строки переносятся из habit_completions задачей archive_completions
+    целыми месяцами, с сохранением id. Колонки те же, что у HabitCompletion,
+    поэтому схемы ответа одинаково сериализуют обе модели.
+    """
+    __tablename__ = "habit_completions_archive"
+    __table_args__ = (
+        Index("ix_habit_completions_archive_habit_time", "habit_id", "completed_at"),
+    )
+    
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    habit_id = Column(Integer, ForeignKey("habits.id", ondelete="CASCADE"), nullable=False)
+    completed_at = Column(DateTime(timezone=True), nullable=False)
+    note = Column(String(500), nullable=True)
+    
+    def __repr__(self):
+        return f"<HabitCompletionArchive(id={self.id}, habit_id={self.habit_id}, completed_at={self.completed_at})>"
+
+
+class HabitCompletionRollup(Base):
+    """
+    Итоги архивных выполнений привычки за месяц
+
+    Хранятся число выполнений и описание серий внутри месяца: серия от
+    первого дня месяца (head_run), серия до последнего дня (tail_run)
+    и самая длинная серия. Этого достаточно, чтобы считать общее число
+    выполнений и серии, не читая сам архив.
+    """
+    __tablename__ = "habit_completion_rollups"
+    
+    habit_id = Column(Integer, ForeignKey("habits.id", ondelete="CASCADE"), primary_key=True)
+    
+    # Первый день месяца
+    month = Column(Date, primary_key=True)
+    
+    completions = Column(Integer, nullable=False, default=0)
+    days = Column(Integer, nullable=False, default=0)
+    head_run = Column(Integer, nullable=False, default=0)
+    tail_run = Column(Integer, nullable=False, default=0)
+    longest_run = Column(Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f"<HabitCompletionRollup(habit_id={self.habit_id}, month={self.month}, completions={self.completions})>"
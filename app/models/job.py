@@ -0,0 +1,64 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class Job(Base):
+    """
+    Фоновая задача (импорт, выгрузка, перестроение индексов и т.п.)
+    Состояние хранится в БД: статус можно опрашивать из любого воркера,
+    незавершённые задачи подхватываются после перезапуска
+    """
+    __tablename__ = "jobs"
+    
+    id = Column(String(32), primary_key=True)
+    type = Column(String(50), nullable=False, index=True)
+    user_id = Column(Integer, nullable=True, index=True)
+    
+    # pending, running, completed, failed
+    status = Column(String(20), nullable=False, default="pending", index=True)
+    
+    # Аргументы обработчика, прогресс и результат
+    params = Column(JSON, nullable=True)
+    progress = Column(JSON, nullable=True)
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    
+    def __repr__(self):
+        return f"<Job(id={self.id}, type={self.type}, status={self.status})>"
+
+
+class JobLease(Base):
+    """
+    Владелец выполняющейся задачи (процесс с JobRunner) и время его
+    последнего сигнала. Задача, чей владелец перестал продлевать аренду
+    дольше JOB_LEASE_SECONDS, считается прерванной (см. JobRunner._reap)
+    """
+    __tablename__ = "job_leases"
+    
+    job_id = Column(String(32), ForeignKey("jobs.id", ondelete="CASCADE"), primary_key=True)
+    owner = Column(String(64), nullable=False, index=True)
+    heartbeat_at = Column(DateTime, nullable=False)
+    
+    def __repr__(self):
+        return f"<JobLease(job_id={self.job_id}, owner={self.owner})>"
+
+
+class JobSlot(Base):
+    """
+    Незавершённая задача unique-типа: у пользователя (user_key = user_id,
+    0 - задача без пользователя) не больше одной такой задачи каждого типа.
+    Первичный ключ делает проверку при постановке атомарной
+    """
+    __tablename__ = "job_slots"
+    
+    type = Column(String(50), primary_key=True)
+    user_key = Column(Integer, primary_key=True)
+    job_id = Column(String(32), ForeignKey("jobs.id", ondelete="CASCADE"), nullable=False, unique=True)
+    
+    def __repr__(self):
+        return f"<JobSlot(type={self.type}, user_key={self.user_key}, job_id={self.job_id})>"
@@ -38,7 +38,7 @@ class Mood(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     # Внешний ключ на пользователя
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     
     # Связь с пользователем
     owner = relationship("User", back_populates="moods")
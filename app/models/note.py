@@ -1,7 +1,10 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, type_coerce
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import deferred, relationship
 from sqlalchemy.sql import func
 from app.database import Base
+from app.models.note_words import NoteWords
+from app.models.types import CompressedText, decompress_text, pack_text
 
 
 class Note(Base):
@@ -12,17 +15,53 @@ class Note(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(255), nullable=False)
-    content = Column(Text, nullable=False)
+    # Текст в том виде, в каком он хранится: длинные тексты сжаты (см. CompressedText)
+    # Загружается отложенно: запросы, которым нужен текст, делают undefer(Note.content_raw)
+    content_raw = deferred(Column("content", Text, nullable=False))
     
     # Дата создания и обновления
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     # Внешний ключ на пользователя
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     
     # Связь с пользователем
     owner = relationship("User", back_populates="notes")
     
+    # MinHash сигнатура для поиска дубликатов
+    signature = relationship("NoteSignature", back_populates="note", uselist=False, cascade="all, delete-orphan")
+    
+    # Слова сжатого текста для поиска без распаковки (только у сжатых текстов)
+    words = relationship("NoteWords", back_populates="note", uselist=False, cascade="all, delete-orphan")
+    
+    @hybrid_property
+    def content(self) -> str:
+        """
+        Текст заметки; сжатый текст распаковывается при первом обращении
+        """
+        raw = self.content_raw
+        unpacked = self.__dict__.get("_unpacked")
+        if unpacked is None or unpacked[0] is not raw:
+            unpacked = (raw, decompress_text(raw) if raw is not None else None)
+            self.__dict__["_unpacked"] = unpacked
+        return unpacked[1]
+    
+    @content.setter
+    def content(self, value: str) -> None:
+        self.content_raw, words = pack_text(value)
+        self.__dict__["_unpacked"] = (self.content_raw, value)
+        if words is None:
+            self.words = None
+        elif self.words is not None:
+            self.words.words = words
+        else:
+            self.words = NoteWords(words=words)
+    
+    @content.expression
+    def content(cls):
+        # В запросах колонок текст распаковывается сразу при чтении строки
+        return type_coerce(cls.content_raw, CompressedText).label("content")
+    
     def __repr__(self):
         return f"<Note(id={self.id}, title={self.title[:20]})>"
\ No newline at end of file
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, LargeBinary, ForeignKey
+from sqlalchemy.orm import relationship
+from app.database import Base
+
+
+class NoteSignature(Base):
+    """
+    MinHash сигнатура заметки для поиска почти-дубликатов
+    Хранится отдельно от заметки: 128 значений uint32 (512 байт)
+    """
+    __tablename__ = "note_signatures"
+    
+    note_id = Column(Integer, ForeignKey("notes.id", ondelete="CASCADE"), primary_key=True)
+    user_id = Column(Integer, nullable=False, index=True)
+    signature = Column(LargeBinary, nullable=False)
+    
+    # Связь с заметкой
+    note = relationship("Note", back_populates="signature")
+    
+    def __repr__(self):
+        return f"<NoteSignature(note_id={self.note_id})>"
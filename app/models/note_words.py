@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, Text, ForeignKey
+from sqlalchemy.orm import relationship
+from app.database import Base
+
+
+class NoteWords(Base):
+    """
+    Слова сжатого текста заметки (см. search_words) для поиска без распаковки
+    Хранятся отдельно от заметки: строка есть только у сжатых текстов
+    """
+    __tablename__ = "note_words"
+    
+    note_id = Column(Integer, ForeignKey("notes.id", ondelete="CASCADE"), primary_key=True)
+    words = Column(Text, nullable=False)
+    
+    # Связь с заметкой
+    note = relationship("Note", back_populates="words")
+    
+    def __repr__(self):
+        return f"<NoteWords(note_id={self.note_id})>"
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, DateTime
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class PendingDeletion(Base):
+    """
+    Аккаунт, ожидающий удаления
+
+    Пока запись есть, пользователь скрыт (get_user его не находит, вход
+    невозможен), а его данные удаляет фоновая задача purge_user небольшими
+    пачками. Последней удаляется сама строка users, затем эта запись.
+    """
+    __tablename__ = "pending_deletions"
+    
+    user_id = Column(Integer, primary_key=True)
+    requested_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    def __repr__(self):
+        return f"<PendingDeletion(user_id={self.user_id})>"
@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy.dialects import mysql
+from app.database import Base
+
+
+class RevokedToken(Base):
+    """
+    Модель отозванного токена
+
+    key имеет вид "jti:<id токена>" для отзыва одного токена
+    или "user:<id пользователя>" для выхода со всех устройств
+    (отзываются все токены, выпущенные не позже revoked_at)
+    """
+    __tablename__ = "revoked_tokens"
+
+    id = Column(Integer, primary_key=True, index=True)
+    key = Column(String(64), unique=True, index=True, nullable=False)
+    user_id = Column(Integer, nullable=False, index=True)
+
+    # Момент отзыва (UTC), с микросекундами: сравнивается с iat в миллисекундах
+    revoked_at = Column(DateTime().with_variant(mysql.DATETIME(fsp=6), "mysql"), nullable=False)
+
+    # После этого момента запись не нужна: отозванные токены уже истекли
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<RevokedToken(id={self.id}, key={self.key})>"
@@ -1,5 +1,5 @@
 from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Enum
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import deferred, relationship
 from sqlalchemy.sql import func
 import enum
 from app.database import Base
@@ -31,7 +31,8 @@ class Task(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(255), nullable=False)
-    description = Column(String(500), nullable=True)
+    # Загружается отложенно, см. undefer в app.crud.task
+    description = deferred(Column(String(500), nullable=True))
     
     # Статус и приоритет
     status = Column(Enum(TaskStatus), default=TaskStatus.TODO, nullable=False)
@@ -47,7 +48,7 @@ class Task(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     # Внешний ключ на пользователя
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     
     # Связь с пользователем
     owner = relationship("User", back_populates="tasks")
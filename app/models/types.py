@@ -0,0 +1,142 @@
+"""
+Типы колонок моделей
+"""
+import base64
+import zlib
+from typing import Optional, Tuple
+from sqlalchemy import Text, case, func, null, type_coerce
+from sqlalchemy.types import TypeDecorator
+from app.config import settings
+
+# Заголовок сжатого значения: управляющий символ и код алгоритма.
+# Строки без заголовка (записанные до сжатия) читаются как есть.
+COMPRESSED_MARK = "\x1f"
+ZLIB_HEADER = COMPRESSED_MARK + "z"
+
+
+def is_compressed(value: Optional[str]) -> bool:
+    return value is not None and value.startswith(ZLIB_HEADER)
+
+
+def compress_text(value: str) -> str:
+    payload = zlib.compress(value.encode("utf-8"), settings.NOTE_COMPRESSION_LEVEL)
+    return ZLIB_HEADER + base64.b64encode(payload).decode("ascii")
+
+
+def decompress_text(value: str) -> str:
+    if not is_compressed(value):
+        return value
+    payload = base64.b64decode(value[len(ZLIB_HEADER):])
+    return zlib.decompress(payload).decode("utf-8")
+
+
+def should_compress(value: str) -> bool:
+    """
+    Сжимать ли значение при записи
+
+    Текст, который сам начинается с COMPRESSED_MARK, сжимается всегда,
+    чтобы при чтении его нельзя было принять за сжатый
+    """
+    if value.startswith(COMPRESSED_MARK):
+        return True
+    return settings.NOTE_COMPRESSION and len(value.encode("utf-8")) >= settings.NOTE_COMPRESS_MIN_BYTES
+
+
+def search_words(value: str) -> str:
+    """
+    Различные слова текста (по пробельным символам) в нижнем регистре через пробел
+
+    Хранятся рядом со сжатым текстом: подстрока запроса без пробелов
+    входит в текст, только если она входит в одно из этих слов, поэтому
+    LIKE по словам отбирает сжатые заметки без распаковки
+    """
+    return " ".join(sorted(set(value.lower().split())))
+
+
+def pack_text(value: str) -> Tuple[str, Optional[str]]:
+    """
+    Значение для записи в БД и слова для поиска (None для несжатых значений)
+    """
+    if should_compress(value):
+        return compress_text(value), search_words(value)
+    return value, None
+
+
+class CompressedText(TypeDecorator):
+    """
+    Text, который хранит длинные значения сжатыми (zlib + base64)
+
+    Значения короче NOTE_COMPRESS_MIN_BYTES пишутся как есть, поэтому
+    поиск LIKE и SUBSTR в SQL работают для них без изменений. Для
+    сжатых значений SQL видит только заголовок, такие строки
+    обрабатываются в Python (см. text_prefix и app.api.search).
+    Результат запроса распаковывается сразу; объекты Note распаковывают
+    текст только при обращении к атрибуту (см. app.models.note).
+    """
+    impl = Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is not None and should_compress(value):
+            return compress_text(value)
+        return value
+
+    def process_result_value(self, value, dialect):
+        if value is not None:
+            return decompress_text(value)
+        return value
+
+    def coerce_compared_value(self, op, value):
+        # Шаблоны LIKE и сравнения передаются в БД как обычный текст
+        return Text()
+
+
+class _TextPrefix(TypeDecorator):
+    """
+    Результат text_prefix: сжатое значение распаковывается и обрезается
+    """
+    impl = Text
+    cache_ok = True
+
+    def __init__(self, length: int):
+        super().__init__()
+        self.length = length
+
+    def process_result_value(self, value, dialect):
+        if is_compressed(value):
+            return decompress_text(value)[:self.length]
+        return value
+
+
+def text_prefix(column, length: int):
+    """
+    Первые length символов колонки CompressedText
+
+    Для несжатых строк это SUBSTR на стороне БД, сжатые (длинные)
+    значения передаются целиком и обрезаются после распаковки
+    """
+    return type_coerce(
+        case(
+            (compressed_flag(column), type_coerce(column, Text)),
+            else_=func.substr(column, 1, length)
+        ),
+        _TextPrefix(length)
+    )
+
+
+def compressed_flag(column):
+    """
+    SQL выражение "значение сжато"
+    """
+    return column.startswith(ZLIB_HEADER)
+
+
+def compressed_only(column):
+    """
+    Распакованный текст для сжатых строк, NULL для остальных
+    Нужен там, где SQL функции (LIKE, INSTR, SUBSTR) не применимы к сжатым данным
+    """
+    return type_coerce(
+        case((compressed_flag(column), type_coerce(column, Text)), else_=null()),
+        CompressedText
+    )
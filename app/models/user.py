@@ -19,10 +19,12 @@ class User(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     # Связи с другими таблицами
-    notes = relationship("Note", back_populates="owner", cascade="all, delete-orphan")
-    tasks = relationship("Task", back_populates="owner", cascade="all, delete-orphan")
-    moods = relationship("Mood", back_populates="owner", cascade="all, delete-orphan")
-    habits = relationship("Habit", back_populates="owner", cascade="all, delete-orphan")
+    # passive_deletes: при удалении пользователя ORM не загружает его записи,
+    # их удаляет ON DELETE CASCADE или заранее задача purge_user (crud.user)
+    notes = relationship("Note", back_populates="owner", cascade="all, delete-orphan", passive_deletes=True)
+    tasks = relationship("Task", back_populates="owner", cascade="all, delete-orphan", passive_deletes=True)
+    moods = relationship("Mood", back_populates="owner", cascade="all, delete-orphan", passive_deletes=True)
+    habits = relationship("Habit", back_populates="owner", cascade="all, delete-orphan", passive_deletes=True)
     
     def __repr__(self):
         return f"<User(id={self.id}, username={self.username})>"
\ No newline at end of file
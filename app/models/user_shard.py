@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class UserShard(Base):
+    """
+    Шард, на котором лежат данные пользователя (таблица-справочник)
+
+    Хранится в основной БД вместе с users. Запись создаётся при регистрации,
+    если шардов несколько; пользователи без записи живут на шарде default.
+    Пока идёт перенос (moving_to не пусто), запросы пользователя получают 503.
+    resync_below - курсоры синхронизации меньше этого номера выданы старым
+    шардом, по ним клиент получает полный снимок.
+    """
+    __tablename__ = "user_shards"
+    
+    user_id = Column(Integer, primary_key=True, autoincrement=False)
+    shard = Column(String(64), nullable=False)
+    moving_to = Column(String(64), nullable=True)
+    resync_below = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    def __repr__(self):
+        return f"<UserShard(user_id={self.user_id}, shard={self.shard})>"
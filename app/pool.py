@@ -0,0 +1,193 @@
+"""
+Пул соединений с БД: проверка соединений, прогрев и статистика
+
+InstrumentedQueuePool - обычный QueuePool, который считает выдачи
+соединений, время ожидания свободного соединения (гистограмма), таймауты
+и максимум одновременно занятых соединений. По этим данным подбираются
+DB_POOL_SIZE и DB_POOL_MAX_OVERFLOW на процесс: если ожидания растут,
+а max_checked_out упирается в size + max_overflow - пула не хватает;
+если max_checked_out заметно меньше size - пул можно уменьшить.
+
+Проверка соединения перед выдачей (DB_POOL_PRE_PING):
+- "always" - pool_pre_ping SQLAlchemy, лишний запрос при каждой выдаче;
+- "idle"   - SELECT 1 только если соединение пролежало в пуле дольше
+             DB_POOL_PING_IDLE_SECONDS (его мог закрыть сервер или прокси);
+- "never"  - без проверки, обрыв обнаружится на первом запросе.
+"""
+import bisect
+import threading
+import time
+from typing import Dict, List
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+PRE_PING_STRATEGIES = ("always", "idle", "never")
+
+# Верхние границы корзин гистограммы ожидания, мс (последняя - всё, что дольше)
+WAIT_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+_CHECKED_IN_AT = "checked_in_at"
+
+
+class PoolTelemetry:
+    """
+    Счётчики одного пула
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.connects = 0
+        self.pings = 0
+        self.ping_failures = 0
+        self.max_checked_out = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.wait_counts = [0] * (len(WAIT_BUCKETS_MS) + 1)
+
+    def add(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _wait(self, seconds: float) -> None:
+        self.wait_total += seconds
+        self.wait_max = max(self.wait_max, seconds)
+        self.wait_counts[bisect.bisect_left(WAIT_BUCKETS_MS, seconds * 1000)] += 1
+
+    def checkout(self, seconds: float, checked_out: int) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.max_checked_out = max(self.max_checked_out, checked_out)
+            self._wait(seconds)
+
+    def timeout(self, seconds: float) -> None:
+        with self._lock:
+            self.timeouts += 1
+            self._wait(seconds)
+
+    def stats(self) -> dict:
+        with self._lock:
+            waits = sum(self.wait_counts)
+            labels = [f"le_{bound}ms" for bound in WAIT_BUCKETS_MS] + ["inf"]
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "connects": self.connects,
+                "pings": self.pings,
+                "ping_failures": self.ping_failures,
+                "max_checked_out": self.max_checked_out,
+                "wait_avg_ms": round(self.wait_total / waits * 1000, 3) if waits else 0.0,
+                "wait_max_ms": round(self.wait_max * 1000, 3),
+                "wait_histogram": dict(zip(labels, self.wait_counts)),
+            }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool со счётчиками (атрибут telemetry)
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.telemetry = PoolTelemetry()
+
+    def recreate(self) -> "InstrumentedQueuePool":
+        # engine.dispose() пересоздаёт пул - счётчики сохраняются
+        pool = super().recreate()
+        pool.telemetry = self.telemetry
+        return pool
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.telemetry.timeout(time.perf_counter() - start)
+            raise
+        self.telemetry.checkout(time.perf_counter() - start, self.checkedout())
+        return connection
+
+
+def _telemetry(engine: Engine):
+    return getattr(engine.pool, "telemetry", None)
+
+
+def instrument(engine: Engine, pre_ping: str, idle_seconds: float) -> Engine:
+    """
+    Подключить к движку счётчик новых соединений и проверку простаивавших
+    соединений (pre_ping="idle")
+    """
+    if pre_ping not in PRE_PING_STRATEGIES:
+        raise ValueError(f"Unknown DB_POOL_PRE_PING: {pre_ping}")
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        telemetry = _telemetry(engine)
+        if telemetry is not None:
+            telemetry.add("connects")
+
+    if pre_ping != "idle":
+        return engine
+
+    @event.listens_for(engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        connection_record.info[_CHECKED_IN_AT] = time.monotonic()
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        checked_in_at = connection_record.info.pop(_CHECKED_IN_AT, None)
+        if checked_in_at is None or time.monotonic() - checked_in_at < idle_seconds:
+            return
+        telemetry = _telemetry(engine)
+        if telemetry is not None:
+            telemetry.add("pings")
+        try:
+            cursor = dbapi_connection.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+        except Exception:
+            if telemetry is not None:
+                telemetry.add("ping_failures")
+            # Пул закроет соединение и выдаст новое
+            raise exc.DisconnectionError()
+
+    return engine
+
+
+def warm_up(engine: Engine, count: int) -> int:
+    """
+    Открыть заранее до count соединений (не больше размера пула)
+    Возвращает число открытых соединений
+    """
+    size = engine.pool.size() if isinstance(engine.pool, QueuePool) else 1
+    connections: List = []
+    try:
+        for _ in range(min(count, size)):
+            connections.append(engine.connect())
+    finally:
+        for connection in connections:
+            connection.close()
+    return len(connections)
+
+
+def pool_stats(engine: Engine) -> Dict[str, object]:
+    """
+    Текущее состояние пула и накопленные счётчики
+    """
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        return {"pool": type(pool).__name__}
+    stats: Dict[str, object] = {
+        "pool": type(pool).__name__,
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": pool._max_overflow,
+    }
+    telemetry = _telemetry(engine)
+    if telemetry is not None:
+        stats.update(telemetry.stats())
+    return stats
@@ -0,0 +1,200 @@
+"""
+Чтение с реплик БД
+
+Сессия RoutingSession отправляет SELECT на одну из реплик (по кругу,
+пропуская недоступные), а запись, flush и SELECT ... FOR UPDATE - на
+основную БД. После первой записи сессия до закрытия читает только с
+основной БД, чтобы видеть свои изменения.
+
+Между запросами то же обеспечивает ReadYourWritesMiddleware: после
+успешного изменяющего запроса клиент получает cookie, и его запросы
+в течение READ_YOUR_WRITES_SECONDS читают с основной БД, пока реплики
+догоняют. Без DATABASE_REPLICA_URLS всё читается с основной БД, как раньше.
+
+Запросы к данным пользователей на других шардах идут прямо в шард
+(см. app.sharding), реплики есть только у основной БД.
+"""
+import itertools
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+
+# Запрос должен читать с основной БД (выставляется ReadYourWritesMiddleware)
+read_primary: ContextVar[bool] = ContextVar("read_primary", default=False)
+
+READ_YOUR_WRITES_COOKIE = "db_primary_until"
+
+
+class ReplicaSet:
+    """
+    Реплики для чтения: выбор по кругу, недоступная реплика пропускается
+    retry_seconds секунд после ошибки соединения
+    """
+
+    def __init__(self, engines: List[Engine], retry_seconds: float = 30.0):
+        self.engines = engines
+        self.retry_seconds = retry_seconds
+        self._next = itertools.count()
+        self._down_until: Dict[int, float] = {}
+        self._lock = threading.Lock()
+        self.reads = [0] * len(engines)
+        self.primary_reads = 0
+        self.failures = 0
+        for index, engine in enumerate(engines):
+            event.listen(engine, "handle_error", self._error_listener(index))
+
+    def __bool__(self) -> bool:
+        return bool(self.engines)
+
+    def _error_listener(self, index: int):
+        def on_error(context):
+            # Ошибка соединения (не ошибка самого запроса) - реплика недоступна
+            if context.connection is None or context.is_disconnect:
+                self.mark_down(index)
+        return on_error
+
+    def mark_down(self, index: int) -> None:
+        with self._lock:
+            self._down_until[index] = time.monotonic() + self.retry_seconds
+            self.failures += 1
+
+    def choose(self) -> Optional[Engine]:
+        """
+        Следующая доступная реплика или None, если доступных нет
+        """
+        now = time.monotonic()
+        for _ in range(len(self.engines)):
+            index = next(self._next) % len(self.engines)
+            if self._down_until.get(index, 0.0) <= now:
+                self.reads[index] += 1
+                return self.engines[index]
+        return None
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "replicas": len(self.engines),
+            "healthy": sum(1 for i in range(len(self.engines)) if self._down_until.get(i, 0.0) <= now),
+            "replica_reads": list(self.reads),
+            "primary_reads": self.primary_reads,
+            "failures": self.failures,
+        }
+
+
+class RoutingSession(Session):
+    """
+    Сессия, которая читает с реплик, а пишет в основную БД
+    primary_only=True - всё через основную БД (очередь задач и т.п.)
+    user_id / shard - шард для данных пользователей вне HTTP запроса
+    (фоновые задачи, утилиты)
+    """
+
+    def __init__(
+        self,
+        *args,
+        replicas: Optional[ReplicaSet] = None,
+        shards=None,
+        primary_only: bool = False,
+        user_id: Optional[int] = None,
+        shard: Optional[str] = None,
+        **kwargs
+    ):
+        super().__init__(*args, **kwargs)
+        self.replicas = replicas
+        self.shards = shards
+        self.pinned = primary_only
+        self.user_id = user_id
+        self.shard = shard
+        event.listen(self, "after_flush", self._pin)
+
+    def _pin(self, *args) -> None:
+        self.pinned = True
+
+    def reads_replica(self) -> bool:
+        """
+        Следующий SELECT данных пользователя может уйти на реплику
+        """
+        if not self.replicas or self.pinned or read_primary.get():
+            return False
+        # Шарды, кроме основной БД, реплик не имеют
+        return self.shards is None or self.shards.route(self.shard, self.user_id, None, None) is None
+
+    def get_bind(self, mapper=None, *, clause=None, **kwargs):
+        if self.shards is not None:
+            shard_engine = self.shards.route(self.shard, self.user_id, mapper, clause)
+            if shard_engine is not None:
+                return shard_engine
+
+        primary = super().get_bind(mapper, clause=clause, **kwargs)
+        if not self.replicas:
+            return primary
+
+        is_read = isinstance(clause, Select) and clause._for_update_arg is None
+        if not is_read:
+            # Запись или произвольный SQL: дальше сессия читает свои изменения
+            if clause is not None:
+                self.pinned = True
+            return primary
+        if self._flushing or self.pinned or read_primary.get():
+            self.replicas.primary_reads += 1
+            return primary
+
+        replica = self.replicas.choose()
+        if replica is None:
+            self.replicas.primary_reads += 1
+            return primary
+        return replica
+
+
+class ReadYourWritesMiddleware:
+    """
+    ASGI middleware: после изменяющего запроса клиент какое-то время читает
+    с основной БД (cookie с моментом, до которого действует привязка)
+    """
+
+    def __init__(self, app, replicas: ReplicaSet, seconds: float):
+        self.app = app
+        self.replicas = replicas
+        self.seconds = seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.replicas:
+            await self.app(scope, receive, send)
+            return
+
+        token = read_primary.set(self._pinned(scope))
+        mutating = scope["method"] not in ("GET", "HEAD", "OPTIONS")
+
+        async def send_with_cookie(message):
+            if mutating and message["type"] == "http.response.start" and message["status"] < 400:
+                until = int(time.time() + self.seconds)
+                cookie = (
+                    f"{READ_YOUR_WRITES_COOKIE}={until}; Max-Age={int(self.seconds)}; "
+                    f"Path=/; HttpOnly; SameSite=Lax"
+                )
+                message = {**message, "headers": [*message.get("headers", []), (b"set-cookie", cookie.encode("latin-1"))]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_cookie)
+        finally:
+            read_primary.reset(token)
+
+    @staticmethod
+    def _pinned(scope) -> bool:
+        for name, value in scope.get("headers", []):
+            if name != b"cookie":
+                continue
+            for part in value.decode("latin-1").split(";"):
+                key, _, until = part.strip().partition("=")
+                if key == READ_YOUR_WRITES_COOKIE:
+                    try:
+                        return float(until) > time.time()
+                    except ValueError:
+                        return False
+        return False
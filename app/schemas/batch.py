@@ -0,0 +1,47 @@
+from pydantic import BaseModel, Field
+from typing import Any, Dict, Generic, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class ItemBatch(BaseModel, Generic[T]):
+    """
+    Ответ на запрос нескольких записей по списку id (GET /<сущность>/batch)
+    """
+    items: List[T]
+    missing: List[int]
+
+
+class SubRequest(BaseModel):
+    """
+    Подзапрос к API внутри POST /batch
+    """
+    id: Optional[str] = Field(None, description="Произвольная метка, возвращается в ответе")
+    method: str = Field("GET", pattern="^(GET|POST|PUT|PATCH|DELETE)$")
+    path: str = Field(..., description="Путь с параметрами, например /api/v1/moods/today?user_id=1")
+    headers: Dict[str, str] = {}
+    body: Optional[Any] = None
+
+
+class BatchRequest(BaseModel):
+    """
+    Список подзапросов, выполняемых за один HTTP запрос
+    """
+    requests: List[SubRequest] = Field(..., min_length=1)
+
+
+class SubResponse(BaseModel):
+    """
+    Ответ на подзапрос: собственный статус, заголовки и тело
+    """
+    id: Optional[str] = None
+    status: int
+    headers: Dict[str, str] = {}
+    body: Optional[Any] = None
+
+
+class BatchResponse(BaseModel):
+    """
+    Ответы в порядке подзапросов
+    """
+    responses: List[SubResponse]
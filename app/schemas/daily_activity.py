@@ -2,8 +2,8 @@ from pydantic import BaseModel
 from typing import Sequence, Optional
 from datetime import date
 from app.schemas.mood import Mood
-from app.schemas.task import Task
-from app.schemas.note import Note
+from app.schemas.task import Task, TaskSummary
+from app.schemas.note import Note, NoteTitle
 from app.schemas.habit import HabitForDate
 
 
@@ -39,6 +39,21 @@ class DailyActivity(BaseModel):
         from_attributes = True
 
 
+class DailyActivitySummary(BaseModel):
+    """
+    Краткая активность за день (view=summary): задачи без описаний,
+    заметки без текста
+    """
+    date: date
+    mood: Optional[Mood] = None
+    tasks: Sequence[TaskSummary] = []
+    notes: Sequence[NoteTitle] = []
+    habits: Sequence[HabitWithCompletion] = []
+    
+    class Config:
+        from_attributes = True
+
+
 class DailyActivityNotFound(BaseModel):
     """
     Ответ когда активности за день не найдено
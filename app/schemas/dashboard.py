@@ -0,0 +1,35 @@
+from pydantic import BaseModel
+from datetime import date
+from typing import Dict, List, Optional
+from app.schemas.mood import Mood
+
+
+class HabitProgress(BaseModel):
+    """
+    Прогресс привычек за день
+    """
+    done: int
+    total: int
+
+
+class HabitStreakItem(BaseModel):
+    """
+    Привычка и её текущая серия выполнений
+    """
+    habit_id: int
+    title: str
+    current_streak: int
+
+
+class Dashboard(BaseModel):
+    """
+    Сводка для главного экрана
+    """
+    date: date
+    mood: Optional[Mood] = None
+    tasks_by_status: Dict[str, int]
+    tasks_by_priority: Dict[str, int]
+    overdue_tasks: int
+    habits_today: HabitProgress
+    top_streaks: List[HabitStreakItem]
+    notes_this_week: int
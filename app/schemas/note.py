@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 
 class NoteBase(BaseModel):
@@ -43,4 +43,48 @@ class Note(NoteInDB):
     """
     Схема для возврата заметки
     """
-    pass
\ No newline at end of file
+    pass
+
+class NoteSummary(BaseModel):
+    """
+    Краткое представление заметки для списков (view=summary)
+    Вместо полного текста - фрагмент фиксированной длины
+    """
+    id: int
+    title: str
+    snippet: str
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
+
+class RelatedNote(BaseModel):
+    """
+    Похожая заметка и степень сходства (косинус TF-IDF векторов, 0..1)
+    """
+    id: int
+    title: str
+    score: float
+    created_at: datetime
+
+
+class NoteTitle(BaseModel):
+    """
+    Заметка без текста (для списков дубликатов)
+    """
+    id: int
+    title: str
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+
+class DuplicateGroup(BaseModel):
+    """
+    Группа почти-дубликатов и оценка сходства (коэффициент Жаккара по шинглам)
+    """
+    notes: List[NoteTitle]
+    similarity: float
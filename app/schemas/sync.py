@@ -0,0 +1,37 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import List, Optional
+from app.schemas.note import Note
+from app.schemas.task import Task
+from app.schemas.mood import Mood
+from app.schemas.habit import Habit, HabitCompletion
+
+
+class Tombstone(BaseModel):
+    """
+    Отметка об удалении записи
+    """
+    entity: str
+    id: int
+    deleted_at: Optional[datetime] = None
+
+
+class SyncResponse(BaseModel):
+    """
+    Ответ дельта-синхронизации
+
+    cursor передаётся в следующий запрос как since (всегда больше 0).
+    full=true - полный снимок, клиент заменяет локальные данные целиком.
+    has_more=true - записей больше, чем вернулось, нужно запросить ещё:
+    для снимка - с page_token, для изменений - с новым cursor.
+    """
+    cursor: int
+    full: bool = False
+    has_more: bool = False
+    page_token: Optional[str] = None
+    notes: List[Note] = []
+    tasks: List[Task] = []
+    moods: List[Mood] = []
+    habits: List[Habit] = []
+    habit_completions: List[HabitCompletion] = []
+    deleted: List[Tombstone] = []
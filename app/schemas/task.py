@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from app.models.task import TaskStatus, TaskPriority
 
 
@@ -53,4 +53,21 @@ class Task(TaskInDB):
     """
     Схема для возврата задачи
     """
-    pass
\ No newline at end of file
+    pass
+
+
+class TaskSummary(BaseModel):
+    """
+    Задача без описания (для кратких списков, view=summary)
+    """
+    id: int
+    title: str
+    status: TaskStatus
+    priority: TaskPriority
+    is_completed: bool
+    due_date: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
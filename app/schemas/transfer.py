@@ -0,0 +1,46 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Optional
+from app.models.task import TaskStatus
+from app.schemas.note import NoteCreate
+from app.schemas.task import TaskCreate
+from app.schemas.mood import MoodCreate
+from app.schemas.habit import HabitCreate, HabitCompletionCreate
+
+
+# ===== Записи файла импорта (формат выгрузки /export) =====
+
+class ImportTimestamps(BaseModel):
+    """
+    Исходный id записи и даты: при восстановлении даты сохраняются
+    """
+    id: Optional[int] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+
+class NoteImport(NoteCreate, ImportTimestamps):
+    pass
+
+
+class TaskImport(TaskCreate, ImportTimestamps):
+    status: TaskStatus = TaskStatus.TODO
+    is_completed: bool = False
+    completed_at: Optional[datetime] = None
+
+
+class MoodImport(MoodCreate, ImportTimestamps):
+    pass
+
+
+class HabitImport(HabitCreate, ImportTimestamps):
+    pass
+
+
+class HabitCompletionImport(HabitCompletionCreate):
+    """
+    habit_id - id привычки из того же файла
+    """
+    id: Optional[int] = None
+    habit_id: int
+    completed_at: Optional[datetime] = None
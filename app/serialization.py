@@ -0,0 +1,60 @@
+from functools import lru_cache
+from typing import Any, Optional, Tuple, Type
+from fastapi import Response, status
+from pydantic import BaseModel, ConfigDict, TypeAdapter, create_model
+
+
+@lru_cache(maxsize=None)
+def get_adapter(tp: Any) -> TypeAdapter:
+    """
+    Получить TypeAdapter для типа ответа
+    Схема валидации/сериализации строится один раз на тип и переиспользуется
+    """
+    return TypeAdapter(tp)
+
+
+@lru_cache(maxsize=256)
+def partial_model(schema: Type[BaseModel], fields: Tuple[str, ...]) -> Type[BaseModel]:
+    """
+    Модель с подмножеством полей схемы (для параметра fields=)
+    Валидация не обращается к остальным атрибутам, поэтому не
+    подгружает незапрошенные колонки
+    """
+    definitions = {
+        name: (schema.model_fields[name].annotation, schema.model_fields[name])
+        for name in fields
+    }
+    return create_model(
+        f"{schema.__name__}Partial",
+        __config__=ConfigDict(from_attributes=True),
+        **definitions
+    )
+
+
+def dump_json(tp: Any, content: Any, include: Optional[Any] = None) -> bytes:
+    """
+    Провалидировать данные (ORM объекты, словари или модели) и сразу сериализовать в JSON
+    Валидация выполняется один раз, сериализация идёт в pydantic-core без
+    промежуточных словарей и стандартного json
+    """
+    adapter = get_adapter(tp)
+    return adapter.dump_json(adapter.validate_python(content, from_attributes=True), include=include)
+
+
+def model_response(
+    tp: Any,
+    content: Any,
+    status_code: int = status.HTTP_200_OK,
+    include: Optional[Any] = None
+) -> Response:
+    """
+    Готовый JSON ответ для списковых endpoints
+
+    FastAPI не обрабатывает возвращённый Response повторно, поэтому
+    response_model в декораторе остаётся только для документации OpenAPI
+    """
+    return Response(
+        content=dump_json(tp, content, include=include),
+        status_code=status_code,
+        media_type="application/json"
+    )
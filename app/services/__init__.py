@@ -0,0 +1,3 @@
+"""
+Внутрипроцессные сервисы приложения (индексы, кэши, фильтры)
+"""
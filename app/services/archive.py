@@ -0,0 +1,281 @@
+"""
+Архивация выполнений привычек
+
+habit_completions хранит только последние COMPLETIONS_HOT_DAYS дней
+(с точностью до месяца), более старые строки переносятся в
+habit_completions_archive, а по каждому месяцу сохраняются итоги
+в habit_completion_rollups. Запросы за сегодня, неделю и текущая серия
+читают только "горячую" таблицу; архив читается, только если
+запрошенный период начинается раньше границы hot_boundary().
+
+Разбиение на секции (PARTITION BY RANGE) в MySQL несовместимо
+с внешними ключами, поэтому используется отдельная таблица.
+
+Перенесённые строки сохраняют id, поэтому id горячей таблицы не должны
+повторяться. Счётчик может откатиться назад, если строки с наибольшими id
+ушли в архив: MySQL 5.7 после перезапуска берёт AUTO_INCREMENT = max(id) + 1,
+SQLite без AUTOINCREMENT (таблицы, созданные до него) - всегда max(rowid) + 1.
+Поэтому строка с наибольшим id в архив не переносится, а ensure_schema()
+при старте поднимает AUTO_INCREMENT MySQL выше максимального id архива.
+"""
+import calendar
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, Iterable, Optional, Set, Tuple
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models.habit import HabitCompletion
+from app.models.habit_archive import HabitCompletionArchive, HabitCompletionRollup
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def next_month(month: date) -> date:
+    return (month + timedelta(days=32)).replace(day=1)
+
+
+def hot_boundary(today: Optional[date] = None) -> date:
+    """
+    Первый день месяца, с которого выполнения точно лежат в habit_completions
+    Всё, что раньше, может быть уже в архиве
+    """
+    today = today or date.today()
+    return month_start(today - timedelta(days=settings.COMPLETIONS_HOT_DAYS))
+
+
+def needs_archive(since: date) -> bool:
+    """
+    Нужно ли читать архив для периода, начинающегося с since
+    """
+    return since < hot_boundary()
+
+
+# ===== Серии по месячным итогам =====
+
+def summarize_month(month: date, days: Set[date]) -> Dict[str, int]:
+    """
+    Итоги месяца по множеству дней с выполнениями
+    """
+    length = calendar.monthrange(month.year, month.month)[1]
+    flags = [month.replace(day=d) in days for d in range(1, length + 1)]
+
+    head = 0
+    while head < length and flags[head]:
+        head += 1
+    tail = 0
+    while tail < length and flags[length - 1 - tail]:
+        tail += 1
+    longest = run = 0
+    for flag in flags:
+        run = run + 1 if flag else 0
+        longest = max(longest, run)
+
+    return {"days": sum(flags), "head_run": head, "tail_run": tail, "longest_run": longest}
+
+
+def month_summaries(days: Iterable[date]) -> Dict[date, Dict[str, int]]:
+    by_month: Dict[date, Set[date]] = {}
+    for day in days:
+        by_month.setdefault(month_start(day), set()).add(day)
+    return {month: summarize_month(month, month_days) for month, month_days in by_month.items()}
+
+
+def _is_full(month: date, summary: Dict[str, int]) -> bool:
+    return summary["days"] == calendar.monthrange(month.year, month.month)[1]
+
+
+def longest_streak(summaries: Dict[date, Dict[str, int]]) -> int:
+    """
+    Самая длинная серия по итогам месяцев (серии склеиваются через границы месяцев)
+    """
+    best = run = 0
+    previous = None
+    for month in sorted(summaries):
+        summary = summaries[month]
+        if previous is None or month != next_month(previous):
+            run = 0
+        if _is_full(month, summary):
+            run += summary["days"]
+        else:
+            best = max(best, run + summary["head_run"], summary["longest_run"])
+            run = summary["tail_run"]
+        best = max(best, run)
+        previous = month
+    return best
+
+
+def streak_before(summaries: Dict[date, Dict[str, int]], month: date) -> int:
+    """
+    Длина серии, которая заканчивается последним днём месяца перед month
+    """
+    streak = 0
+    month = (month - timedelta(days=1)).replace(day=1)
+    while month in summaries:
+        summary = summaries[month]
+        streak += summary["tail_run"]
+        if not _is_full(month, summary):
+            break
+        month = (month - timedelta(days=1)).replace(day=1)
+    return streak
+
+
+def daily_streaks(
+    today: date,
+    hot_days: Set[date],
+    rollups: Dict[date, Dict[str, int]],
+    load_month_days: Callable[[date], Set[date]]
+) -> Tuple[int, int]:
+    """
+    Текущая и самая длинная серия ежедневной привычки
+
+    hot_days - дни из habit_completions, rollups - итоги архивных месяцев,
+    load_month_days(month) - архивные дни месяца. Архив читается только
+    для месяцев, где есть и горячие, и архивные выполнения (импорт задним
+    числом), и если текущая серия уходит за границу hot_boundary().
+    """
+    boundary = hot_boundary(today)
+    summaries = dict(rollups)
+    hot_by_month: Dict[date, Set[date]] = {}
+    for day in hot_days:
+        hot_by_month.setdefault(month_start(day), set()).add(day)
+    for month, days in hot_by_month.items():
+        if month in rollups:
+            days = days | load_month_days(month)
+        summaries[month] = summarize_month(month, days)
+
+    current = 0
+    day = today
+    while day in hot_days:
+        current += 1
+        day -= timedelta(days=1)
+    if current and day < boundary and month_start(day) in rollups:
+        # Серия продолжается в архиве: текущий месяц по дням, предыдущие по итогам
+        month = month_start(day)
+        days = hot_days | load_month_days(month)
+        while day >= month and day in days:
+            current += 1
+            day -= timedelta(days=1)
+        if day < month:
+            current += streak_before(summaries, month)
+
+    return current, longest_streak(summaries)
+
+
+# ===== Перенос в архив =====
+
+def get_rollups(db: Session, habit_id: int) -> Dict[date, HabitCompletionRollup]:
+    return {
+        rollup.month: rollup
+        for rollup in db.query(HabitCompletionRollup).filter(HabitCompletionRollup.habit_id == habit_id)
+    }
+
+
+def archived_days(db: Session, habit_id: int, start: date, end: date) -> Set[date]:
+    """
+    Дни с архивными выполнениями привычки в периоде [start, end)
+    """
+    rows = db.query(HabitCompletionArchive.completed_at).filter(
+        HabitCompletionArchive.habit_id == habit_id,
+        HabitCompletionArchive.completed_at >= datetime.combine(start, datetime.min.time()),
+        HabitCompletionArchive.completed_at < datetime.combine(end, datetime.min.time())
+    )
+    return {completed_at.date() for (completed_at,) in rows}
+
+
+def refresh_rollup(db: Session, habit_id: int, month: date) -> None:
+    """
+    Пересчитать итоги месяца по архиву (после переноса или удаления выполнения)
+    """
+    end = next_month(month)
+    completions = db.query(func.count(HabitCompletionArchive.id)).filter(
+        HabitCompletionArchive.habit_id == habit_id,
+        HabitCompletionArchive.completed_at >= datetime.combine(month, datetime.min.time()),
+        HabitCompletionArchive.completed_at < datetime.combine(end, datetime.min.time())
+    ).scalar()
+
+    rollup = db.get(HabitCompletionRollup, (habit_id, month))
+    if not completions:
+        if rollup is not None:
+            db.delete(rollup)
+        return
+    if rollup is None:
+        rollup = HabitCompletionRollup(habit_id=habit_id, month=month)
+        db.add(rollup)
+    rollup.completions = completions
+    for key, value in summarize_month(month, archived_days(db, habit_id, month, end)).items():
+        setattr(rollup, key, value)
+
+
+def archive_completions(
+    db: Session,
+    batch_size: int,
+    cutoff: Optional[date] = None,
+    on_batch: Optional[Callable[[int], None]] = None
+) -> Tuple[int, int]:
+    """
+    Перенести выполнения раньше cutoff в архив и обновить месячные итоги
+
+    Каждая пачка (вставка в архив, удаление из горячей таблицы и пересчёт
+    итогов затронутых месяцев) - одна транзакция: после сбоя у каждого
+    архивного месяца есть актуальные итоги, повторный запуск безопасен.
+    Месяц, попавший в несколько пачек, пересчитывается в каждой из них.
+    Возвращает (перенесено строк, обновлено месяцев)
+    """
+    cutoff_at = datetime.combine(cutoff or hot_boundary(), datetime.min.time())
+    columns = (HabitCompletion.id, HabitCompletion.habit_id, HabitCompletion.completed_at, HabitCompletion.note)
+    touched: Set[Tuple[int, date]] = set()
+    moved = 0
+    # Строка с наибольшим id остаётся: по ней считается следующий id (см. выше)
+    newest = db.query(func.max(HabitCompletion.id)).scalar()
+    if newest is None:
+        return 0, 0
+
+    while True:
+        rows = db.query(*columns).filter(
+            HabitCompletion.completed_at < cutoff_at,
+            HabitCompletion.id < newest
+        ).order_by(HabitCompletion.id.asc()).limit(batch_size).all()
+        if not rows:
+            break
+        db.execute(insert(HabitCompletionArchive), [
+            {"id": row.id, "habit_id": row.habit_id, "completed_at": row.completed_at, "note": row.note}
+            for row in rows
+        ])
+        db.query(HabitCompletion).filter(
+            HabitCompletion.id.in_([row.id for row in rows])
+        ).delete(synchronize_session=False)
+        months = {(row.habit_id, month_start(row.completed_at.date())) for row in rows}
+        for habit_id, month in sorted(months):
+            refresh_rollup(db, habit_id, month)
+        db.commit()
+
+        touched.update(months)
+        moved += len(rows)
+        if on_batch is not None:
+            on_batch(moved)
+
+    return moved, len(touched)
+
+
+# ===== Схема =====
+
+def ensure_schema(bind: Engine) -> None:
+    """
+    То, чего create_all не делает для уже существующих таблиц:
+    индекс по completed_at (выборка строк для переноса) и AUTO_INCREMENT
+    горячей таблицы выше максимального id архива (MySQL)
+    Вызывается при старте приложения для каждой БД с данными
+    """
+    for index in HabitCompletion.__table__.indexes:
+        index.create(bind, checkfirst=True)
+
+    if bind.dialect.name != "mysql":
+        return
+    with bind.begin() as conn:
+        archived = conn.execute(select(func.max(HabitCompletionArchive.id))).scalar()
+        if archived is not None:
+            # Значение ниже max(id) + 1 InnoDB сам поднимает до него
+            conn.execute(text(f"ALTER TABLE {HabitCompletion.__tablename__} AUTO_INCREMENT = {int(archived) + 1}"))
@@ -0,0 +1,252 @@
+"""
+Кеш результатов списковых CRUD функций с версионированием по пользователю
+
+Ключ - (функция, аргументы), к нему добавляется версия данных пользователя
+по каждой сущности, от которой зависит результат. Запись сущности увеличивает
+её версию, и все ключи пользователя по этой сущности перестают совпадать:
+инвалидация за O(1), без перебора ключей. Старые записи вытесняются LRU.
+
+Версии увеличиваются после commit (событие after_commit сессии) по списку
+изменений, который record_change накапливает в session.info.
+
+Кешированная функция возвращает отвязанные от сессии копии (pickle) и при
+попадании, и при промахе: ORM объекты с теми атрибутами, которые функция
+загрузила сама. Отложенные колонки и связи, не загруженные внутри функции,
+вызывают DetachedInstanceError - функция должна загрузить всё, что отдаёт
+(undefer, selectinload). Чтение с реплики сразу после инвалидации в кеш
+не попадает: реплика могла ещё не получить изменение.
+"""
+import functools
+import hashlib
+import inspect
+import pickle
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.config import settings
+
+# Ключ session.info со списком (user_id, entity), изменённых в транзакции
+PENDING_CHANGES_KEY = "changed_entities"
+
+
+class CacheBackend(ABC):
+    """
+    Хранилище кеша: значения (сериализованные байты) и счётчики версий
+
+    Внешнее хранилище (Redis, memcached) реализует тот же интерфейс,
+    тогда версии и значения общие для всех воркеров.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: int) -> None:
+        ...
+
+    @abstractmethod
+    def get_version(self, key: str) -> int:
+        ...
+
+    @abstractmethod
+    def bump_version(self, key: str) -> int:
+        ...
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class MemoryBackend(CacheBackend):
+    """
+    LRU в памяти процесса с ограничением по числу записей и суммарному объёму
+    Версии живут только в этом процессе: при нескольких воркерах запись,
+    сделанная другим воркером, станет видна не позже чем через ttl
+    """
+
+    def __init__(self, max_items: int, max_bytes: int):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self._items: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._bytes = 0
+        self._evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            if item[1] < time.monotonic():
+                self._bytes -= len(self._items.pop(key)[0])
+                return None
+            self._items.move_to_end(key)
+            return item[0]
+
+    def set(self, key: str, value: bytes, ttl: int) -> None:
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[0])
+            self._items[key] = (value, time.monotonic() + ttl)
+            self._bytes += len(value)
+            while len(self._items) > self.max_items or self._bytes > self.max_bytes:
+                _, (evicted, _) = self._items.popitem(last=False)
+                self._bytes -= len(evicted)
+                self._evictions += 1
+
+    def get_version(self, key: str) -> int:
+        return self._versions.get(key, 0)
+
+    def bump_version(self, key: str) -> int:
+        with self._lock:
+            version = self._versions.get(key, 0) + 1
+            self._versions[key] = version
+            return version
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._versions.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "items": len(self._items),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "evictions": self._evictions,
+        }
+
+
+class ResultCache:
+    """
+    Кеш результатов с версиями по (сущность, пользователь) и счётчиками попаданий
+    """
+
+    def __init__(self, backend: CacheBackend, ttl_seconds: int, enabled: bool = True, replica_lag_seconds: float = 0.0):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self.replica_lag_seconds = replica_lag_seconds
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+        # Время последней инвалидации по ключу версии (только недавние)
+        self._invalidated: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def version_key(entity: str, user_id: int) -> str:
+        return f"v:{entity}:{user_id}"
+
+    def invalidate(self, user_id: int, entity: str) -> None:
+        key = self.version_key(entity, user_id)
+        self.backend.bump_version(key)
+        if self.replica_lag_seconds <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._invalidated[key] = now
+            self._invalidated.move_to_end(key)
+            while self._invalidated and next(iter(self._invalidated.values())) < now - self.replica_lag_seconds:
+                self._invalidated.popitem(last=False)
+
+    def _recently_invalidated(self, keys) -> bool:
+        threshold = time.monotonic() - self.replica_lag_seconds
+        with self._lock:
+            return any(self._invalidated.get(key, 0.0) >= threshold for key in keys)
+
+    def _may_be_stale(self, db: Session, version_keys) -> bool:
+        """
+        Результат прочитан (или мог быть прочитан) с реплики, которая ещё
+        не получила недавнюю запись
+        """
+        reads_replica = getattr(db, "reads_replica", None)
+        if reads_replica is None or not reads_replica():
+            return False
+        return self._recently_invalidated(version_keys)
+
+    def cached(self, *entities: str, ttl: Optional[int] = None) -> Callable:
+        """
+        Декоратор для CRUD функции вида f(db, user_id, ...)
+        entities - сущности, изменение которых меняет результат
+        ttl - время жизни результата, если он зависит ещё и от текущего времени
+        """
+
+        def decorator(func: Callable) -> Callable:
+            signature = inspect.signature(func)
+            name = f"{func.__module__}.{func.__qualname__}"
+
+            @functools.wraps(func)
+            def wrapper(db: Session, *args, **kwargs):
+                if not self.enabled:
+                    return func(db, *args, **kwargs)
+
+                bound = signature.bind(db, *args, **kwargs)
+                bound.apply_defaults()
+                arguments = {k: v for k, v in bound.arguments.items() if k != "db"}
+                user_id = arguments["user_id"]
+
+                version_keys = [self.version_key(entity, user_id) for entity in entities]
+                versions = [self.backend.get_version(version_key) for version_key in version_keys]
+                raw = f"{name}|{user_id}|{versions}|{sorted(arguments.items())!r}"
+                key = "r:" + hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()
+
+                data = self.backend.get(key)
+                if data is not None:
+                    self.hits += 1
+                    return pickle.loads(data)
+
+                self.misses += 1
+                # Промах возвращает такую же отвязанную копию, как попадание
+                data = pickle.dumps(func(db, *args, **kwargs), protocol=pickle.HIGHEST_PROTOCOL)
+                if self._may_be_stale(db, version_keys):
+                    self.skipped += 1
+                else:
+                    self.backend.set(key, data, self.ttl_seconds if ttl is None else ttl)
+                return pickle.loads(data)
+
+            wrapper.uncached = func
+            return wrapper
+
+        return decorator
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            "skipped_replica_reads": self.skipped,
+            **self.backend.stats(),
+        }
+
+
+result_cache = ResultCache(
+    MemoryBackend(max_items=settings.CACHE_MAX_ITEMS, max_bytes=settings.CACHE_MAX_BYTES),
+    ttl_seconds=settings.CACHE_TTL_SECONDS,
+    enabled=settings.CACHE_ENABLED,
+    replica_lag_seconds=settings.READ_YOUR_WRITES_SECONDS if settings.DATABASE_REPLICA_URLS else 0.0,
+)
+
+cached = result_cache.cached
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_versions(session: Session) -> None:
+    for user_id, entity in session.info.pop(PENDING_CHANGES_KEY, ()):
+        result_cache.invalidate(user_id, entity)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_changes(session: Session, previous_transaction) -> None:
+    session.info.pop(PENDING_CHANGES_KEY, None)
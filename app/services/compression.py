@@ -0,0 +1,106 @@
+"""
+Перепаковка текстов заметок под текущие настройки сжатия
+
+    python -m app.services.compression             # сжать длинные тексты
+    python -m app.services.compression --decompress  # вернуть всё как было
+
+Заметки читаются пачками по id, значение в БД переписывается только если
+его форма (сжатое / несжатое) не совпадает с нужной или у сжатого текста
+нет слов для поиска (note_words, см. search_words). updated_at
+сохраняется, в журнал синхронизации ничего не пишется: содержимое
+заметок для клиентов не меняется.
+"""
+import argparse
+from typing import Callable, Optional, Tuple
+from sqlalchemy import bindparam, insert, update
+from sqlalchemy.orm import Session
+from app.database import SessionLocal, shard_map
+from app.models.note import Note
+from app.models.note_words import NoteWords
+from app.models.types import COMPRESSED_MARK, compress_text, decompress_text, is_compressed, search_words, should_compress
+
+# Заметок за одну транзакцию
+MIGRATION_BATCH_SIZE = 500
+
+
+def migrate_notes(
+    db: Session,
+    decompress: bool = False,
+    batch_size: int = MIGRATION_BATCH_SIZE,
+    on_batch: Optional[Callable[[int, int], None]] = None
+) -> Tuple[int, int]:
+    """
+    Сжать (или распаковать) тексты заметок, записанные до смены настроек
+
+    Возвращает (просмотрено, переписано)
+    """
+    statement = update(Note.__table__).where(
+        Note.__table__.c.id == bindparam("note_id")
+    ).values(
+        content=bindparam("raw"),
+        updated_at=Note.__table__.c.updated_at
+    )
+
+    scanned = rewritten = 0
+    last_id = 0
+    while True:
+        rows = db.query(Note.id, Note.content_raw, NoteWords.note_id.isnot(None)).outerjoin(
+            NoteWords, NoteWords.note_id == Note.id
+        ).filter(
+            Note.id > last_id
+        ).order_by(Note.id.asc()).limit(batch_size).all()
+        if not rows:
+            break
+
+        changes = []
+        for note_id, stored, has_words in rows:
+            text = decompress_text(stored)
+            # Текст, начинающийся с COMPRESSED_MARK, остаётся сжатым и при --decompress
+            if text.startswith(COMPRESSED_MARK) or (not decompress and should_compress(text)):
+                target, words = compress_text(text), search_words(text)
+            else:
+                target, words = text, None
+            if is_compressed(stored) != is_compressed(target) or (words is not None) != has_words:
+                changes.append({"note_id": note_id, "raw": target, "words": words})
+        if changes:
+            db.execute(statement, changes)
+            db.query(NoteWords).filter(
+                NoteWords.note_id.in_([change["note_id"] for change in changes])
+            ).delete(synchronize_session=False)
+            words_rows = [
+                {"note_id": change["note_id"], "words": change["words"]}
+                for change in changes if change["words"] is not None
+            ]
+            if words_rows:
+                db.execute(insert(NoteWords), words_rows)
+        db.commit()
+
+        last_id = rows[-1][0]
+        scanned += len(rows)
+        rewritten += len(changes)
+        if on_batch is not None:
+            on_batch(scanned, rewritten)
+    return scanned, rewritten
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Перепаковка текстов заметок")
+    parser.add_argument("--decompress", action="store_true", help="распаковать все сжатые тексты")
+    parser.add_argument("--batch-size", type=int, default=MIGRATION_BATCH_SIZE)
+    args = parser.parse_args()
+
+    def report(scanned: int, rewritten: int) -> None:
+        print(f"просмотрено {scanned}, переписано {rewritten}", flush=True)
+
+    scanned = rewritten = 0
+    for shard in shard_map.names:
+        print(f"шард {shard}", flush=True)
+        with SessionLocal(shard=shard) as db:
+            shard_scanned, shard_rewritten = migrate_notes(db, args.decompress, args.batch_size, report)
+        scanned += shard_scanned
+        rewritten += shard_rewritten
+    print(f"✅ Готово: просмотрено {scanned}, переписано {rewritten}")
+
+
+if __name__ == "__main__":
+    main()
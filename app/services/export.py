@@ -0,0 +1,146 @@
+"""
+Потоковая выгрузка всех данных пользователя в NDJSON или CSV
+
+Записи читаются из БД порциями (yield_per, серверный курсор) и сразу
+пишутся в поток ответа, поэтому память не зависит от объёма дневника.
+"""
+import csv
+import enum
+import io
+import zlib
+from datetime import date, datetime, time
+from typing import Any, Dict, Iterator, List, Tuple
+import orjson
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models.note import Note
+from app.models.task import Task
+from app.models.mood import Mood
+from app.models.habit import Habit, HabitCompletion
+from app.models.habit_archive import HabitCompletionArchive
+
+# Строк за одно чтение из курсора и байт в одном куске ответа
+EXPORT_ROWS_PER_FETCH = 1000
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+# Порядок важен для импорта: привычки идут раньше своих выполнений
+EXPORT_SOURCES: List[Tuple[str, Any, Tuple[str, ...]]] = [
+    ("note", Note, ("id", "title", "content", "created_at", "updated_at")),
+    ("task", Task, (
+        "id", "title", "description", "status", "priority", "is_completed",
+        "due_date", "completed_at", "created_at", "updated_at"
+    )),
+    ("mood", Mood, ("id", "mood_level", "mood_date", "note", "created_at", "updated_at")),
+    ("habit", Habit, (
+        "id", "title", "description", "frequency", "target_time", "duration_minutes",
+        "weekdays", "custom_interval_days", "is_active", "color", "created_at", "updated_at"
+    )),
+    ("habit_completion", HabitCompletion, ("id", "habit_id", "completed_at", "note")),
+    ("habit_completion", HabitCompletionArchive, ("id", "habit_id", "completed_at", "note")),
+]
+
+# Колонки CSV: тип записи и объединение полей всех типов
+CSV_COLUMNS: List[str] = ["type"] + list(dict.fromkeys(
+    column for _, _, columns in EXPORT_SOURCES for column in columns
+))
+
+
+def iter_records(db: Session, user_id: int) -> Iterator[Dict[str, Any]]:
+    """
+    Все записи пользователя по одной, с полем type
+    """
+    for kind, model, columns in EXPORT_SOURCES:
+        query = db.query(*[getattr(model, column) for column in columns])
+        if model is HabitCompletion or model is HabitCompletionArchive:
+            query = query.join(Habit, Habit.id == model.habit_id).filter(Habit.user_id == user_id)
+        else:
+            query = query.filter(model.user_id == user_id)
+        for row in query.order_by(model.id.asc()).yield_per(EXPORT_ROWS_PER_FETCH):
+            record = {"type": kind}
+            record.update(zip(columns, row))
+            yield record
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, (list, dict)):
+        return orjson.dumps(value).decode()
+    return value
+
+
+def _ndjson_lines(records: Iterator[Dict[str, Any]]) -> Iterator[bytes]:
+    for record in records:
+        yield orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE)
+
+
+def _csv_lines(records: Iterator[Dict[str, Any]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    for record in records:
+        writer.writerow([_csv_value(record.get(column)) for column in CSV_COLUMNS])
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _chunked(lines: Iterator[bytes]) -> Iterator[bytes]:
+    """
+    Склеить строки в куски около EXPORT_CHUNK_BYTES
+    """
+    parts: List[bytes] = []
+    size = 0
+    for line in lines:
+        parts.append(line)
+        size += len(line)
+        if size >= EXPORT_CHUNK_BYTES:
+            yield b"".join(parts)
+            parts, size = [], 0
+    if parts:
+        yield b"".join(parts)
+
+
+def _gzipped(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    """
+    Сжатие на лету в формат gzip (wbits=31)
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_filename(user_id: int, fmt: str, gzip: bool = False) -> str:
+    name = f"diary-{user_id}-{date.today().isoformat()}.{fmt}"
+    return name + ".gz" if gzip else name
+
+
+def export_media_type(fmt: str, gzip: bool = False) -> str:
+    if gzip:
+        return "application/gzip"
+    return "text/csv; charset=utf-8" if fmt == "csv" else "application/x-ndjson"
+
+
+def stream_export(user_id: int, fmt: str, gzip: bool = False) -> Iterator[bytes]:
+    """
+    Поток байтов выгрузки
+
+    Сессия открывается внутри генератора: поток читается уже после
+    выхода из endpoint, и сессия живёт ровно столько, сколько выгрузка.
+    """
+    with SessionLocal(user_id=user_id) as db:
+        records = iter_records(db, user_id)
+        lines = _csv_lines(records) if fmt == "csv" else _ndjson_lines(records)
+        chunks = _chunked(lines)
+        if gzip:
+            chunks = _gzipped(chunks)
+        yield from chunks
@@ -0,0 +1,147 @@
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, FrozenSet, List, Set, Tuple
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models.note import Note
+from app.models.task import Task
+from app.services.user_index import UserIndexRegistry
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+DocRef = Tuple[str, int]
+
+
+def tokenize(text: str) -> List[str]:
+    return [w for w in _WORD_RE.findall(text.lower()) if len(w) >= 2]
+
+
+def trigrams(word: str) -> FrozenSet[str]:
+    """
+    Триграммы слова с дополнением пробелами, как в pg_trgm
+    """
+    padded = f"  {word} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class TrigramIndex:
+    """
+    Триграммный индекс словаря одного пользователя
+
+    trigram -> слова, слово -> записи. Кандидаты для слова запроса
+    собираются только по спискам его триграмм, поэтому стоимость поиска
+    зависит от числа совпадающих триграмм, а не от объёма текста.
+    """
+
+    def __init__(self):
+        self._trigram_words: Dict[str, Set[str]] = defaultdict(set)
+        self._word_trigrams: Dict[str, FrozenSet[str]] = {}
+        self._word_docs: Dict[str, Set[DocRef]] = defaultdict(set)
+        self._doc_words: Dict[DocRef, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def _remove(self, ref: DocRef) -> None:
+        for word in self._doc_words.pop(ref, ()):
+            docs = self._word_docs[word]
+            docs.discard(ref)
+            if docs:
+                continue
+            # Слово больше нигде не встречается - убираем его из словаря
+            del self._word_docs[word]
+            for tg in self._word_trigrams.pop(word, ()):
+                words = self._trigram_words[tg]
+                words.discard(word)
+                if not words:
+                    del self._trigram_words[tg]
+
+    def add(self, kind: str, item_id: int, text: str) -> None:
+        ref = (kind, item_id)
+        words = set(tokenize(text))
+        with self._lock:
+            self._remove(ref)
+            self._doc_words[ref] = words
+            for word in words:
+                self._word_docs[word].add(ref)
+                if word not in self._word_trigrams:
+                    grams = trigrams(word)
+                    self._word_trigrams[word] = grams
+                    for tg in grams:
+                        self._trigram_words[tg].add(word)
+
+    def remove(self, kind: str, item_id: int) -> None:
+        with self._lock:
+            self._remove((kind, item_id))
+
+    def similar_words(self, word: str, threshold: float) -> List[Tuple[str, float]]:
+        """
+        Слова словаря, похожие на word (коэффициент Жаккара по триграммам)
+        """
+        grams = trigrams(word)
+        shared: Counter = Counter()
+        for tg in grams:
+            for candidate in self._trigram_words.get(tg, ()):
+                shared[candidate] += 1
+
+        result = []
+        for candidate, common in shared.items():
+            similarity = common / (len(grams) + len(self._word_trigrams[candidate]) - common)
+            if similarity >= threshold:
+                result.append((candidate, similarity))
+        return result
+
+    def search(self, query: str, threshold: float) -> Tuple[Dict[DocRef, float], List[str]]:
+        """
+        Нечёткий поиск: для каждой записи сумма лучших сходств по словам запроса
+        Возвращает оценки записей и лучшие найденные варианты слов запроса
+        """
+        scores: Dict[DocRef, float] = defaultdict(float)
+        corrections: List[str] = []
+        with self._lock:
+            for word in dict.fromkeys(tokenize(query)):
+                matches = self.similar_words(word, threshold)
+                if not matches:
+                    continue
+                corrections.append(max(matches, key=lambda m: m[1])[0])
+
+                best: Dict[DocRef, float] = {}
+                for candidate, similarity in matches:
+                    for ref in self._word_docs[candidate]:
+                        if similarity > best.get(ref, 0.0):
+                            best[ref] = similarity
+                for ref, similarity in best.items():
+                    scores[ref] += similarity
+        return scores, corrections
+
+
+def load_trigram_index(db: Session, user_id: int) -> TrigramIndex:
+    """
+    Построить индекс по заголовкам и текстам заметок и задач пользователя
+    """
+    index = TrigramIndex()
+    notes = db.query(Note.id, Note.title, Note.content).filter(
+        Note.user_id == user_id
+    ).yield_per(500)
+    for note_id, title, content in notes:
+        index.add("note", note_id, f"{title} {content}")
+
+    tasks = db.query(Task.id, Task.title, Task.description).filter(
+        Task.user_id == user_id
+    ).yield_per(500)
+    for task_id, title, description in tasks:
+        index.add("task", task_id, f"{title} {description or ''}")
+    return index
+
+
+trigram_indexes: UserIndexRegistry[TrigramIndex] = UserIndexRegistry(
+    load_trigram_index,
+    max_users=settings.FUZZY_MAX_USERS,
+    ttl_seconds=settings.FUZZY_TTL_SECONDS,
+)
+
+
+def fuzzy_search(db: Session, user_id: int, query: str) -> Tuple[Dict[DocRef, float], List[str]]:
+    """
+    Нечёткий поиск по заметкам и задачам пользователя
+    """
+    return trigram_indexes.get(db, user_id).search(query, settings.FUZZY_SIMILARITY_THRESHOLD)
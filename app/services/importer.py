@@ -0,0 +1,222 @@
+"""
+Потоковый импорт выгрузки (NDJSON или CSV, можно в gzip)
+
+Файл читается построчно генератором, каждая запись проверяется схемой
+из app.schemas.transfer, строки вставляются пачками через ORM: id новых
+строк нужны для журнала изменений (где СУБД поддерживает RETURNING, пачка -
+один многострочный INSERT). В памяти одновременно только одна пачка на тип
+записи. Строки декодируются по одной: битая кодировка или CSV-разметка -
+ошибка этой записи, а не всего импорта.
+"""
+import csv
+import gzip
+import os
+from datetime import datetime
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Set, Tuple
+import orjson
+from pydantic import BaseModel, ValidationError
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal
+from app.models.note import Note
+from app.models.task import Task
+from app.models.mood import Mood
+from app.models.habit import Habit, HabitCompletion
+from app.schemas.transfer import (
+    NoteImport, TaskImport, MoodImport, HabitImport, HabitCompletionImport
+)
+from app.crud.sync import record_changes
+from app.services.indexing import invalidate_user
+from app.services.jobs import JobContext
+
+IMPORT_TYPES: Dict[str, Tuple[Any, type]] = {
+    "note": (Note, NoteImport),
+    "task": (Task, TaskImport),
+    "mood": (Mood, MoodImport),
+    "habit": (Habit, HabitImport),
+    "habit_completion": (HabitCompletion, HabitCompletionImport),
+}
+
+# В CSV списки и числовые enum записаны как JSON (см. app.services.export)
+CSV_JSON_COLUMNS = {"weekdays", "mood_level"}
+
+# Сколько ошибок разбора сохраняется в статусе задачи
+MAX_REPORTED_ERRORS = 100
+
+
+def open_upload(path: str) -> BinaryIO:
+    """
+    Открыть файл в двоичном режиме, gzip распознаётся по сигнатуре
+    Текст декодируется построчно (decode_record, iter_csv)
+    """
+    with open(path, "rb") as probe:
+        magic = probe.read(2)
+    if magic == b"\x1f\x8b":
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def iter_ndjson(fh: BinaryIO) -> Iterator[Tuple[int, Any]]:
+    for lineno, line in enumerate(fh, 1):
+        if line.strip():
+            yield lineno, line
+
+
+def iter_csv(fh: BinaryIO) -> Iterator[Tuple[int, Any]]:
+    """
+    Строки CSV; запись с битой кодировкой или разметкой отдаётся как
+    ValueError (decode_record его поднимает), чтение продолжается
+    """
+    errors: Dict[int, UnicodeDecodeError] = {}
+
+    def lines() -> Iterator[str]:
+        for lineno, line in enumerate(fh, 1):
+            try:
+                yield line.decode("utf-8")
+            except UnicodeDecodeError as exc:
+                errors[lineno] = exc
+                yield line.decode("utf-8", errors="replace")
+
+    reader = csv.DictReader(lines())
+    last_line = 0
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as exc:
+            yield reader.line_num, ValueError(f"Invalid CSV: {exc}")
+        else:
+            # Запись CSV может занимать несколько строк файла
+            broken = [lineno for lineno in range(last_line + 1, reader.line_num + 1) if lineno in errors]
+            yield reader.line_num, errors[broken[0]] if broken else row
+        last_line = reader.line_num
+
+
+def decode_record(raw: Any) -> Dict[str, Any]:
+    """
+    Строка NDJSON (bytes) или строка CSV -> словарь полей
+    """
+    if isinstance(raw, ValueError):
+        raise raw
+    if isinstance(raw, bytes):
+        record = orjson.loads(raw.decode("utf-8"))
+        if not isinstance(record, dict):
+            raise ValueError("Record must be a JSON object")
+        return record
+
+    record = {}
+    for column, value in raw.items():
+        if column is None or value is None or value == "":
+            continue
+        record[column] = orjson.loads(value) if column in CSV_JSON_COLUMNS else value
+    return record
+
+
+class _Importer:
+    """
+    Накопление и вставка пачек для одного пользователя
+    """
+
+    def __init__(self, db: Session, user_id: int, ctx: JobContext, batch_size: int):
+        self.db = db
+        self.user_id = user_id
+        self.ctx = ctx
+        self.batch_size = batch_size
+        self.pending: Dict[str, List[Dict[str, Any]]] = {kind: [] for kind in IMPORT_TYPES}
+        self.habit_ids: Dict[int, int] = {}
+        self.mood_dates: Set = {
+            mood_date for (mood_date,) in db.query(Mood.mood_date).filter(Mood.user_id == user_id)
+        }
+        ctx.progress.update({"processed": 0, "imported": 0, "skipped": 0, "errors": []})
+
+    def error(self, lineno: int, message: str) -> None:
+        self.ctx.progress["skipped"] += 1
+        errors = self.ctx.progress["errors"]
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({"line": lineno, "error": message})
+
+    def add(self, lineno: int, record: Dict[str, Any]) -> None:
+        kind = record.pop("type", None)
+        if kind not in IMPORT_TYPES:
+            raise ValueError(f"Unknown record type: {kind}")
+        schema = IMPORT_TYPES[kind][1]
+        item: BaseModel = schema.model_validate(record)
+        row = item.model_dump()
+        source_id = row.pop("id", None)
+
+        if kind == "habit_completion":
+            if self.pending["habit"]:
+                # Выполнение может ссылаться на привычку из ещё не вставленной пачки
+                self.flush("habit")
+            if row["habit_id"] not in self.habit_ids:
+                raise ValueError(f"Unknown habit_id: {row['habit_id']}")
+            row["habit_id"] = self.habit_ids[row["habit_id"]]
+            row["completed_at"] = row["completed_at"] or datetime.now()
+        else:
+            row["user_id"] = self.user_id
+            row["created_at"] = row["created_at"] or datetime.now()
+
+        if kind == "mood":
+            if row["mood_date"] in self.mood_dates:
+                raise ValueError(f"Mood for {row['mood_date']} already exists")
+            self.mood_dates.add(row["mood_date"])
+        if kind == "habit":
+            row["_source_id"] = source_id
+
+        self.pending[kind].append(row)
+        if len(self.pending[kind]) >= self.batch_size:
+            self.flush(kind)
+
+    def flush(self, kind: str) -> None:
+        rows = self.pending[kind]
+        if not rows:
+            return
+        self.pending[kind] = []
+        model = IMPORT_TYPES[kind][0]
+
+        # Вставка через ORM возвращает id новых строк (MySQL не поддерживает
+        # RETURNING для пачки). Для заметок атрибут content сжимает длинный
+        # текст и добавляет слова для поиска (note_words)
+        source_ids = [row.pop("_source_id") for row in rows] if kind == "habit" else []
+        items = [model(**row) for row in rows]
+        self.db.add_all(items)
+        self.db.flush()
+        # id привычек из файла -> новые id, на них ссылаются выполнения
+        for source_id, habit in zip(source_ids, items):
+            if source_id is not None:
+                self.habit_ids[source_id] = habit.id
+
+        # Вставленные записи (и только они) - в журнал изменений для синхронизации
+        record_changes(self.db, self.user_id, kind, [item.id for item in items])
+        self.db.commit()
+        self.ctx.progress["imported"] += len(rows)
+        self.ctx.save()
+
+    def flush_all(self) -> None:
+        for kind in IMPORT_TYPES:
+            self.flush(kind)
+
+
+def run_import(ctx: JobContext, path: str, fmt: str, user_id: int, batch_size: Optional[int] = None) -> None:
+    """
+    Импортировать файл и удалить его; прогресс пишется в ctx.progress
+    """
+    try:
+        with SessionLocal(user_id=user_id) as db, open_upload(path) as fh:
+            importer = _Importer(db, user_id, ctx, batch_size or settings.IMPORT_BATCH_SIZE)
+            records = iter_csv(fh) if fmt == "csv" else iter_ndjson(fh)
+            for lineno, raw in records:
+                ctx.progress["processed"] += 1
+                try:
+                    importer.add(lineno, decode_record(raw))
+                except ValidationError as exc:
+                    importer.error(lineno, "; ".join(
+                        f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in exc.errors()
+                    ))
+                except ValueError as exc:
+                    importer.error(lineno, str(exc))
+            importer.flush_all()
+    finally:
+        os.unlink(path)
+        invalidate_user(user_id)
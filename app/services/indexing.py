@@ -0,0 +1,61 @@
+"""
+Обновление индексов в памяти после записи через CRUD
+"""
+from app.services import fuzzy, minhash, related, suggest
+
+# Индексы в памяти, которые строятся по данным пользователя
+USER_INDEXES = (
+    ("suggest", suggest.title_indexes),
+    ("fuzzy", fuzzy.trigram_indexes),
+    ("related", related.related_indexes),
+    ("duplicates", minhash.lsh_indexes),
+)
+
+
+def _text(kind: str, item) -> str:
+    if kind == "note":
+        return f"{item.title} {item.content}"
+    return f"{item.title} {item.description or ''}"
+
+
+def on_saved(user_id: int, kind: str, item) -> None:
+    """
+    Запись создана или изменена
+    """
+    suggest.index_title(user_id, kind, item)
+    if kind in ("note", "task"):
+        index = fuzzy.trigram_indexes.peek(user_id)
+        if index is not None:
+            index.add(kind, item.id, _text(kind, item))
+    if kind == "note":
+        index = related.related_indexes.peek(user_id)
+        if index is not None:
+            index.add(item.id, _text(kind, item))
+        index = minhash.lsh_indexes.peek(user_id)
+        if index is not None and item.signature is not None:
+            index.add(item.id, minhash.from_bytes(item.signature.signature))
+
+
+def on_deleted(user_id: int, kind: str, item_id: int) -> None:
+    """
+    Запись удалена
+    """
+    suggest.unindex_title(user_id, kind, item_id)
+    index = fuzzy.trigram_indexes.peek(user_id)
+    if index is not None:
+        index.remove(kind, item_id)
+    if kind == "note":
+        index = related.related_indexes.peek(user_id)
+        if index is not None:
+            index.remove(item_id)
+        index = minhash.lsh_indexes.peek(user_id)
+        if index is not None:
+            index.remove(item_id)
+
+
+def invalidate_user(user_id: int) -> None:
+    """
+    Сбросить все индексы пользователя (после массовых изменений в обход CRUD)
+    """
+    for _, registry in USER_INDEXES:
+        registry.invalidate(user_id)
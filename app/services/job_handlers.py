@@ -0,0 +1,217 @@
+"""
+Обработчики фоновых задач (регистрируются в job_runner при импорте модуля)
+"""
+import os
+import time
+from typing import Optional
+from sqlalchemy import insert, select
+from app.config import settings
+from app.database import SessionLocal, shard_map
+from app.crud import user as crud_user
+from app.models.job import Job, JobLease, JobSlot
+from app.models.note import Note
+from app.models.note_signature import NoteSignature
+from app.services import archive, minhash
+from app.services.export import stream_export, export_filename, export_media_type
+from app.services.importer import run_import
+from app.services.indexing import USER_INDEXES, invalidate_user
+from app.services.jobs import JobContext, job_runner
+from app.services.sharding import fan_out
+
+# Заметок за один проход досчёта сигнатур
+SIGNATURE_CHUNK_SIZE = 500
+
+
+def result_path(job_id: str, filename: str) -> str:
+    """
+    Путь к файлу результата задачи (имя уникально за счёт id задачи)
+    """
+    return os.path.join(settings.JOB_RESULT_DIR, f"{job_id}-{filename}")
+
+
+@job_runner.register("import")
+def import_job(ctx: JobContext, path: str, format: str) -> dict:
+    """
+    Импорт загруженного файла (см. app.services.importer)
+    """
+    ctx.progress["format"] = format
+    run_import(ctx, path, format, ctx.user_id)
+    return {
+        "imported": ctx.progress["imported"],
+        "skipped": ctx.progress["skipped"],
+    }
+
+
+@job_runner.register("export", concurrency=2)
+def export_job(ctx: JobContext, format: str, gzip: bool = False) -> dict:
+    """
+    Выгрузка в файл, который потом скачивается через GET /jobs/{id}/result
+    """
+    os.makedirs(settings.JOB_RESULT_DIR, exist_ok=True)
+    filename = export_filename(ctx.user_id, format, gzip)
+    path = result_path(ctx.job_id, filename)
+
+    ctx.progress["bytes"] = 0
+    try:
+        with open(path, "wb") as fh:
+            for chunk in stream_export(ctx.user_id, format, gzip=gzip):
+                fh.write(chunk)
+                ctx.progress["bytes"] += len(chunk)
+                ctx.save()
+    except BaseException:
+        if os.path.exists(path):
+            os.unlink(path)
+        raise
+
+    return {
+        "filename": filename,
+        "size": ctx.progress["bytes"],
+        "media_type": export_media_type(format, gzip),
+    }
+
+
+@job_runner.register("rebuild_indexes", concurrency=2, unique=True)
+def rebuild_indexes_job(ctx: JobContext) -> dict:
+    """
+    Перестроить индексы пользователя в памяти (подсказки, нечёткий поиск,
+    похожие заметки, дубликаты), чтобы первый запрос не ждал построения
+    """
+    with SessionLocal(user_id=ctx.user_id) as db:
+        for name, registry in USER_INDEXES:
+            started = time.perf_counter()
+            registry.invalidate(ctx.user_id)
+            registry.get(db, ctx.user_id)
+            ctx.progress[name] = round((time.perf_counter() - started) * 1000, 1)
+            ctx.save()
+    return {"rebuilt_ms": dict(ctx.progress)}
+
+
+@job_runner.register("note_signatures", unique=True)
+def note_signatures_job(ctx: JobContext, all_users: bool = False) -> dict:
+    """
+    Досчитать MinHash сигнатуры заметок, у которых их ещё нет
+    Сигнатуры считаются в пуле процессов (если он включён)
+    """
+    ctx.progress["computed"] = 0
+    for shard in shard_map.names if all_users else [None]:
+        _compute_signatures(ctx, shard, all_users)
+
+    if all_users:
+        minhash.lsh_indexes.clear()
+    else:
+        minhash.lsh_indexes.invalidate(ctx.user_id)
+    return {"computed": ctx.progress["computed"]}
+
+
+def _compute_signatures(ctx: JobContext, shard: Optional[str], all_users: bool) -> None:
+    """
+    Досчёт сигнатур на одном шарде (shard=None - шард пользователя задачи)
+    """
+    with SessionLocal(shard=shard, user_id=ctx.user_id) as db:
+        last_id = 0
+        while True:
+            query = db.query(Note.id, Note.user_id, Note.title, Note.content).outerjoin(
+                NoteSignature, NoteSignature.note_id == Note.id
+            ).filter(
+                NoteSignature.note_id.is_(None),
+                Note.id > last_id
+            )
+            if not all_users:
+                query = query.filter(Note.user_id == ctx.user_id)
+            rows = query.order_by(Note.id.asc()).limit(SIGNATURE_CHUNK_SIZE).all()
+            if not rows:
+                break
+
+            signatures = ctx.run_cpu(
+                minhash.signatures_for,
+                [f"{title} {content}" for _, _, title, content in rows]
+            )
+            db.execute(insert(NoteSignature), [
+                {"note_id": note_id, "user_id": user_id, "signature": signature}
+                for (note_id, user_id, _, _), signature in zip(rows, signatures)
+            ])
+            db.commit()
+
+            last_id = rows[-1][0]
+            ctx.progress["computed"] += len(rows)
+            ctx.save()
+
+
+@job_runner.register("purge_user", unique=True)
+def purge_user_job(ctx: JobContext) -> dict:
+    """
+    Удаление аккаунта, помеченного DELETE /users/{id}: записи пачками,
+    файлы результатов и задачи пользователя, затем сам аккаунт
+    Строка этой задачи остаётся, но без user_id (см. crud.user.purge_user)
+    """
+    def on_batch(kind: str, total: int) -> None:
+        ctx.progress[kind] = total
+        ctx.save()
+
+    with SessionLocal(user_id=ctx.user_id) as db:
+        jobs = db.query(Job.id, Job.result).filter(Job.user_id == ctx.user_id, Job.id != ctx.job_id).all()
+        for job_id, result in jobs:
+            path = job_result_file(job_id, result)
+            if path is not None:
+                os.unlink(path)
+        other_jobs = select(Job.id).where(Job.user_id == ctx.user_id, Job.id != ctx.job_id)
+        # Внешние ключи SQLite не каскадирует: аренды и слоты удаляются явно
+        db.query(JobLease).filter(JobLease.job_id.in_(other_jobs)).delete(synchronize_session=False)
+        db.query(JobSlot).filter(JobSlot.job_id.in_(other_jobs)).delete(synchronize_session=False)
+        db.query(Job).filter(Job.user_id == ctx.user_id, Job.id != ctx.job_id).delete(synchronize_session=False)
+        db.commit()
+
+        deleted = crud_user.purge_user(db, ctx.user_id, settings.PURGE_BATCH_SIZE, on_batch)
+
+    invalidate_user(ctx.user_id)
+    return {"deleted": deleted}
+
+
+@job_runner.register("archive_completions", unique=True)
+def archive_completions_job(ctx: JobContext) -> dict:
+    """
+    Перенести старые выполнения привычек в архив (запускается по расписанию)
+    Шарды обрабатываются параллельно
+    """
+    cutoff = archive.hot_boundary()
+    moved_by_shard = {}
+
+    def archive_shard(db) -> tuple:
+        shard = db.shard
+
+        def on_batch(moved: int) -> None:
+            moved_by_shard[shard] = moved
+            ctx.progress["moved"] = sum(moved_by_shard.values())
+            ctx.save()
+
+        return archive.archive_completions(db, settings.ARCHIVE_BATCH_SIZE, cutoff, on_batch)
+
+    results = fan_out(archive_shard).values()
+    return {
+        "cutoff": cutoff.isoformat(),
+        "moved": sum(moved for moved, _ in results),
+        "rollups_updated": sum(months for _, months in results)
+    }
+
+
+job_runner.schedule("archive_completions", settings.ARCHIVE_INTERVAL_HOURS * 3600)
+
+
+def resume_purges() -> None:
+    """
+    Поставить в очередь удаление аккаунтов, чья задача не завершилась
+    (например, была прервана остановкой приложения)
+    """
+    with SessionLocal() as db:
+        for user_id in crud_user.get_pending_deletions(db):
+            job_runner.submit(db, "purge_user", user_id)
+
+
+def job_result_file(job_id: str, result: Optional[dict]) -> Optional[str]:
+    """
+    Файл результата задачи, если он есть и ещё не удалён
+    """
+    if not result or "filename" not in result:
+        return None
+    path = result_path(job_id, result["filename"])
+    return path if os.path.exists(path) else None
@@ -0,0 +1,370 @@
+"""
+Фоновые задачи: очередь asyncio в процессе приложения
+
+Задача сохраняется в таблицу jobs и ставится в очередь. Диспетчер запускает
+обработчик в пуле потоков, соблюдая лимит одновременных задач для каждого
+типа. Тяжёлые вычисления обработчик может отдать в пул процессов
+(JobContext.run_cpu). При остановке приложения очередь дорабатывается
+с таймаутом; не начатые задачи остаются pending и запускаются при
+следующем старте, прерванные отмечаются failed.
+Состояние очереди читается только с основной БД, не с реплик.
+Задачи пользователя, которого переносят на другой шард, не запускаются:
+они остаются pending и повторяются через MOVING_RETRY_SECONDS.
+
+Воркеров приложения может быть несколько, у всех общая таблица jobs:
+- задачу запускает тот, чей UPDATE ... WHERE status='pending' изменил
+  строку, остальные её пропускают;
+- владелец продлевает аренду (job_leases) каждые JOB_LEASE_SECONDS / 3,
+  задача с истёкшей арендой (воркер упал) отмечается failed любым воркером;
+- единственность unique-задачи держит первичный ключ job_slots.
+"""
+import asyncio
+import os
+import socket
+import time
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Set
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal, shard_map
+from app.models.job import Job, JobLease, JobSlot
+
+# Прогресс пишется в БД не чаще, чем раз в столько секунд
+PROGRESS_SAVE_INTERVAL = 1.0
+
+# Через сколько секунд повторить задачу пользователя, которого переносят на другой шард
+MOVING_RETRY_SECONDS = 30.0
+
+
+@dataclass
+class JobHandler:
+    func: Callable[..., Optional[dict]]
+    concurrency: int
+    unique: bool = False
+
+
+class JobContext:
+    """
+    Передаётся обработчику: прогресс задачи и доступ к пулу процессов
+    """
+
+    def __init__(self, runner: "JobRunner", job_id: str, user_id: Optional[int]):
+        self.runner = runner
+        self.job_id = job_id
+        self.user_id = user_id
+        self.progress: Dict[str, Any] = {}
+        self._saved_at = 0.0
+
+    def save(self, force: bool = False) -> None:
+        """
+        Сохранить прогресс (не чаще PROGRESS_SAVE_INTERVAL, если не force)
+        """
+        now = time.monotonic()
+        if not force and now - self._saved_at < PROGRESS_SAVE_INTERVAL:
+            return
+        self._saved_at = now
+        self.runner.update_job(self.job_id, progress=dict(self.progress))
+
+    def run_cpu(self, func: Callable, *args) -> Any:
+        """
+        Выполнить функцию в пуле процессов (или здесь же, если пул выключен)
+        func и аргументы должны сериализоваться pickle
+        """
+        return self.runner.run_cpu(func, *args)
+
+
+class JobRunner:
+    def __init__(self):
+        self._handlers: Dict[str, JobHandler] = {}
+        self._schedules: Dict[str, float] = {}
+        self._timers: List[asyncio.Task] = []
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._threads: Optional[ThreadPoolExecutor] = None
+        self._processes: Optional[ProcessPoolExecutor] = None
+        self._accepting = False
+        # Имя этого процесса в job_leases
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._running: Set[str] = set()
+
+    def register(self, job_type: str, concurrency: int = 1, unique: bool = False) -> Callable:
+        """
+        Декоратор обработчика: func(ctx, **params) -> результат (dict) или None
+        Лимит из settings.JOB_CONCURRENCY имеет приоритет над concurrency
+        unique - у пользователя не больше одной незавершённой задачи этого типа
+        """
+
+        def decorator(func: Callable) -> Callable:
+            limit = settings.JOB_CONCURRENCY.get(job_type, concurrency)
+            self._handlers[job_type] = JobHandler(func, limit, unique)
+            return func
+
+        return decorator
+
+    def schedule(self, job_type: str, interval_seconds: float) -> None:
+        """
+        Запускать задачу (без пользователя) при старте и затем каждые interval_seconds
+        """
+        self._schedules[job_type] = interval_seconds
+
+    # ===== Жизненный цикл =====
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._semaphores = {
+            job_type: asyncio.Semaphore(handler.concurrency)
+            for job_type, handler in self._handlers.items()
+        }
+        self._threads = ThreadPoolExecutor(settings.JOB_THREAD_WORKERS, thread_name_prefix="job")
+        if settings.JOB_PROCESS_WORKERS > 0:
+            self._processes = ProcessPoolExecutor(settings.JOB_PROCESS_WORKERS)
+        self._accepting = True
+        self._dispatcher = asyncio.create_task(self._dispatch())
+
+        for job_id in await self._loop.run_in_executor(self._threads, self._recover):
+            self._queue.put_nowait(job_id)
+        self._timers = [
+            asyncio.create_task(self._every(job_type, interval))
+            for job_type, interval in self._schedules.items()
+        ]
+        self._timers.append(asyncio.create_task(self._heartbeat()))
+
+    async def stop(self, timeout: float) -> None:
+        """
+        Перестать принимать задачи и дождаться выполняющихся (не дольше timeout)
+        """
+        self._accepting = False
+        for timer in self._timers:
+            timer.cancel()
+        self._timers = []
+        if self._dispatcher is not None:
+            # Всё, что уже в очереди, должно получить свою корутину
+            while self._queue is not None and not self._queue.empty():
+                await asyncio.sleep(0)
+            self._dispatcher.cancel()
+
+        if self._tasks:
+            done, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+            if pending:
+                print(f"⚠️ Фоновые задачи не завершились за {timeout} с: {len(pending)}")
+                for task in pending:
+                    task.cancel()
+        for job_id in list(self._running):
+            self._finish(job_id, status="failed", error="Interrupted by application shutdown")
+
+        if self._threads is not None:
+            self._threads.shutdown(wait=False, cancel_futures=True)
+        if self._processes is not None:
+            self._processes.shutdown(wait=False, cancel_futures=True)
+        self._threads = self._processes = None
+
+    def _reap(self) -> int:
+        """
+        Отметить failed задачи, чей владелец не продлевал аренду дольше
+        JOB_LEASE_SECONDS (или аренды нет вовсе - задача осталась от версии
+        без job_leases). Задачи живых воркеров не трогаются
+        """
+        expired = datetime.utcnow() - timedelta(seconds=settings.JOB_LEASE_SECONDS)
+        with SessionLocal(primary_only=True) as db:
+            alive = db.query(JobLease.job_id).filter(JobLease.heartbeat_at >= expired)
+            job_ids = [
+                job_id for (job_id,) in db.query(Job.id).filter(
+                    Job.status == "running",
+                    Job.id.notin_(alive.scalar_subquery())
+                )
+            ]
+        for job_id in job_ids:
+            self._finish(job_id, status="failed", error="Interrupted: worker stopped responding", expect="running")
+        return len(job_ids)
+
+    def _recover(self) -> list:
+        """
+        После перезапуска: брошенные задачи - failed, ожидающие - снова в очередь
+        Ожидающую задачу могут поставить в очередь несколько воркеров,
+        запустит её только один (см. _claim)
+        """
+        self._reap()
+        with SessionLocal(primary_only=True) as db:
+            return [
+                job_id for (job_id,) in db.query(Job.id).filter(
+                    Job.status == "pending",
+                    Job.type.in_(list(self._handlers))
+                ).order_by(Job.created_at.asc())
+            ]
+
+    # ===== Постановка задач =====
+
+    def submit(self, db: Session, job_type: str, user_id: Optional[int] = None, **params) -> Job:
+        """
+        Сохранить задачу и поставить её в очередь
+        Вызывается из обычных (синхронных) endpoints
+        Для unique типов возвращается уже ожидающая или выполняющаяся задача
+        """
+        handler = self._handlers.get(job_type)
+        if handler is None:
+            raise ValueError(f"Unknown job type: {job_type}")
+        job = Job(
+            id=uuid.uuid4().hex,
+            type=job_type,
+            user_id=user_id,
+            status="pending",
+            params=params,
+            progress={}
+        )
+        db.add(job)
+        if handler.unique:
+            db.flush()
+            db.add(JobSlot(type=job_type, user_key=user_id or 0, job_id=job.id))
+        try:
+            db.commit()
+        except IntegrityError:
+            # Слот занят: незавершённая задача этого типа уже есть
+            # (если она успела завершиться и освободить слот - пробуем снова)
+            db.rollback()
+            slot = db.get(JobSlot, (job_type, user_id or 0))
+            if slot is None:
+                return self.submit(db, job_type, user_id, **params)
+            return self.get(db, slot.job_id)
+        db.refresh(job)
+
+        if self._accepting and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, job.id)
+        return job
+
+    def get(self, db: Session, job_id: str) -> Optional[Job]:
+        return db.query(Job).filter(Job.id == job_id).first()
+
+    def update_job(self, job_id: str, **values) -> None:
+        with SessionLocal(primary_only=True) as db:
+            db.query(Job).filter(Job.id == job_id).update(values, synchronize_session=False)
+            db.commit()
+
+    def _claim(self, job_id: str) -> bool:
+        """
+        Атомарно перевести задачу pending -> running и взять аренду
+        False - задачу уже запустил другой воркер (или она не pending)
+        """
+        now = datetime.utcnow()
+        with SessionLocal(primary_only=True) as db:
+            claimed = db.query(Job).filter(Job.id == job_id, Job.status == "pending").update(
+                {"status": "running", "started_at": now}, synchronize_session=False
+            )
+            if claimed != 1:
+                db.rollback()
+                return False
+            db.query(JobLease).filter(JobLease.job_id == job_id).delete(synchronize_session=False)
+            db.add(JobLease(job_id=job_id, owner=self.owner, heartbeat_at=now))
+            db.commit()
+        self._running.add(job_id)
+        return True
+
+    def _finish(self, job_id: str, expect: Optional[str] = None, **values) -> None:
+        """
+        Записать итог задачи, снять аренду и освободить слот unique-типа
+        expect - обновить, только если статус задачи всё ещё такой
+        """
+        self._running.discard(job_id)
+        with SessionLocal(primary_only=True) as db:
+            query = db.query(Job).filter(Job.id == job_id)
+            if expect is not None:
+                query = query.filter(Job.status == expect)
+            if query.update({**values, "finished_at": datetime.utcnow()}, synchronize_session=False) != 1:
+                db.rollback()
+                return
+            db.query(JobLease).filter(JobLease.job_id == job_id).delete(synchronize_session=False)
+            db.query(JobSlot).filter(JobSlot.job_id == job_id).delete(synchronize_session=False)
+            db.commit()
+
+    def _renew_leases(self) -> None:
+        with SessionLocal(primary_only=True) as db:
+            db.query(JobLease).filter(JobLease.owner == self.owner).update(
+                {"heartbeat_at": datetime.utcnow()}, synchronize_session=False
+            )
+            db.commit()
+
+    # ===== Выполнение =====
+
+    def _submit_scheduled(self, job_type: str) -> None:
+        with SessionLocal(primary_only=True) as db:
+            self.submit(db, job_type)
+
+    async def _every(self, job_type: str, interval: float) -> None:
+        while True:
+            try:
+                await self._loop.run_in_executor(self._threads, self._submit_scheduled, job_type)
+            except Exception as e:
+                print(f"⚠️ Не удалось поставить задачу {job_type} по расписанию: {e}")
+            await asyncio.sleep(interval)
+
+    async def _heartbeat(self) -> None:
+        while True:
+            await asyncio.sleep(settings.JOB_LEASE_SECONDS / 3)
+            try:
+                await self._loop.run_in_executor(self._threads, self._renew_leases)
+                await self._loop.run_in_executor(self._threads, self._reap)
+            except Exception as e:
+                print(f"⚠️ Не удалось продлить аренду фоновых задач: {e}")
+
+    async def _dispatch(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            task = asyncio.create_task(self._run(job_id))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, job_id: str) -> None:
+        with SessionLocal(primary_only=True) as db:
+            job = self.get(db, job_id)
+            if job is None or job.status != "pending":
+                return
+            job_type, user_id, params = job.type, job.user_id, job.params or {}
+
+        async with self._semaphores[job_type]:
+            await self._loop.run_in_executor(
+                self._threads, self._execute, job_id, job_type, user_id, params
+            )
+
+    def _defer(self, job_id: str) -> None:
+        self._loop.call_soon_threadsafe(
+            self._loop.call_later, MOVING_RETRY_SECONDS, self._queue.put_nowait, job_id
+        )
+
+    def _execute(self, job_id: str, job_type: str, user_id: Optional[int], params: dict) -> None:
+        if user_id is not None and shard_map.is_moving(user_id):
+            # Данные пользователя копируются и затем удаляются со старого шарда:
+            # записанное туда сейчас было бы потеряно (см. app.services.sharding)
+            self._defer(job_id)
+            return
+        if not self._claim(job_id):
+            return
+        ctx = JobContext(self, job_id, user_id)
+        try:
+            result = self._handlers[job_type].func(ctx, **params)
+            self._finish(job_id, status="completed", progress=dict(ctx.progress), result=result)
+        except Exception as error:
+            traceback.print_exc()
+            self._finish(job_id, status="failed", progress=dict(ctx.progress), error=str(error))
+
+    def run_cpu(self, func: Callable, *args) -> Any:
+        if self._processes is None:
+            return func(*args)
+        return self._processes.submit(func, *args).result()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "accepting": self._accepting,
+            "running_or_waiting": len(self._tasks),
+            "limits": {job_type: handler.concurrency for job_type, handler in self._handlers.items()},
+        }
+
+
+job_runner = JobRunner()
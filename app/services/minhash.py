@@ -0,0 +1,227 @@
+import threading
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Set, Tuple
+import numpy as np
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models.note_signature import NoteSignature
+from app.services.fuzzy import tokenize
+from app.services.user_index import UserIndexRegistry
+
+# 128 хеш-функций = 16 полос по 8 строк: пары со сходством выше ~0.7
+# почти наверняка попадают в общую корзину
+NUM_PERM = 128
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+
+_MASK32 = np.uint64(0xFFFFFFFF)
+# Сигнатура текста без слов: такие заметки не индексируются, иначе все
+# пустые заметки попали бы в одни корзины как дубликаты со сходством 1.0
+_EMPTY = 0xFFFFFFFF
+_rng = np.random.RandomState(20260101)
+_A = _rng.randint(1, 2 ** 32, size=NUM_PERM, dtype=np.uint64) | np.uint64(1)
+_B = _rng.randint(0, 2 ** 32, size=NUM_PERM, dtype=np.uint64)
+
+
+def shingles(text: str) -> Set[int]:
+    """
+    Хеши шинглов по три слова (для коротких текстов - отдельные слова)
+    """
+    words = tokenize(text)
+    if len(words) < 3:
+        grams = words
+    else:
+        grams = [" ".join(words[i:i + 3]) for i in range(len(words) - 2)]
+    return {zlib.crc32(gram.encode("utf-8")) for gram in grams}
+
+
+def compute_signature(text: str) -> np.ndarray:
+    """
+    MinHash сигнатура текста: минимум каждой из NUM_PERM хеш-функций по шинглам
+    """
+    values = np.fromiter(shingles(text), dtype=np.uint64)
+    if values.size == 0:
+        return np.full(NUM_PERM, _EMPTY, dtype=np.uint32)
+    # Хеширование multiply-shift: старшие 32 бита (a * x + b) по модулю 2^64
+    hashed = (np.outer(_A, values) + _B[:, None]) >> np.uint64(32)
+    return (hashed & _MASK32).min(axis=1).astype(np.uint32)
+
+
+def is_empty(signature: np.ndarray) -> bool:
+    """
+    Сигнатура текста без шинглов (пустого или без слов)
+    """
+    return bool((signature == _EMPTY).all())
+
+
+def signature_bytes(text: str) -> bytes:
+    return compute_signature(text).tobytes()
+
+
+def signatures_for(texts: List[str]) -> List[bytes]:
+    """
+    Сигнатуры для пачки текстов (выполняется в пуле процессов фоновых задач)
+    """
+    return [signature_bytes(text) for text in texts]
+
+
+def from_bytes(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype=np.uint32)
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """
+    Оценка коэффициента Жаккара по доле совпавших компонент сигнатур
+    """
+    return float(np.count_nonzero(a == b)) / NUM_PERM
+
+
+class LSHIndex:
+    """
+    LSH индекс сигнатур заметок одного пользователя
+
+    Сигнатура режется на BANDS полос, каждая полоса - ключ корзины.
+    Кандидаты в дубликаты - только заметки с общей корзиной, поэтому
+    поиск не требует попарного сравнения всех заметок.
+    """
+
+    def __init__(self):
+        self._signatures: Dict[int, np.ndarray] = {}
+        self._buckets: List[Dict[bytes, Set[int]]] = [defaultdict(set) for _ in range(BANDS)]
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _band_keys(signature: np.ndarray) -> List[bytes]:
+        return [signature[i * ROWS:(i + 1) * ROWS].tobytes() for i in range(BANDS)]
+
+    def _remove(self, note_id: int) -> None:
+        signature = self._signatures.pop(note_id, None)
+        if signature is None:
+            return
+        for band, key in enumerate(self._band_keys(signature)):
+            bucket = self._buckets[band].get(key)
+            if bucket is not None:
+                bucket.discard(note_id)
+                if not bucket:
+                    del self._buckets[band][key]
+
+    def add(self, note_id: int, signature: np.ndarray) -> None:
+        with self._lock:
+            self._remove(note_id)
+            if is_empty(signature):
+                return
+            self._signatures[note_id] = signature
+            for band, key in enumerate(self._band_keys(signature)):
+                self._buckets[band][key].add(note_id)
+
+    def remove(self, note_id: int) -> None:
+        with self._lock:
+            self._remove(note_id)
+
+    def query(self, signature: np.ndarray, threshold: float, exclude: int = None) -> List[Tuple[int, float]]:
+        """
+        Заметки, похожие на сигнатуру не меньше threshold
+        """
+        if is_empty(signature):
+            return []
+        with self._lock:
+            candidates: Set[int] = set()
+            for band, key in enumerate(self._band_keys(signature)):
+                candidates |= self._buckets[band].get(key, set())
+            candidates.discard(exclude)
+            scored = [
+                (note_id, similarity(signature, self._signatures[note_id]))
+                for note_id in candidates
+            ]
+        return sorted(
+            [item for item in scored if item[1] >= threshold],
+            key=lambda item: item[1],
+            reverse=True
+        )
+
+    def duplicate_groups(self, threshold: float) -> List[Tuple[List[int], float]]:
+        """
+        Группы почти-дубликатов: [(id заметок, наибольшее сходство в группе)]
+        """
+        parent: Dict[int, int] = {}
+
+        def find(x: int) -> int:
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        # Кандидаты - только пары из общих корзин
+        scores: Dict[Tuple[int, int], float] = {}
+        with self._lock:
+            for buckets in self._buckets:
+                for members in buckets.values():
+                    if len(members) < 2:
+                        continue
+                    ordered = sorted(members)
+                    for i, a in enumerate(ordered):
+                        for b in ordered[i + 1:]:
+                            if (a, b) not in scores:
+                                scores[(a, b)] = similarity(self._signatures[a], self._signatures[b])
+
+        pairs = [(a, b, score) for (a, b), score in scores.items() if score >= threshold]
+        for a, b, _ in pairs:
+            parent.setdefault(a, a)
+            parent.setdefault(b, b)
+            parent[find(b)] = find(a)
+
+        groups: Dict[int, List[int]] = defaultdict(list)
+        for node in parent:
+            groups[find(node)].append(node)
+        group_score: Dict[int, float] = defaultdict(float)
+        for a, _, score in pairs:
+            root = find(a)
+            group_score[root] = max(group_score[root], score)
+
+        return sorted(
+            [(sorted(members), group_score[root]) for root, members in groups.items()],
+            key=lambda item: item[1],
+            reverse=True
+        )
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+
+def load_lsh_index(db: Session, user_id: int) -> LSHIndex:
+    """
+    Построить LSH индекс по сохранённым сигнатурам
+    Заметки без сигнатуры (созданные до появления функции) в индекс не
+    попадают, пока их не досчитает задача note_signatures
+    """
+    index = LSHIndex()
+    rows = db.query(NoteSignature.note_id, NoteSignature.signature).filter(
+        NoteSignature.user_id == user_id
+    ).yield_per(1000)
+    for note_id, data in rows:
+        index.add(note_id, from_bytes(data))
+    return index
+
+
+lsh_indexes: UserIndexRegistry[LSHIndex] = UserIndexRegistry(
+    load_lsh_index,
+    max_users=settings.DUPLICATES_MAX_USERS,
+    ttl_seconds=settings.DUPLICATES_TTL_SECONDS,
+)
+
+
+def find_duplicate_groups(db: Session, user_id: int) -> List[Tuple[List[int], float]]:
+    """
+    Все группы почти-дубликатов среди заметок пользователя
+    """
+    return lsh_indexes.get(db, user_id).duplicate_groups(settings.DUPLICATE_SIMILARITY_THRESHOLD)
+
+
+def find_near_duplicates(db: Session, user_id: int, note_id: int, signature: bytes) -> List[Tuple[int, float]]:
+    """
+    Почти-дубликаты конкретной заметки
+    """
+    return lsh_indexes.get(db, user_id).query(
+        from_bytes(signature), settings.DUPLICATE_SIMILARITY_THRESHOLD, exclude=note_id
+    )
@@ -0,0 +1,142 @@
+import threading
+import zlib
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from scipy import sparse
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models.note import Note
+from app.services.fuzzy import tokenize
+from app.services.user_index import UserIndexRegistry
+
+# Размерность хешированного пространства термов
+HASH_DIM = 2 ** 18
+
+
+def term_vector(text: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Хешированный вектор частот термов: (индексы, 1 + log(tf))
+    """
+    counts = Counter(zlib.crc32(word.encode("utf-8")) % HASH_DIM for word in tokenize(text))
+    if not counts:
+        return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+    indices = np.fromiter(counts.keys(), dtype=np.int32, count=len(counts))
+    values = 1.0 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+    return indices, values.astype(np.float32)
+
+
+class RelatedIndex:
+    """
+    TF-IDF векторы заметок одного пользователя
+
+    Векторы частот хранятся построчно и обновляются при записи,
+    документная частота термов ведётся инкрементально. Нормированная
+    матрица TF-IDF (scipy CSR) собирается заново только после изменений,
+    поиск похожих - одно разреженное умножение матрицы на вектор.
+    """
+
+    def __init__(self):
+        self._rows: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+        self._df: Counter = Counter()
+        self._matrix: Optional[sparse.csr_matrix] = None
+        self._ids: List[int] = []
+        self._positions: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def _remove(self, note_id: int) -> None:
+        row = self._rows.pop(note_id, None)
+        if row is None:
+            return
+        for term in row[0].tolist():
+            self._df[term] -= 1
+            if self._df[term] <= 0:
+                del self._df[term]
+        self._matrix = None
+
+    def add(self, note_id: int, text: str) -> None:
+        indices, values = term_vector(text)
+        with self._lock:
+            self._remove(note_id)
+            self._rows[note_id] = (indices, values)
+            self._df.update(indices.tolist())
+            self._matrix = None
+
+    def remove(self, note_id: int) -> None:
+        with self._lock:
+            self._remove(note_id)
+
+    def _build(self) -> sparse.csr_matrix:
+        self._ids = list(self._rows)
+        self._positions = {note_id: pos for pos, note_id in enumerate(self._ids)}
+
+        n_docs = len(self._ids)
+        df = np.zeros(HASH_DIM, dtype=np.float32)
+        df[list(self._df.keys())] = list(self._df.values())
+        idf = np.log((1.0 + n_docs) / (1.0 + df)) + 1.0
+
+        indptr = np.zeros(n_docs + 1, dtype=np.int64)
+        for pos, note_id in enumerate(self._ids):
+            indptr[pos + 1] = indptr[pos] + len(self._rows[note_id][0])
+        indices = np.concatenate([self._rows[i][0] for i in self._ids]) if n_docs else np.empty(0, dtype=np.int32)
+        values = np.concatenate([self._rows[i][1] for i in self._ids]) if n_docs else np.empty(0, dtype=np.float32)
+
+        values = values * idf[indices]
+        matrix = sparse.csr_matrix((values, indices, indptr), shape=(n_docs, HASH_DIM))
+
+        # L2-нормировка строк: скалярное произведение = косинусное сходство
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        return sparse.diags(1.0 / norms).dot(matrix).tocsr()
+
+    def related(self, note_id: int, limit: int) -> List[Tuple[int, float]]:
+        """
+        Наиболее похожие заметки: [(id, косинусное сходство)]
+        """
+        with self._lock:
+            if note_id not in self._rows:
+                return []
+            if self._matrix is None:
+                self._matrix = self._build()
+            matrix, ids = self._matrix, self._ids
+            position = self._positions[note_id]
+
+        scores = matrix.dot(matrix[position].T).toarray().ravel()
+        scores[position] = 0.0
+
+        count = min(limit, len(scores) - 1)
+        if count <= 0:
+            return []
+        top = np.argpartition(-scores, count - 1)[:count]
+        top = top[np.argsort(-scores[top])]
+        return [(ids[i], float(scores[i])) for i in top if scores[i] > 0]
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+
+def load_related_index(db: Session, user_id: int) -> RelatedIndex:
+    """
+    Построить векторы по всем заметкам пользователя
+    """
+    index = RelatedIndex()
+    notes = db.query(Note.id, Note.title, Note.content).filter(
+        Note.user_id == user_id
+    ).yield_per(500)
+    for note_id, title, content in notes:
+        index.add(note_id, f"{title} {content}")
+    return index
+
+
+related_indexes: UserIndexRegistry[RelatedIndex] = UserIndexRegistry(
+    load_related_index,
+    max_users=settings.RELATED_MAX_USERS,
+    ttl_seconds=settings.RELATED_TTL_SECONDS,
+)
+
+
+def related_notes(db: Session, user_id: int, note_id: int, limit: int) -> List[Tuple[int, float]]:
+    """
+    Похожие заметки пользователя по косинусному сходству TF-IDF
+    """
+    return related_indexes.get(db, user_id).related(note_id, limit)
@@ -0,0 +1,249 @@
+import functools
+import hashlib
+import math
+import threading
+import time
+from calendar import timegm
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models.revoked_token import RevokedToken
+
+
+class BloomFilter:
+    """
+    Компактный фильтр Блума для проверки принадлежности ключа множеству
+    Ложноположительные ответы возможны, ложноотрицательные - нет
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        capacity = max(capacity, 1)
+        self.capacity = capacity
+        self.size = max(8, int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))))
+        self.hash_count = max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str) -> Iterable[int]:
+        # Двойное хеширование: k позиций из одного 128-битного дайджеста
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, key: str) -> None:
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+def _timestamp_ms(value: datetime) -> int:
+    return timegm(value.utctimetuple()) * 1000 + value.microsecond // 1000
+
+
+def ensure_schema(bind: Engine) -> None:
+    """
+    revoked_at с микросекундами в уже созданной таблице MySQL
+    (DATETIME без точности округляет до секунд, create_all колонку не меняет)
+    """
+    if bind.dialect.name != "mysql":
+        return
+    with bind.begin() as conn:
+        precision = conn.execute(text(
+            "SELECT DATETIME_PRECISION FROM information_schema.COLUMNS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND COLUMN_NAME = 'revoked_at'"
+        ), {"table": RevokedToken.__tablename__}).scalar()
+        if precision is not None and precision < 6:
+            conn.execute(text(f"ALTER TABLE {RevokedToken.__tablename__} MODIFY revoked_at DATETIME(6) NOT NULL"))
+
+
+class TokenRevocationList:
+    """
+    Список отозванных токенов: таблица revoked_tokens + фильтр Блума в памяти процесса
+
+    Фильтр перестраивается при старте и пополняется при отзыве, поэтому
+    запрос к БД выполняется только при положительном ответе фильтра.
+    Отзывы, сделанные другими воркерами, подтягиваются инкрементально
+    не чаще раза в TOKEN_REVOCATION_SYNC_SECONDS.
+    """
+
+    def __init__(self, capacity: int, error_rate: float, sync_interval: int, session_factory=None):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_interval = sync_interval
+        self.session_factory = session_factory
+        self._filter = BloomFilter(capacity, error_rate)
+        self._count = 0
+        self._last_id = 0
+        self._synced_at = 0.0
+        self._lock = threading.Lock()
+        self._rebuild_thread: Optional[threading.Thread] = None
+
+    def _add_rows(self, rows) -> None:
+        for row_id, key in rows:
+            self._filter.add(key)
+            self._count += 1
+            self._last_id = max(self._last_id, row_id)
+
+    def _new_rows(self, db: Session, last_id: int) -> list:
+        return db.query(RevokedToken.id, RevokedToken.key).filter(
+            RevokedToken.id > last_id
+        ).order_by(RevokedToken.id.asc()).all()
+
+    def rebuild(self, db: Session) -> None:
+        """
+        Перестроить фильтр по таблице (удаляя записи, которые уже не нужны)
+        Размер нового фильтра - с запасом вдвое от числа живых записей
+        """
+        now = datetime.utcnow()
+        db.query(RevokedToken).filter(RevokedToken.expires_at < now).delete(synchronize_session=False)
+        db.commit()
+
+        total = db.query(RevokedToken.id).count()
+        new_filter = BloomFilter(max(self.capacity, total * 2), self.error_rate)
+        count = last_id = 0
+        for row_id, key in db.query(RevokedToken.id, RevokedToken.key).yield_per(1000):
+            new_filter.add(key)
+            count += 1
+            last_id = max(last_id, row_id)
+
+        with self._lock:
+            self._filter = new_filter
+            self._count = count
+            self._last_id = last_id
+        # Отзывы, записанные во время перестройки, могли попасть только в
+        # старый фильтр - догружаем их в новый
+        rows = self._new_rows(db, last_id)
+        with self._lock:
+            self._add_rows(rows)
+            self._synced_at = time.monotonic()
+
+    def _rebuild_in_background(self) -> None:
+        """
+        Перестроить переполненный фильтр в отдельном потоке, не задерживая запрос
+        Пока идёт перестройка, работает старый фильтр (больше обращений к БД,
+        но без пропусков)
+        """
+        with self._lock:
+            if self._rebuild_thread is not None and self._rebuild_thread.is_alive():
+                return
+            self._rebuild_thread = threading.Thread(target=self._rebuild_job, name="revocation-rebuild", daemon=True)
+            self._rebuild_thread.start()
+
+    def _rebuild_job(self) -> None:
+        factory = self.session_factory
+        if factory is None:
+            from app.database import SessionLocal
+            factory = functools.partial(SessionLocal, primary_only=True)
+        try:
+            with factory() as db:
+                self.rebuild(db)
+        except Exception as e:
+            print(f"⚠️ Ошибка при перестройке фильтра отозванных токенов: {e}")
+
+    def sync(self, db: Session) -> None:
+        """
+        Догрузить в фильтр записи, добавленные после последней синхронизации
+        """
+        with self._lock:
+            last_id = self._last_id
+        rows = self._new_rows(db, last_id)
+        with self._lock:
+            self._add_rows(rows)
+            self._synced_at = time.monotonic()
+            overfull = self._count > self._filter.capacity
+        if overfull:
+            # Фильтр переполнен, доля ложных срабатываний растёт
+            self._rebuild_in_background()
+
+    def _sync_if_stale(self, db: Session) -> None:
+        if time.monotonic() - self._synced_at >= self.sync_interval:
+            self.sync(db)
+
+    def revoke(self, db: Session, key: str, user_id: int, expires_at: datetime) -> None:
+        """
+        Отозвать токен (или все токены пользователя) по ключу
+        """
+        now = datetime.utcnow()
+        try:
+            self._store(db, key, user_id, now, expires_at)
+        except IntegrityError:
+            # Ту же запись только что создал параллельный запрос
+            # (выход одновременно с нескольких устройств) - обновляем её
+            db.rollback()
+            self._store(db, key, user_id, now, expires_at)
+        with self._lock:
+            self._filter.add(key)
+
+    def _store(self, db: Session, key: str, user_id: int, now: datetime, expires_at: datetime) -> None:
+        db_token = db.query(RevokedToken).filter(RevokedToken.key == key).first()
+        if db_token:
+            db_token.revoked_at = max(db_token.revoked_at, now)
+            db_token.expires_at = max(db_token.expires_at, expires_at)
+        else:
+            db_token = RevokedToken(key=key, user_id=user_id, revoked_at=now, expires_at=expires_at)
+            db.add(db_token)
+        db.commit()
+
+    def revoke_token(self, db: Session, payload: dict) -> bool:
+        """
+        Отозвать конкретный токен по его jti
+        Токены без jti (выпущенные до появления отзыва) можно отозвать только через revoke_user
+        """
+        jti = payload.get("jti")
+        if not jti or payload.get("sub") is None:
+            return False
+        expires_at = datetime.utcfromtimestamp(payload.get("exp", time.time()))
+        self.revoke(db, f"jti:{jti}", int(payload["sub"]), expires_at)
+        return True
+
+    def revoke_user(self, db: Session, user_id: int, token_lifetime: timedelta) -> None:
+        """
+        Отозвать все токены пользователя, выпущенные до текущего момента
+        """
+        expires_at = datetime.utcnow() + token_lifetime
+        self.revoke(db, f"user:{user_id}", user_id, expires_at)
+
+    def is_revoked(self, db: Session, payload: dict) -> bool:
+        """
+        Проверить, отозван ли токен
+        БД запрашивается только если фильтр ответил "возможно"
+        """
+        self._sync_if_stale(db)
+
+        jti = payload.get("jti")
+        if jti:
+            key = f"jti:{jti}"
+            if key in self._filter and db.query(RevokedToken.id).filter(
+                RevokedToken.key == key
+            ).first() is not None:
+                return True
+
+        user_id = payload.get("sub")
+        if user_id is not None:
+            key = f"user:{user_id}"
+            if key in self._filter:
+                revoked_at: Optional[datetime] = db.query(RevokedToken.revoked_at).filter(
+                    RevokedToken.key == key
+                ).scalar()
+                # iat токенов старого формата - целые секунды: такой токен,
+                # выпущенный в секунду отзыва, считается отозванным
+                issued_ms = round(payload.get("iat", 0) * 1000)
+                if revoked_at is not None and issued_ms <= _timestamp_ms(revoked_at):
+                    return True
+
+        return False
+
+
+# Единственный экземпляр на процесс
+revocation_list = TokenRevocationList(
+    capacity=settings.TOKEN_REVOCATION_FILTER_CAPACITY,
+    error_rate=settings.TOKEN_REVOCATION_FILTER_ERROR_RATE,
+    sync_interval=settings.TOKEN_REVOCATION_SYNC_SECONDS,
+)
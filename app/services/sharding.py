@@ -0,0 +1,290 @@
+"""
+Операции над шардами: перенос пользователя и запросы ко всем шардам
+
+    python -m app.services.sharding stats
+    python -m app.services.sharding migrate USER_ID SHARD
+
+Перенос пользователя:
+0. перенос не начинается, пока у пользователя есть незавершённые фоновые
+   задачи (они пишут на шард пользователя в обход HTTP);
+1. в user_shards отмечается moving_to, затем ожидание SHARD_MAP_TTL_SECONDS,
+   чтобы все процессы увидели отметку (запросы пользователя получают 503,
+   его фоновые задачи откладываются); если за это время задача всё же
+   успела начаться, перенос отменяется;
+2. данные копируются на новый шард одной транзакцией; id записей
+   назначает новый шард, внешние ключи пересчитываются, журнал изменений
+   пишется заново с номерами больше любого курсора старого шарда;
+3. справочник переключается на новый шард, resync_below заставляет
+   клиентов синхронизации взять полный снимок (id записей изменились);
+4. данные на старом шарде удаляются пачками.
+При ошибке на шаге 2 копия откатывается, пользователь остаётся на месте.
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, TypeVar
+from sqlalchemy import func, insert, select, inspect as sa_inspect
+from sqlalchemy.orm import Session, undefer
+from app.config import settings
+from app.database import SessionLocal, shard_map
+from app.crud import user as crud_user
+from app.crud import sync as crud_sync
+from app.sharding import DEFAULT_SHARD
+from app.models.job import Job
+from app.models.user import User
+from app.models.user_shard import UserShard
+from app.models.note import Note
+from app.models.note_signature import NoteSignature
+from app.models.note_words import NoteWords
+from app.models.task import Task
+from app.models.mood import Mood
+from app.models.habit import Habit, HabitCompletion
+from app.models.habit_archive import HabitCompletionArchive, HabitCompletionRollup
+from app.services.indexing import invalidate_user
+
+T = TypeVar("T")
+
+
+def fan_out(func: Callable[[Session], T], shards: Optional[Sequence[str]] = None) -> Dict[str, T]:
+    """
+    Выполнить func(сессия шарда) на каждом шарде параллельно
+    Возвращает {имя шарда: результат}
+    """
+    names = list(shards or shard_map.names)
+
+    def run(name: str) -> T:
+        with SessionLocal(shard=name) as db:
+            return func(db)
+
+    if len(names) == 1:
+        return {names[0]: run(names[0])}
+    with ThreadPoolExecutor(max_workers=len(names)) as pool:
+        return dict(zip(names, pool.map(run, names)))
+
+
+def shard_stats() -> Dict[str, Dict[str, int]]:
+    """
+    Число пользователей и записей на каждом шарде
+    """
+    def count(db: Session) -> Dict[str, int]:
+        return {
+            model.__tablename__: db.query(func.count()).select_from(model).scalar()
+            for model in (Note, Task, Mood, Habit, HabitCompletion)
+        }
+
+    stats = fan_out(count)
+    with SessionLocal(primary_only=True) as db:
+        assigned = dict(db.query(UserShard.shard, func.count()).group_by(UserShard.shard).all())
+        total = db.query(func.count(User.id)).scalar()
+    for name, values in stats.items():
+        values["users"] = assigned.get(name, 0)
+    # Пользователи без записи в справочнике живут на основной БД
+    stats[DEFAULT_SHARD]["users"] += total - sum(assigned.values())
+    return stats
+
+
+# ===== Перенос пользователя =====
+
+def _batches(db: Session, model, criteria: list, batch_size: int) -> Iterator[list]:
+    """
+    Строки модели пачками по первичному ключу, со всеми колонками
+    """
+    key = sa_inspect(model).primary_key[0]
+    last = None
+    while True:
+        query = db.query(model).options(undefer("*")).filter(*criteria)
+        if last is not None:
+            query = query.filter(key > last)
+        rows = query.order_by(key.asc()).limit(batch_size).all()
+        if not rows:
+            return
+        yield rows
+        last = getattr(rows[-1], key.key)
+        db.expunge_all()
+
+
+def _values(row, remap: Dict[str, Dict[int, int]], skip_id: bool = True) -> dict:
+    values = {
+        attr.key: getattr(row, attr.key)
+        for attr in sa_inspect(type(row)).column_attrs
+        if not (skip_id and attr.key == "id")
+    }
+    for column, mapping in remap.items():
+        values[column] = mapping[values[column]]
+    return values
+
+
+def _copy(src: Session, dst: Session, model, criteria: list, batch_size: int,
+          remap: Optional[Dict[str, Dict[int, int]]] = None, target=None) -> Dict[int, int]:
+    """
+    Скопировать строки model в dst с новыми id (в модель target, если задана)
+    Возвращает {старый id: новый id}
+    """
+    target = target or model
+    ids: Dict[int, int] = {}
+    for rows in _batches(src, model, criteria, batch_size):
+        copies = [(row.id, target(**_values(row, remap or {}))) for row in rows]
+        dst.add_all(copy for _, copy in copies)
+        dst.flush()
+        ids.update((old_id, copy.id) for old_id, copy in copies)
+        dst.expunge_all()
+    return ids
+
+
+def _copy_user_data(src: Session, dst: Session, user_id: int, batch_size: int) -> Dict[str, List[int]]:
+    """
+    Скопировать данные пользователя; возвращает новые id по сущностям журнала
+    """
+    habits = _copy(src, dst, Habit, [Habit.user_id == user_id], batch_size)
+    notes = _copy(src, dst, Note, [Note.user_id == user_id], batch_size)
+    tasks = _copy(src, dst, Task, [Task.user_id == user_id], batch_size)
+    moods = _copy(src, dst, Mood, [Mood.user_id == user_id], batch_size)
+
+    completions: Dict[int, int] = {}
+    if habits:
+        by_habit = {"habit_id": habits}
+        owned = list(habits)
+        completions = _copy(src, dst, HabitCompletion, [HabitCompletion.habit_id.in_(owned)], batch_size, by_habit)
+
+        # id архивных строк выдаёт горячая таблица (как при обычной архивации)
+        archived = _copy(
+            src, dst, HabitCompletionArchive, [HabitCompletionArchive.habit_id.in_(owned)],
+            batch_size, by_habit, target=HabitCompletion
+        )
+        new_ids = list(archived.values())
+        for start in range(0, len(new_ids), batch_size):
+            chunk = new_ids[start:start + batch_size]
+            rows = dst.query(
+                HabitCompletion.id, HabitCompletion.habit_id, HabitCompletion.completed_at, HabitCompletion.note
+            ).filter(HabitCompletion.id.in_(chunk)).all()
+            dst.execute(insert(HabitCompletionArchive), [row._asdict() for row in rows])
+            dst.query(HabitCompletion).filter(HabitCompletion.id.in_(chunk)).delete(synchronize_session=False)
+        completions.update(archived)
+
+        rollups = src.query(HabitCompletionRollup).filter(HabitCompletionRollup.habit_id.in_(owned)).all()
+        dst.add_all(HabitCompletionRollup(**_values(row, by_habit, skip_id=False)) for row in rollups)
+
+    for rows in _batches(src, NoteSignature, [NoteSignature.user_id == user_id], batch_size):
+        dst.add_all(NoteSignature(**_values(row, {"note_id": notes}, skip_id=False)) for row in rows)
+        dst.flush()
+        dst.expunge_all()
+
+    user_notes = select(Note.id).where(Note.user_id == user_id)
+    for rows in _batches(src, NoteWords, [NoteWords.note_id.in_(user_notes)], batch_size):
+        dst.add_all(NoteWords(**_values(row, {"note_id": notes}, skip_id=False)) for row in rows)
+        dst.flush()
+        dst.expunge_all()
+
+    return {
+        "habit": list(habits.values()),
+        "note": list(notes.values()),
+        "task": list(tasks.values()),
+        "mood": list(moods.values()),
+        "habit_completion": list(completions.values()),
+    }
+
+
+def count_active_jobs(user_id: int, statuses: Sequence[str] = ("pending", "running")) -> int:
+    """
+    Число задач пользователя в статусах statuses
+    """
+    with SessionLocal(primary_only=True) as db:
+        return db.query(func.count(Job.id)).filter(Job.user_id == user_id, Job.status.in_(list(statuses))).scalar()
+
+
+def migrate_user(
+    user_id: int,
+    target: str,
+    batch_size: Optional[int] = None,
+    on_step: Optional[Callable[[str], None]] = None
+) -> Dict[str, int]:
+    """
+    Перенести данные пользователя на шард target
+    Возвращает число перенесённых записей по сущностям
+    """
+    batch_size = batch_size or settings.SHARD_MIGRATION_BATCH_SIZE
+    report = on_step or (lambda message: None)
+    if target not in shard_map.engines:
+        raise ValueError(f"Unknown shard: {target}")
+
+    shard_map.forget(user_id)
+    source = shard_map.shard_for(user_id)
+    if source == target:
+        return {}
+    if count_active_jobs(user_id):
+        raise ValueError(f"User {user_id} has unfinished jobs, retry later")
+
+    with SessionLocal(primary_only=True) as db:
+        db_user = crud_user.get_user(db, user_id)
+        if db_user is None:
+            raise ValueError(f"User not found: {user_id}")
+        entry = db.get(UserShard, user_id)
+        if entry is None:
+            entry = UserShard(user_id=user_id, shard=source)
+            db.add(entry)
+        entry.moving_to = target
+        db.commit()
+        db.refresh(db_user)
+
+    report(f"ожидание {shard_map.ttl_seconds} с, пока процессы увидят перенос")
+    time.sleep(shard_map.ttl_seconds)
+
+    try:
+        if count_active_jobs(user_id, ("running",)):
+            raise ValueError(f"User {user_id} has unfinished jobs, retry later")
+        if target != DEFAULT_SHARD:
+            crud_user.copy_user_row(db_user, target)
+        with SessionLocal(shard=source, primary_only=True) as src, SessionLocal(shard=target, primary_only=True) as dst:
+            report(f"копирование {source} -> {target}")
+            changes = _copy_user_data(src, dst, user_id, batch_size)
+            first_seq = max(crud_sync.get_last_seq(src), crud_sync.get_last_seq(dst)) + 1
+            crud_sync.record_moved(dst, user_id, changes, first_seq)
+            dst.commit()
+    except BaseException:
+        with SessionLocal(primary_only=True) as db:
+            db.query(UserShard).filter(UserShard.user_id == user_id).update(
+                {"moving_to": None}, synchronize_session=False
+            )
+            db.commit()
+        crud_user.delete_user_row_copy(user_id, target)
+        shard_map.forget(user_id)
+        raise
+
+    # Курсор - номер следующего непрочитанного изменения, поэтому курсоры
+    # старого шарда не больше first_seq
+    with SessionLocal(primary_only=True) as db:
+        db.query(UserShard).filter(UserShard.user_id == user_id).update(
+            {"shard": target, "moving_to": None, "resync_below": first_seq + 1}, synchronize_session=False
+        )
+        db.commit()
+    shard_map.forget(user_id)
+
+    report(f"удаление данных на {source}")
+    with SessionLocal(shard=source) as db:
+        crud_user.purge_user_data(db, user_id, batch_size)
+    crud_user.delete_user_row_copy(user_id, source)
+    invalidate_user(user_id)
+    return {entity: len(ids) for entity, ids in changes.items()}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Шарды данных пользователей")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("stats", help="пользователи и записи на каждом шарде")
+    migrate = commands.add_parser("migrate", help="перенести пользователя на другой шард")
+    migrate.add_argument("user_id", type=int)
+    migrate.add_argument("shard")
+    migrate.add_argument("--batch-size", type=int, default=settings.SHARD_MIGRATION_BATCH_SIZE)
+    args = parser.parse_args()
+
+    if args.command == "stats":
+        for name, values in shard_stats().items():
+            print(name, " ".join(f"{key}={value}" for key, value in values.items()))
+        return
+
+    moved = migrate_user(args.user_id, args.shard, args.batch_size, lambda message: print(message, flush=True))
+    print(f"✅ Готово: {moved or 'пользователь уже на этом шарде'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+import heapq
+import threading
+from bisect import bisect_left, insort
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models.note import Note
+from app.models.task import Task
+from app.models.habit import Habit
+from app.services.user_index import UserIndexRegistry
+
+# Сущности, заголовки которых попадают в подсказки
+SUGGEST_SOURCES = (("note", Note), ("task", Task), ("habit", Habit))
+
+
+def _word_starts(text: str) -> List[int]:
+    """
+    Позиции начала слов: подсказка находит "run" и в "Morning run"
+    """
+    return [
+        i for i, ch in enumerate(text)
+        if ch.isalnum() and (i == 0 or not text[i - 1].isalnum())
+    ]
+
+
+def _title_keys(title: str) -> List[str]:
+    normalized = title.lower()
+    return [normalized[i:] for i in _word_starts(normalized)]
+
+
+class TitleIndex:
+    """
+    Отсортированный индекс заголовков одного пользователя
+
+    Ключ - суффикс заголовка в нижнем регистре, начинающийся с границы слова.
+    Поиск по префиксу - двоичный поиск по отсортированному списку ключей,
+    затем выбор top-k по дате последнего изменения.
+    Полная загрузка - build (одна сортировка), изменения - add / remove.
+    """
+
+    def __init__(self):
+        self._keys: List[Tuple[str, str, int]] = []
+        self._entries: Dict[Tuple[str, int], Tuple[str, datetime, List[str]]] = {}
+        self._lock = threading.Lock()
+
+    def _remove(self, kind: str, item_id: int) -> None:
+        entry = self._entries.pop((kind, item_id), None)
+        if entry is None:
+            return
+        for key in entry[2]:
+            pos = bisect_left(self._keys, (key, kind, item_id))
+            if pos < len(self._keys) and self._keys[pos] == (key, kind, item_id):
+                del self._keys[pos]
+
+    @classmethod
+    def build(cls, items: Iterable[Tuple[str, int, str, Optional[datetime]]]) -> "TitleIndex":
+        """
+        Индекс из всех записей сразу: ключи добавляются в конец списка
+        и сортируются один раз, а не вставляются по одному
+        """
+        index = cls()
+        for kind, item_id, title, ts in items:
+            keys = _title_keys(title)
+            index._entries[(kind, item_id)] = (title, ts or datetime.min, keys)
+            index._keys.extend((key, kind, item_id) for key in keys)
+        index._keys.sort()
+        return index
+
+    def add(self, kind: str, item_id: int, title: str, ts: Optional[datetime]) -> None:
+        keys = _title_keys(title)
+        with self._lock:
+            self._remove(kind, item_id)
+            self._entries[(kind, item_id)] = (title, ts or datetime.min, keys)
+            for key in keys:
+                insort(self._keys, (key, kind, item_id))
+
+    def remove(self, kind: str, item_id: int) -> None:
+        with self._lock:
+            self._remove(kind, item_id)
+
+    def search(self, prefix: str, limit: int) -> List[dict]:
+        prefix = prefix.lower()
+        found = set()
+        with self._lock:
+            pos = bisect_left(self._keys, (prefix,))
+            while pos < len(self._keys) and self._keys[pos][0].startswith(prefix):
+                found.add(self._keys[pos][1:])
+                pos += 1
+            best = heapq.nlargest(limit, found, key=lambda ref: self._entries[ref][1])
+            return [
+                {"type": kind, "id": item_id, "title": self._entries[(kind, item_id)][0]}
+                for kind, item_id in best
+            ]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def load_title_index(db: Session, user_id: int) -> TitleIndex:
+    """
+    Построить индекс по заголовкам заметок, задач и привычек (без тел записей)
+    """
+    def rows():
+        for kind, model in SUGGEST_SOURCES:
+            query = db.query(
+                model.id,
+                model.title,
+                func.coalesce(model.updated_at, model.created_at)
+            ).filter(model.user_id == user_id)
+            for item_id, title, ts in query:
+                yield kind, item_id, title, ts
+
+    return TitleIndex.build(rows())
+
+
+title_indexes: UserIndexRegistry[TitleIndex] = UserIndexRegistry(
+    load_title_index,
+    max_users=settings.SUGGEST_MAX_USERS,
+    ttl_seconds=settings.SUGGEST_TTL_SECONDS,
+)
+
+
+def index_title(user_id: int, kind: str, item) -> None:
+    """
+    Обновить заголовок в индексе после создания или изменения записи
+    """
+    index = title_indexes.peek(user_id)
+    if index is not None:
+        index.add(kind, item.id, item.title, item.updated_at or item.created_at or datetime.now())
+
+
+def unindex_title(user_id: int, kind: str, item_id: int) -> None:
+    """
+    Убрать запись из индекса после удаления
+    """
+    index = title_indexes.peek(user_id)
+    if index is not None:
+        index.remove(kind, item_id)
+
+
+def suggest(db: Session, user_id: int, prefix: str, limit: int) -> List[dict]:
+    """
+    Подсказки по префиксу, самые свежие записи первыми
+    """
+    return title_indexes.get(db, user_id).search(prefix, limit)
@@ -0,0 +1,64 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Generic, Optional, TypeVar
+from sqlalchemy.orm import Session
+
+T = TypeVar("T")
+
+
+class UserIndexRegistry(Generic[T]):
+    """
+    LRU-реестр индексов в памяти процесса, по одному на пользователя
+
+    Индекс строится загрузчиком при первом обращении и живёт не дольше ttl
+    секунд (так подтягиваются изменения, сделанные другими воркерами).
+    При превышении max_users вытесняются самые давно использованные.
+    CRUD функции обновляют только уже загруженные индексы (peek),
+    холодные пользователи в памяти не поднимаются.
+    """
+
+    def __init__(self, loader: Callable[[Session, int], T], max_users: int, ttl_seconds: int):
+        self.loader = loader
+        self.max_users = max_users
+        self.ttl_seconds = ttl_seconds
+        self._items: "OrderedDict[int, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, user_id: int) -> T:
+        """
+        Получить индекс пользователя, построив его при необходимости
+        """
+        with self._lock:
+            item = self._items.get(user_id)
+            if item is not None and time.monotonic() - item[1] < self.ttl_seconds:
+                self._items.move_to_end(user_id)
+                return item[0]
+
+        index = self.loader(db, user_id)
+
+        with self._lock:
+            self._items[user_id] = (index, time.monotonic())
+            self._items.move_to_end(user_id)
+            while len(self._items) > self.max_users:
+                self._items.popitem(last=False)
+        return index
+
+    def peek(self, user_id: int) -> Optional[T]:
+        """
+        Получить индекс, только если он уже загружен
+        """
+        with self._lock:
+            item = self._items.get(user_id)
+            return item[0] if item is not None else None
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._items.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)
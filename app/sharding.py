@@ -0,0 +1,217 @@
+"""
+Шардирование данных по user_id
+
+Основная БД (шард "default") хранит аккаунты и общие таблицы (GLOBAL_TABLES),
+данные пользователей (заметки, задачи, настроение, привычки, журнал
+изменений) лежат на шарде пользователя. На шардах, кроме default, есть
+копия строки users - для внешних ключей.
+
+Шард пользователя: запись в user_shards (таблица-справочник), а для
+пользователей без записи - default. Новым пользователям шард назначается
+по кольцу консистентного хеширования и сразу записывается в справочник,
+поэтому добавление шарда не перемещает существующих пользователей.
+
+RoutingSession (app.replicas) выбирает шард для каждого запроса к БД:
+явно заданный shard / user_id сессии, иначе user_id текущего HTTP запроса
+(выставляет ShardRoutingMiddleware из параметра user_id).
+С одним шардом всё работает как раньше и справочник не читается.
+"""
+import bisect
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql import Select
+
+DEFAULT_SHARD = "default"
+
+# Таблицы основной БД: аккаунты, очередь задач, отзыв токенов, справочник шардов
+GLOBAL_TABLES = frozenset({
+    "users", "revoked_tokens", "jobs", "job_leases", "job_slots", "pending_deletions", "user_shards"
+})
+
+# user_id текущего HTTP запроса (выставляется ShardRoutingMiddleware)
+current_user_id: ContextVar[Optional[int]] = ContextVar("current_user_id", default=None)
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """
+    Кольцо консистентного хеширования: vnodes точек на шард
+    """
+
+    def __init__(self, names: List[str], vnodes: int):
+        points = sorted((_hash(f"{name}#{i}"), name) for name in names for i in range(vnodes))
+        self._keys = [point for point, _ in points]
+        self._names = [name for _, name in points]
+
+    def get(self, key: int) -> str:
+        index = bisect.bisect(self._keys, _hash(str(key))) % len(self._keys)
+        return self._names[index]
+
+
+def _tables(mapper, clause) -> List[str]:
+    if mapper is not None:
+        return [mapper.local_table.name]
+    table = getattr(clause, "table", None)
+    if table is not None:
+        return [getattr(table, "name", "")]
+    if isinstance(clause, Select):
+        return [getattr(item, "name", "") for item in clause.get_final_froms()]
+    return []
+
+
+class ShardMap:
+    """
+    Шарды и привязка к ним пользователей
+    """
+
+    def __init__(self, engines: Dict[str, Engine], vnodes: int, ttl_seconds: float, max_users: int):
+        self.engines = engines
+        self.ring = HashRing(sorted(engines), vnodes)
+        self.ttl_seconds = ttl_seconds
+        self.max_users = max_users
+        self._entries: "OrderedDict[int, Tuple[float, str, Optional[str], int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.lookups = 0
+
+    @property
+    def sharded(self) -> bool:
+        return len(self.engines) > 1
+
+    @property
+    def names(self) -> List[str]:
+        return sorted(self.engines)
+
+    def data_engines(self) -> Dict[str, Engine]:
+        """
+        Шарды, кроме основной БД
+        """
+        return {name: engine for name, engine in self.engines.items() if name != DEFAULT_SHARD}
+
+    def place(self, user_id: int) -> str:
+        """
+        Шард для нового пользователя
+        """
+        return self.ring.get(user_id) if self.sharded else DEFAULT_SHARD
+
+    # ===== Справочник с кешем =====
+
+    def _entry(self, user_id: int) -> Tuple[str, Optional[str], int]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                return entry[1:]
+
+        from app.models.user_shard import UserShard
+        table = UserShard.__table__
+        with self.engines[DEFAULT_SHARD].connect() as conn:
+            row = conn.execute(
+                select(table.c.shard, table.c.moving_to, table.c.resync_below).where(table.c.user_id == user_id)
+            ).first()
+        self.lookups += 1
+        value = (row.shard, row.moving_to, row.resync_below or 0) if row is not None else (DEFAULT_SHARD, None, 0)
+
+        with self._lock:
+            self._entries[user_id] = (now + self.ttl_seconds, *value)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+        return value
+
+    def forget(self, user_id: int) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def shard_for(self, user_id: int) -> str:
+        if not self.sharded:
+            return DEFAULT_SHARD
+        return self._entry(user_id)[0]
+
+    def is_moving(self, user_id: int) -> bool:
+        return self.sharded and self._entry(user_id)[1] is not None
+
+    def resync_below(self, user_id: int) -> int:
+        """
+        Курсоры синхронизации меньше этого номера выданы до переноса на другой шард
+        """
+        if not self.sharded:
+            return 0
+        return self._entry(user_id)[2]
+
+    # ===== Маршрутизация сессии =====
+
+    def route(self, shard: Optional[str], user_id: Optional[int], mapper, clause) -> Optional[Engine]:
+        """
+        Движок шарда для запроса сессии или None - запрос идёт в основную БД
+        """
+        if not self.sharded or any(name in GLOBAL_TABLES for name in _tables(mapper, clause)):
+            return None
+        if shard is None:
+            if user_id is None:
+                user_id = current_user_id.get()
+            if user_id is None:
+                return None
+            shard = self.shard_for(user_id)
+        if shard == DEFAULT_SHARD:
+            return None
+        return self.engines[shard]
+
+    def stats(self) -> dict:
+        return {
+            "shards": self.names,
+            "cached_users": len(self._entries),
+            "lookups": self.lookups,
+        }
+
+
+class ShardRoutingMiddleware:
+    """
+    ASGI middleware: user_id из параметров запроса определяет шард для всех
+    сессий этого запроса; пока пользователь переносится, ответ 503
+    """
+
+    def __init__(self, app, shards: ShardMap):
+        self.app = app
+        self.shards = shards
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.shards.sharded:
+            await self.app(scope, receive, send)
+            return
+
+        user_id = self._user_id(scope)
+        if user_id is not None and self.shards.is_moving(user_id):
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [(b"content-type", b"application/json"), (b"retry-after", b"30")],
+            })
+            await send({"type": "http.response.body", "body": b'{"detail":"Account is being moved, retry later"}'})
+            return
+
+        token = current_user_id.set(user_id)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_user_id.reset(token)
+
+    @staticmethod
+    def _user_id(scope) -> Optional[int]:
+        for part in scope.get("query_string", b"").decode("latin-1").split("&"):
+            key, _, value = part.partition("=")
+            if key == "user_id":
+                try:
+                    return int(value)
+                except ValueError:
+                    return None
+        return None
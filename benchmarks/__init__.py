@@ -0,0 +1,3 @@
+"""
+Бенчмарки производительности (запуск: python -m benchmarks.<имя>)
+"""
@@ -0,0 +1,138 @@
+"""
+Сколько запросов и байт читается из БД для дня и списков, когда
+тяжёлые колонки (Note.content, Task.description) загружаются отложенно
+
+    python -m benchmarks.deferred_columns
+
+"до"    - полные строки (как было до deferred: with_content / with_description)
+"после" - краткий вид (view=summary) и удаление без чтения текста
+Байты - сумма длин значений во всех строках, которые вернула БД
+"""
+import timeit
+from datetime import date, datetime, timedelta
+from typing import Callable, List, Tuple
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.database import Base
+from app.models import User, Note, Task
+from app.crud import note as crud_note
+from app.crud import task as crud_task
+
+NOTES_PER_DAY = 200
+TASKS_PER_DAY = 200
+DAY = date(2026, 1, 15)
+ROUNDS = 20
+
+
+def seed(db) -> int:
+    user = User(email="bench@example.com", username="bench", hashed_password="-")
+    db.add(user)
+    db.flush()
+    start = datetime.combine(DAY, datetime.min.time())
+    db.add_all(
+        Note(
+            user_id=user.id, title=f"Заметка {i}",
+            content="Сегодня был длинный и насыщенный день. " * 80,
+            created_at=start + timedelta(minutes=i)
+        )
+        for i in range(NOTES_PER_DAY)
+    )
+    db.add_all(
+        Task(
+            user_id=user.id, title=f"Задача {i}",
+            description="Подробное описание задачи со ссылками и шагами. " * 9,
+            created_at=start + timedelta(minutes=i)
+        )
+        for i in range(TASKS_PER_DAY)
+    )
+    db.commit()
+    return user.id
+
+
+def row_bytes(row) -> int:
+    return sum(len(value) if isinstance(value, (str, bytes)) else 8 for value in row if value is not None)
+
+
+def measure(engine, db, action: Callable[[], None]) -> Tuple[int, int, float]:
+    """
+    (запросов, байт прочитано, лучшее время в мс) для одного вызова action
+    """
+    statements: List[tuple] = []
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", on_execute)
+    try:
+        action()
+        db.expunge_all()
+    finally:
+        event.remove(engine, "before_cursor_execute", on_execute)
+
+    # Повторяем те же запросы напрямую через DBAPI, чтобы посчитать объём ответа
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        fetched = 0
+        for statement, parameters in statements:
+            cursor.execute(statement, parameters)
+            fetched += sum(row_bytes(row) for row in cursor.fetchall())
+    finally:
+        raw.close()
+
+    def timed():
+        action()
+        db.expunge_all()
+
+    best = min(timeit.repeat(timed, number=1, repeat=ROUNDS))
+    return len(statements), fetched, best * 1000
+
+
+def report(name: str, before: Tuple[int, int, float], after: Tuple[int, int, float]) -> None:
+    print(
+        f"{name:<16} до: {before[0]} запр. {before[1] / 1024:8.1f} КБ {before[2]:6.2f} мс   "
+        f"после: {after[0]} запр. {after[1] / 1024:8.1f} КБ {after[2]:6.2f} мс   "
+        f"меньше байт: x{before[1] / max(after[1], 1):.1f}"
+    )
+
+
+def main() -> None:
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    user_id = seed(db)
+    note_id = db.query(Note.id).first()[0]
+    task_id = db.query(Task.id).first()[0]
+
+    # Кеш результатов обходится: сравниваются именно запросы к БД
+    notes_by_date = crud_note.get_notes_by_date.uncached
+    tasks_by_date = crud_task.get_tasks_by_date.uncached
+    get_tasks = crud_task.get_tasks.uncached
+
+    def day(full: bool) -> Callable[[], None]:
+        def action():
+            notes_by_date(db, user_id, DAY, with_content=full)
+            tasks_by_date(db, user_id, DAY, with_description=full)
+        return action
+
+    print(f"День: {NOTES_PER_DAY} заметок и {TASKS_PER_DAY} задач, лучший из {ROUNDS} прогонов")
+    report("день", measure(engine, db, day(True)), measure(engine, db, day(False)))
+    report(
+        "список задач",
+        measure(engine, db, lambda: get_tasks(db, user_id, limit=TASKS_PER_DAY)),
+        measure(engine, db, lambda: get_tasks(db, user_id, limit=TASKS_PER_DAY, with_description=False))
+    )
+    report(
+        "удаление (поиск)",
+        measure(engine, db, lambda: (crud_note.get_note(db, note_id, user_id), crud_task.get_task(db, task_id, user_id))),
+        measure(engine, db, lambda: (
+            crud_note.get_note(db, note_id, user_id, with_content=False),
+            crud_task.get_task(db, task_id, user_id, with_description=False)
+        ))
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Стоимость проверки соединений и ожидание свободного соединения в пуле
+
+    python -m benchmarks.pool
+
+1. Выдача соединения + короткий запрос при DB_POOL_PRE_PING = always / idle / never
+   (на SQLite проверка дешёвая; на MySQL каждая проверка - лишний сетевой
+   круг, поэтому разница в запросах к БД важнее разницы во времени)
+2. Гистограмма ожидания соединения при THREADS одновременных потоках
+   для разных DB_POOL_SIZE - так выглядит нехватка пула в /metrics
+"""
+import os
+import tempfile
+import threading
+import time
+import timeit
+from sqlalchemy import create_engine, event, text
+from app.pool import InstrumentedQueuePool, instrument, pool_stats
+
+CHECKOUTS = 2000
+THREADS = 16
+QUERIES_PER_THREAD = 50
+QUERY_SECONDS = 0.002
+
+
+def make(url: str, pre_ping: str, pool_size: int, max_overflow: int = 0):
+    engine = create_engine(
+        url,
+        poolclass=InstrumentedQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=30,
+        pool_pre_ping=pre_ping == "always",
+        connect_args={"check_same_thread": False}
+    )
+    return instrument(engine, pre_ping=pre_ping, idle_seconds=30.0)
+
+
+def pre_ping_cost(url: str) -> None:
+    print(f"Выдача соединения + SELECT 1, {CHECKOUTS} раз")
+    for strategy in ("always", "idle", "never"):
+        engine = make(url, strategy, pool_size=1)
+        statements = []
+        event.listen(engine, "before_cursor_execute", lambda *args: statements.append(1))
+
+        def run():
+            for _ in range(CHECKOUTS):
+                with engine.connect() as connection:
+                    connection.execute(text("SELECT 1"))
+
+        run()
+        # pool_pre_ping выполняет проверку мимо событий движка - считаем сами
+        executed = len(statements) + (CHECKOUTS if strategy == "always" else 0)
+        best = min(timeit.repeat(run, number=1, repeat=5))
+        print(
+            f"  {strategy:<6} запросов к БД: {executed:5}   "
+            f"{best * 1_000_000 / CHECKOUTS:6.1f} мкс на выдачу   "
+            f"проверок idle: {pool_stats(engine)['pings']}"
+        )
+        engine.dispose()
+
+
+def contention(url: str) -> None:
+    print(f"\n{THREADS} потоков по {QUERIES_PER_THREAD} запросов ({QUERY_SECONDS * 1000:.0f} мс каждый)")
+    for pool_size in (2, 4, 8, 16):
+        engine = make(url, "never", pool_size=pool_size)
+
+        def worker():
+            for _ in range(QUERIES_PER_THREAD):
+                with engine.connect() as connection:
+                    connection.execute(text("SELECT 1"))
+                    time.sleep(QUERY_SECONDS)
+
+        threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        stats = pool_stats(engine)
+        histogram = " ".join(f"{label}={count}" for label, count in stats["wait_histogram"].items() if count)
+        print(
+            f"  size={pool_size:<2} {elapsed:5.2f} с   ожидание ср. {stats['wait_avg_ms']:6.2f} мс "
+            f"макс. {stats['wait_max_ms']:7.2f} мс   max_checked_out={stats['max_checked_out']}   {histogram}"
+        )
+        engine.dispose()
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        url = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        pre_ping_cost(url)
+        contention(url)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Сравнение стоимости сериализации списковых ответов на страницах по 1000 элементов
+
+    python -m benchmarks.serialization
+
+"до"    - путь FastAPI: валидация response_model, dump_python(mode="json"), json.dumps
+"после" - app.serialization: кэшированный TypeAdapter, одна валидация, dump_json
+"""
+import asyncio
+import timeit
+from datetime import date, datetime, timedelta
+from typing import List
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from app.models import Note, Task, Mood, MoodLevel, TaskStatus, TaskPriority
+from app.schemas.note import Note as NoteSchema
+from app.schemas.task import Task as TaskSchema
+from app.schemas.mood import Mood as MoodSchema
+from app.serialization import model_response
+
+PAGE_SIZE = 1000
+ROUNDS = 20
+
+
+def make_notes(n: int) -> List[Note]:
+    now = datetime(2026, 1, 1, 12, 0)
+    return [
+        Note(
+            id=i, user_id=1, title=f"Заметка {i}",
+            content="Сегодня был хороший день. " * 20,
+            created_at=now - timedelta(minutes=i), updated_at=now
+        )
+        for i in range(n)
+    ]
+
+
+def make_tasks(n: int) -> List[Task]:
+    now = datetime(2026, 1, 1, 12, 0)
+    return [
+        Task(
+            id=i, user_id=1, title=f"Задача {i}", description="Описание задачи",
+            status=TaskStatus.TODO, priority=TaskPriority.MEDIUM, is_completed=False,
+            due_date=now, created_at=now, updated_at=None
+        )
+        for i in range(n)
+    ]
+
+
+def make_moods(n: int) -> List[Mood]:
+    now = datetime(2026, 1, 1, 12, 0)
+    return [
+        Mood(
+            id=i, user_id=1, mood_level=MoodLevel.GOOD,
+            mood_date=date(2020, 1, 1) + timedelta(days=i), note="Нормально",
+            created_at=now, updated_at=None
+        )
+        for i in range(n)
+    ]
+
+
+def fastapi_path(field, items) -> bytes:
+    content = asyncio.run(serialize_response(field=field, response_content=items))
+    return JSONResponse(content).body
+
+
+def fast_path(tp, items) -> bytes:
+    return model_response(tp, items).body
+
+
+def run(name: str, schema, items) -> None:
+    tp = List[schema]
+    field = create_response_field(name=f"Response_{name}", type_=tp)
+
+    before = min(timeit.repeat(lambda: fastapi_path(field, items), number=1, repeat=ROUNDS))
+    after = min(timeit.repeat(lambda: fast_path(tp, items), number=1, repeat=ROUNDS))
+
+    per_item_before = before / len(items) * 1e6
+    per_item_after = after / len(items) * 1e6
+    print(
+        f"{name:<6} до: {per_item_before:6.2f} мкс/элемент   "
+        f"после: {per_item_after:6.2f} мкс/элемент   "
+        f"ускорение: x{before / after:.1f}"
+    )
+
+
+if __name__ == "__main__":
+    print(f"Страница: {PAGE_SIZE} элементов, лучший из {ROUNDS} прогонов")
+    run("notes", NoteSchema, make_notes(PAGE_SIZE))
+    run("tasks", TaskSchema, make_tasks(PAGE_SIZE))
+    run("moods", MoodSchema, make_moods(PAGE_SIZE))
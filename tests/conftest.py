@@ -0,0 +1,39 @@
+"""
+Общие фикстуры: SQLite в памяти вместо MySQL
+"""
+import os
+
+# До импорта app: основная БД приложения - SQLite в памяти
+os.environ.setdefault("DATABASE_PRIMARY_URL", "sqlite://")
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.database import Base
+import app.models  # noqa: F401 - регистрация таблиц в Base.metadata
+
+
+def make_sqlite_engine():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+@pytest.fixture
+def engine():
+    engine = make_sqlite_engine()
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session_factory(engine):
+    return sessionmaker(bind=engine, autoflush=False)
+
+
+@pytest.fixture
+def db(session_factory):
+    session = session_factory()
+    yield session
+    session.close()
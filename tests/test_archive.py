@@ -0,0 +1,162 @@
+import random
+from datetime import date, datetime, timedelta
+import pytest
+from sqlalchemy import func, inspect, text
+from app.models.habit import Habit, HabitCompletion
+from app.models.habit_archive import HabitCompletionArchive, HabitCompletionRollup
+from app.models.user import User
+from app.services import archive
+
+TODAY = date(2026, 10, 19)
+
+
+def brute_force(days, today):
+    current = 0
+    day = today
+    while day in days:
+        current += 1
+        day -= timedelta(days=1)
+    longest = run = 0
+    previous = None
+    for day in sorted(days):
+        run = run + 1 if previous == day - timedelta(days=1) else 1
+        longest = max(longest, run)
+        previous = day
+    return current, longest
+
+
+def split(days, today):
+    """
+    Дни до hot_boundary уходят в архив (итоги по месяцам), остальные - горячие
+    """
+    boundary = archive.hot_boundary(today)
+    hot = {day for day in days if day >= boundary}
+    cold = {day for day in days if day < boundary}
+    return hot, cold, archive.month_summaries(cold)
+
+
+def test_summarize_month_runs():
+    month = date(2026, 2, 1)
+    days = {month.replace(day=d) for d in (1, 2, 3, 10, 11, 27, 28)}
+
+    assert archive.summarize_month(month, days) == {"days": 7, "head_run": 3, "tail_run": 2, "longest_run": 3}
+
+
+def test_longest_streak_joins_months():
+    days = {date(2026, 1, 31) - timedelta(days=i) for i in range(5)} | {date(2026, 2, 1) + timedelta(days=i) for i in range(4)}
+
+    assert archive.longest_streak(archive.month_summaries(days)) == 9
+
+
+def test_current_streak_continues_into_archive():
+    days = {TODAY - timedelta(days=i) for i in range(800)}
+    hot, cold, rollups = split(days, TODAY)
+    loaded = []
+
+    def load(month):
+        loaded.append(month)
+        return {day for day in cold if archive.month_start(day) == month}
+
+    assert archive.daily_streaks(TODAY, hot, rollups, load) == (800, 800)
+    # Архив читается по дням только для одного месяца на границе
+    assert len(loaded) == 1
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_daily_streaks_match_brute_force(seed):
+    rng = random.Random(seed)
+    days = {TODAY - timedelta(days=i) for i in range(700) if rng.random() < 0.9}
+    hot, cold, rollups = split(days, TODAY)
+
+    def load(month):
+        return {day for day in cold if archive.month_start(day) == month}
+
+    assert archive.daily_streaks(TODAY, hot, rollups, load) == brute_force(days, TODAY)
+
+
+@pytest.fixture
+def habit_id(db):
+    user = User(email="archive@example.com", username="archive", hashed_password="-")
+    db.add(user)
+    db.flush()
+    habit = Habit(user_id=user.id, title="Привычка")
+    db.add(habit)
+    db.commit()
+    return habit.id
+
+
+def add_completions(db, habit_id, days):
+    db.add_all(HabitCompletion(habit_id=habit_id, completed_at=datetime.combine(day, datetime.min.time())) for day in days)
+    db.commit()
+
+
+def stored_rollups(db, habit_id):
+    return {
+        rollup.month: {
+            "days": rollup.days,
+            "head_run": rollup.head_run,
+            "tail_run": rollup.tail_run,
+            "longest_run": rollup.longest_run,
+        }
+        for rollup in db.query(HabitCompletionRollup).filter(HabitCompletionRollup.habit_id == habit_id)
+    }
+
+
+def test_archive_completions_moves_rows_and_writes_rollups(db, habit_id):
+    cutoff = date(2026, 3, 1)
+    days = [date(2026, 1, 1) + timedelta(days=i) for i in range(90)]
+    add_completions(db, habit_id, days)
+
+    moved, months = archive.archive_completions(db, batch_size=7, cutoff=cutoff)
+
+    old = {day for day in days if day < cutoff}
+    assert moved == len(old)
+    assert months == 2
+    assert db.query(HabitCompletion).count() == len(days) - len(old)
+    assert db.query(HabitCompletionArchive).count() == len(old)
+    assert stored_rollups(db, habit_id) == archive.month_summaries(old)
+
+
+def test_archive_interrupted_between_batches_keeps_rollups(db, habit_id):
+    days = [date(2026, 1, 1) + timedelta(days=i) for i in range(59)]
+    add_completions(db, habit_id, days)
+    add_completions(db, habit_id, [date(2026, 3, 1)])
+
+    def crash(moved):
+        raise RuntimeError("stop")
+
+    with pytest.raises(RuntimeError):
+        archive.archive_completions(db, batch_size=40, cutoff=date(2026, 3, 1), on_batch=crash)
+    db.rollback()
+
+    # Первая пачка зафиксирована вместе с итогами своих месяцев
+    archived = {completed_at.date() for (completed_at,) in db.query(HabitCompletionArchive.completed_at)}
+    assert len(archived) == 40
+    assert stored_rollups(db, habit_id) == archive.month_summaries(archived)
+
+    archive.archive_completions(db, batch_size=40, cutoff=date(2026, 3, 1))
+    assert stored_rollups(db, habit_id) == archive.month_summaries(days)
+
+
+def test_archive_keeps_row_with_highest_id(db, habit_id):
+    days = [date(2026, 1, 1) + timedelta(days=i) for i in range(10)]
+    add_completions(db, habit_id, days)
+    newest = db.query(func.max(HabitCompletion.id)).scalar()
+
+    moved, _ = archive.archive_completions(db, batch_size=3, cutoff=date(2026, 3, 1))
+
+    assert moved == 9
+    assert [completion.id for completion in db.query(HabitCompletion)] == [newest]
+    add_completions(db, habit_id, [date(2026, 3, 2)])
+    assert db.query(func.max(HabitCompletion.id)).scalar() > newest
+
+
+def test_ensure_schema_creates_missing_completed_at_index(engine):
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX ix_habit_completions_completed_at"))
+
+    archive.ensure_schema(engine)
+    archive.ensure_schema(engine)
+
+    names = {index["name"] for index in inspect(engine).get_indexes("habit_completions")}
+    assert "ix_habit_completions_completed_at" in names
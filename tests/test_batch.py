@@ -0,0 +1,42 @@
+from fastapi import FastAPI, Response
+from fastapi.testclient import TestClient
+from app.api import batch
+from app.models.user import User
+
+
+def test_cleanup_rolls_back_uncommitted_and_failed_subrequests(db):
+    batch._track_commits(db)
+    db.add(User(email="kept@example.com", username="kept", hashed_password="-"))
+    db.commit()
+    batch._cleanup(db, 200)
+    assert db.query(User).count() == 1
+
+    db.add(User(email="flushed@example.com", username="flushed", hashed_password="-"))
+    db.flush()
+    batch._cleanup(db, 200)
+    assert db.query(User).count() == 1
+
+    db.query(User).one().username = "changed"
+    batch._cleanup(db, 404)
+    assert db.query(User).one().username == "kept"
+
+
+def test_batch_response_carries_subrequest_cookies():
+    app = FastAPI()
+    app.include_router(batch.router)
+
+    @app.post("/cookie/{value}")
+    def set_cookie(value: str, response: Response):
+        response.set_cookie("pin", value)
+        response.set_cookie("other", "x")
+        return {}
+
+    response = TestClient(app).post("/batch/", json={"requests": [
+        {"method": "POST", "path": "/cookie/1"},
+        {"method": "POST", "path": "/cookie/2"},
+    ]})
+
+    assert response.status_code == 200
+    assert response.cookies["pin"] == "2"
+    assert response.cookies["other"] == "x"
+    assert len(response.headers.get_list("set-cookie")) == 2
@@ -0,0 +1,91 @@
+import pytest
+from sqlalchemy.orm.exc import DetachedInstanceError
+from app.models.note import Note
+from app.models.user import User
+from app.services.cache import MemoryBackend, ResultCache
+
+
+def make_cache(**kwargs) -> ResultCache:
+    return ResultCache(MemoryBackend(max_items=100, max_bytes=1024 * 1024), ttl_seconds=60, **kwargs)
+
+
+@pytest.fixture
+def user_id(db):
+    user = User(email="cache@example.com", username="cache", hashed_password="-")
+    db.add(user)
+    db.flush()
+    db.add(Note(user_id=user.id, title="Заметка", content="текст"))
+    db.commit()
+    return user.id
+
+
+def test_hit_and_miss_return_same_detached_objects(db, user_id):
+    cache = make_cache()
+
+    @cache.cached("note")
+    def titles(db, user_id: int):
+        return db.query(Note).filter(Note.user_id == user_id).all()
+
+    miss = titles(db, user_id)
+    hit = titles(db, user_id)
+    assert cache.misses == 1 and cache.hits == 1
+    for notes in (miss, hit):
+        assert isinstance(notes[0], Note)
+        assert notes[0].title == "Заметка"
+        # Отложенная колонка не загружена функцией - ошибка и при промахе, и при попадании
+        with pytest.raises(DetachedInstanceError):
+            notes[0].content
+
+
+def test_invalidation_changes_key(db, user_id):
+    cache = make_cache()
+    calls = []
+
+    @cache.cached("note")
+    def count(db, user_id: int):
+        calls.append(1)
+        return db.query(Note).filter(Note.user_id == user_id).count()
+
+    count(db, user_id)
+    count(db, user_id)
+    cache.invalidate(user_id, "note")
+    count(db, user_id)
+    assert len(calls) == 2
+
+
+class ReplicaSession:
+    """
+    Сессия, которая читает с реплики
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    def reads_replica(self) -> bool:
+        return True
+
+    def query(self, *args):
+        return self.db.query(*args)
+
+
+def test_replica_read_after_invalidation_is_not_cached(db, user_id):
+    cache = make_cache(replica_lag_seconds=60)
+
+    @cache.cached("note")
+    def count(db, user_id: int):
+        return db.query(Note).filter(Note.user_id == user_id).count()
+
+    replica = ReplicaSession(db)
+    count(replica, user_id)
+    count(replica, user_id)
+    assert cache.hits == 1
+
+    cache.invalidate(user_id, "note")
+    count(replica, user_id)
+    count(replica, user_id)
+    assert cache.hits == 1 and cache.skipped == 2
+
+    # С основной БД результат кешируется сразу
+    count(db, user_id)
+    count(db, user_id)
+    assert cache.hits == 2
@@ -0,0 +1,72 @@
+from datetime import date, datetime, timedelta
+import pytest
+from app.crud import dashboard as crud_dashboard
+from app.crud import habit as crud_habit
+from app.models.habit import Habit, HabitCompletion, HabitFrequency
+from app.models.user import User
+from app.services import archive
+
+
+@pytest.fixture
+def user_id(db):
+    user = User(email="dash@example.com", username="dash", hashed_password="-")
+    db.add(user)
+    db.commit()
+    return user.id
+
+
+def add_habit(db, user_id, **fields) -> int:
+    habit = Habit(user_id=user_id, title=fields.pop("title", "Привычка"), **fields)
+    db.add(habit)
+    db.commit()
+    return habit.id
+
+
+def complete(db, habit_id, days):
+    db.add_all(
+        HabitCompletion(habit_id=habit_id, completed_at=datetime.combine(day, datetime.min.time()) + timedelta(hours=12))
+        for day in days
+    )
+    db.commit()
+
+
+def test_progress_ignores_weekly_habits_done_on_other_days(db, user_id):
+    today = date.today()
+    daily = add_habit(db, user_id)
+    scheduled = add_habit(db, user_id, frequency=HabitFrequency.WEEKLY, weekdays=[today.weekday()])
+    other_day = add_habit(db, user_id, frequency=HabitFrequency.WEEKLY, weekdays=[(today.weekday() + 1) % 7])
+    complete(db, daily, [today])
+    complete(db, scheduled, [today])
+    complete(db, other_day, [today])
+
+    assert crud_dashboard.get_habit_progress(db, user_id, today) == {"done": 2, "total": 2}
+
+
+def test_top_streaks_match_habit_streak_across_archive(db, user_id):
+    today = date.today()
+    habit_id = add_habit(db, user_id, frequency=HabitFrequency.DAILY)
+    complete(db, habit_id, [today - timedelta(days=offset) for offset in range(500)])
+    archive.archive_completions(db, batch_size=100)
+
+    streaks = crud_dashboard.get_top_streaks(db, user_id, today, limit=5)
+
+    assert streaks == [{"habit_id": habit_id, "title": "Привычка", "current_streak": 500}]
+    assert crud_habit.get_habit_streak(db, habit_id, user_id)["current_streak"] == 500
+
+
+def test_top_streaks_read_old_hot_days_only_for_streaks_reaching_boundary(db, user_id):
+    today = date.today()
+    long_running = add_habit(db, user_id, title="Долгая", frequency=HabitFrequency.DAILY)
+    short = add_habit(db, user_id, title="Короткая", frequency=HabitFrequency.DAILY)
+    skipped_today = add_habit(db, user_id, title="Не сегодня", frequency=HabitFrequency.DAILY)
+    # Ещё не перенесено в архив: серия уходит за hot_boundary() в горячей таблице
+    complete(db, long_running, [today - timedelta(days=offset) for offset in range(300)])
+    complete(db, short, [today, today - timedelta(days=1), today - timedelta(days=5)])
+    complete(db, skipped_today, [today - timedelta(days=1)])
+
+    streaks = crud_dashboard.get_top_streaks(db, user_id, today, limit=5)
+
+    assert streaks == [
+        {"habit_id": long_running, "title": "Долгая", "current_streak": 300},
+        {"habit_id": short, "title": "Короткая", "current_streak": 2},
+    ]
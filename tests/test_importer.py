@@ -0,0 +1,99 @@
+import gzip
+import pytest
+from sqlalchemy.orm import sessionmaker
+from app.models.change_log import ChangeLog
+from app.models.task import Task
+from app.models.user import User
+from app.replicas import ReplicaSet, RoutingSession
+from app.services import importer
+from app.services.jobs import JobContext
+from app.sharding import DEFAULT_SHARD, ShardMap
+from conftest import make_sqlite_engine
+
+
+class Runner:
+    def update_job(self, job_id, **values):
+        pass
+
+
+@pytest.fixture
+def factory(monkeypatch):
+    engine = make_sqlite_engine()
+    factory = sessionmaker(
+        class_=RoutingSession,
+        replicas=ReplicaSet([]),
+        shards=ShardMap({DEFAULT_SHARD: engine}, vnodes=8, ttl_seconds=0, max_users=10),
+        autoflush=False,
+        bind=engine
+    )
+    monkeypatch.setattr(importer, "SessionLocal", factory)
+    yield factory
+    engine.dispose()
+
+
+@pytest.fixture
+def user_id(factory):
+    with factory() as db:
+        user = User(email="import@example.com", username="import", hashed_password="-")
+        db.add(user)
+        db.commit()
+        return user.id
+
+
+def run(path, fmt, user_id) -> dict:
+    ctx = JobContext(Runner(), "job", user_id)
+    importer.run_import(ctx, str(path), fmt, user_id, batch_size=2)
+    return ctx.progress
+
+
+def task_titles(factory, user_id) -> list:
+    with factory() as db:
+        return [title for (title,) in db.query(Task.title).filter(Task.user_id == user_id).order_by(Task.id)]
+
+
+def test_ndjson_line_with_broken_encoding_is_skipped(factory, user_id, tmp_path):
+    path = tmp_path / "tasks.ndjson.gz"
+    path.write_bytes(gzip.compress(
+        b'{"type": "task", "title": "one"}\n'
+        b'{"type": "task", "title": "\xff\xfe"}\n'
+        b'{"type": "task", "title": "three"}\n'
+    ))
+
+    progress = run(path, "ndjson", user_id)
+
+    assert task_titles(factory, user_id) == ["one", "three"]
+    assert progress["imported"] == 2
+    assert [error["line"] for error in progress["errors"]] == [2]
+
+
+def test_csv_record_with_broken_encoding_is_skipped(factory, user_id, tmp_path):
+    path = tmp_path / "tasks.csv"
+    path.write_bytes(
+        b'type,title,description\n'
+        b'task,one,\n'
+        b'task,two,"multi\n\xff line"\n'
+        b'task,three,\n'
+    )
+
+    progress = run(path, "csv", user_id)
+
+    assert task_titles(factory, user_id) == ["one", "three"]
+    assert [error["line"] for error in progress["errors"]] == [4]
+
+
+def test_change_log_gets_only_imported_rows(factory, user_id):
+    with factory() as db:
+        ctx = JobContext(Runner(), "job", user_id)
+        tasks = importer._Importer(db, user_id, ctx, batch_size=10)
+        # Запись, созданная параллельно с импортом, в его журнал не попадает
+        concurrent = Task(title="concurrent", user_id=user_id)
+        db.add(concurrent)
+        db.commit()
+
+        tasks.add(1, {"type": "task", "title": "imported"})
+        tasks.flush_all()
+
+        logged = [entity_id for (entity_id,) in db.query(ChangeLog.entity_id).filter(ChangeLog.entity == "task")]
+        imported = db.query(Task.id).filter(Task.title == "imported").scalar()
+        assert logged == [imported]
+        assert concurrent.id not in logged
@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy.orm import sessionmaker
+from app.models.job import Job, JobLease, JobSlot
+from app.replicas import ReplicaSet, RoutingSession
+from app.services import jobs
+from app.sharding import DEFAULT_SHARD, ShardMap
+from conftest import make_sqlite_engine
+
+
+@pytest.fixture
+def factory(monkeypatch):
+    engine = make_sqlite_engine()
+    factory = sessionmaker(
+        class_=RoutingSession,
+        replicas=ReplicaSet([]),
+        shards=ShardMap({DEFAULT_SHARD: engine}, vnodes=8, ttl_seconds=0, max_users=10),
+        autoflush=False,
+        bind=engine
+    )
+    monkeypatch.setattr(jobs, "SessionLocal", factory)
+    yield factory
+    engine.dispose()
+
+
+def make_runner(calls: list) -> jobs.JobRunner:
+    runner = jobs.JobRunner()
+    runner.register("touch")(lambda ctx: calls.append(ctx.job_id))
+    runner.register("single", unique=True)(lambda ctx: calls.append(ctx.job_id))
+    return runner
+
+
+def test_job_is_claimed_by_one_runner_only(factory):
+    calls = []
+    first, second = make_runner(calls), make_runner(calls)
+    with factory(primary_only=True) as db:
+        job = first.submit(db, "touch")
+
+    assert first._claim(job.id)
+    assert not second._claim(job.id)
+    second._execute(job.id, "touch", None, {})
+    assert calls == []
+
+    with factory(primary_only=True) as db:
+        lease = db.get(JobLease, job.id)
+        assert lease.owner == first.owner
+        assert db.get(Job, job.id).status == "running"
+
+
+def test_execute_finishes_job_and_releases_lease_and_slot(factory):
+    calls = []
+    runner = make_runner(calls)
+    with factory(primary_only=True) as db:
+        job = runner.submit(db, "single")
+
+    runner._execute(job.id, "single", None, {})
+    runner._execute(job.id, "single", None, {})
+
+    assert calls == [job.id]
+    with factory(primary_only=True) as db:
+        assert db.get(Job, job.id).status == "completed"
+        assert db.query(JobLease).count() == 0
+        assert db.query(JobSlot).count() == 0
+
+
+def test_recover_fails_only_jobs_with_expired_lease(factory, monkeypatch):
+    calls = []
+    alive, dead = make_runner(calls), make_runner(calls)
+    with factory(primary_only=True) as db:
+        kept, lost, queued = [alive.submit(db, "touch").id for _ in range(3)]
+    assert alive._claim(kept)
+    assert dead._claim(lost)
+    with factory(primary_only=True) as db:
+        db.get(JobLease, lost).heartbeat_at = datetime.utcnow() - timedelta(seconds=120)
+        db.commit()
+    monkeypatch.setattr(jobs.settings, "JOB_LEASE_SECONDS", 60.0)
+
+    restarted = make_runner(calls)
+    assert restarted._recover() == [queued]
+    with factory(primary_only=True) as db:
+        assert db.get(Job, kept).status == "running"
+        assert db.get(Job, lost).status == "failed"
+        assert db.get(JobLease, lost) is None
+
+
+def test_unique_submit_returns_active_job(factory):
+    runner = make_runner([])
+    with factory(primary_only=True) as db:
+        job = runner.submit(db, "single")
+        assert runner.submit(db, "single").id == job.id
+        assert runner.submit(db, "single", user_id=7).id != job.id
+        assert db.query(Job).count() == 2
+
+    runner._finish(job.id, status="completed")
+    with factory(primary_only=True) as db:
+        assert runner.submit(db, "single").id != job.id
@@ -0,0 +1,36 @@
+from app.services.minhash import LSHIndex, compute_signature, is_empty
+
+TEXT = "Сегодня утром была пробежка в парке, потом завтрак и работа над проектом до вечера"
+
+
+def test_notes_without_words_are_not_duplicates():
+    index = LSHIndex()
+    for note_id, text in enumerate(["", "   ", "!!!", "—"]):
+        index.add(note_id, compute_signature(text))
+    assert len(index) == 0
+    assert index.duplicate_groups(0.5) == []
+    assert index.query(compute_signature(""), 0.5) == []
+
+
+def test_empty_signature_detection():
+    assert is_empty(compute_signature("..."))
+    assert not is_empty(compute_signature("привет"))
+
+
+def test_near_duplicates_are_grouped():
+    index = LSHIndex()
+    index.add(1, compute_signature(TEXT))
+    index.add(2, compute_signature(TEXT + " вечера"))
+    index.add(3, compute_signature("Совсем другая заметка про покупки в магазине и список продуктов"))
+    index.add(4, compute_signature(""))
+
+    groups = index.duplicate_groups(0.7)
+    assert [members for members, _ in groups] == [[1, 2]]
+    assert [note_id for note_id, _ in index.query(compute_signature(TEXT), 0.7, exclude=1)] == [2]
+
+
+def test_editing_note_to_empty_removes_it():
+    index = LSHIndex()
+    index.add(1, compute_signature(TEXT))
+    index.add(1, compute_signature(""))
+    assert len(index) == 0
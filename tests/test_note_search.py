@@ -0,0 +1,120 @@
+import json
+import pytest
+from app.api.search import search_content
+from app.config import settings
+from app.crud import note as crud_note
+from app.models import types
+from app.services.compression import migrate_notes
+from app.models.note import Note
+from app.models.note_words import NoteWords
+from app.models.user import User
+from app.schemas.note import NoteCreate, NoteUpdate
+
+LONG = "Однажды в студёную зимнюю пору я из лесу вышел. " * 200
+
+
+@pytest.fixture
+def user_id(db):
+    user = User(email="search@example.com", username="search", hashed_password="-")
+    db.add(user)
+    db.commit()
+    return user.id
+
+
+def add_note(db, user_id, title, content) -> int:
+    return crud_note.create_note(db, NoteCreate(title=title, content=content), user_id=user_id).id
+
+
+def search(db, user_id, q, **params) -> dict:
+    params = {"skip": 0, "limit": 100, "view": "full", "fields": None, "mode": "substring", **params}
+    response = search_content(user_id=user_id, q=q, db=db, **params)
+    return json.loads(response.body)
+
+
+def test_long_content_is_stored_compressed_with_words(db, user_id):
+    note_id = add_note(db, user_id, "Роман", LONG)
+    db.expire_all()
+
+    raw, words = db.query(Note.content_raw, NoteWords.words).join(NoteWords).filter(Note.id == note_id).one()
+    assert types.is_compressed(raw)
+    assert words.split() == sorted(set(LONG.lower().split()))
+    assert db.query(Note.content).filter(Note.id == note_id).scalar() == LONG
+
+    crud_note.update_note(db, note_id, NoteUpdate(content="короткий текст"), user_id)
+    assert db.query(NoteWords).count() == 0
+
+
+def test_note_content_is_decompressed_on_access(db, user_id, monkeypatch):
+    note_id = add_note(db, user_id, "Роман", LONG)
+    db.expire_all()
+    calls = []
+    original = types.decompress_text
+    monkeypatch.setattr("app.models.note.decompress_text", lambda value: calls.append(1) or original(value))
+
+    note = crud_note.get_note(db, note_id, user_id)
+    assert calls == []
+    assert note.content == LONG
+    assert note.content == LONG
+    assert calls == [1]
+
+
+@pytest.mark.parametrize("q, expected", [
+    ("лесу вышел", ["Роман"]),
+    ("ЗИМНЮЮ", ["Роман"]),
+    ("студёную зимой", []),
+    ("коротко", ["Коротко"]),
+])
+def test_search_counts_only_returned_notes(db, user_id, q, expected):
+    add_note(db, user_id, "Роман", LONG)
+    add_note(db, user_id, "Повесть", "Летом в поле. " * 400)
+    add_note(db, user_id, "Коротко", "коротко и ясно")
+
+    result = search(db, user_id, q)
+
+    assert sorted(item["title"] for item in result["results"]) == expected
+    assert result["notes_count"] == result["total_results"] == len(expected)
+    assert [note.title for note in crud_note.search_notes(db, user_id, q)] == expected
+
+
+def test_search_skips_compressed_notes_without_matching_words(db, user_id, monkeypatch):
+    for i in range(5):
+        add_note(db, user_id, f"Повесть {i}", "Летом в поле. " * 400)
+    add_note(db, user_id, "Роман", LONG)
+    calls = []
+    original = types.decompress_text
+    monkeypatch.setattr("app.models.types.decompress_text", lambda value: calls.append(1) or original(value))
+
+    result = search(db, user_id, "зимнюю", view="summary")
+
+    assert [item["title"] for item in result["results"]] == ["Роман"]
+    assert len(calls) == 1
+
+
+def test_short_text_with_marker_is_not_misread(db, user_id, monkeypatch):
+    monkeypatch.setattr(settings, "NOTE_COMPRESSION", False)
+    note_id = add_note(db, user_id, "Метка", types.COMPRESSED_MARK + "zhello")
+    db.expire_all()
+
+    assert crud_note.get_note(db, note_id, user_id).content == types.COMPRESSED_MARK + "zhello"
+    assert search(db, user_id, "hello")["notes_count"] == 1
+
+
+def test_migrate_notes_fills_missing_words(db, user_id):
+    note_id = add_note(db, user_id, "Роман", LONG)
+    db.query(NoteWords).delete()
+    db.commit()
+    assert search(db, user_id, "зимнюю")["notes_count"] == 0
+
+    assert migrate_notes(db) == (1, 1)
+    assert search(db, user_id, "зимнюю")["notes_count"] == 1
+    assert migrate_notes(db) == (1, 0)
+    assert crud_note.get_note(db, note_id, user_id).content == LONG
+
+
+def test_decompress_keeps_text_with_marker_compressed(db, user_id):
+    note_id = add_note(db, user_id, "Метка", types.COMPRESSED_MARK + "zhello")
+    add_note(db, user_id, "Роман", LONG)
+
+    assert migrate_notes(db, decompress=True) == (2, 1)
+    assert crud_note.get_note(db, note_id, user_id).content == types.COMPRESSED_MARK + "zhello"
+    assert search(db, user_id, "hello")["notes_count"] == 1
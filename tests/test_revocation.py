@@ -0,0 +1,124 @@
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import event, insert
+from app.models.revoked_token import RevokedToken
+from app.services.revocation import BloomFilter, TokenRevocationList
+
+
+def add_tokens(db, count: int, start: int = 0, expires_in: timedelta = timedelta(days=30)) -> None:
+    now = datetime.utcnow()
+    db.add_all(
+        RevokedToken(key=f"jti:{i}", user_id=1, revoked_at=now, expires_at=now + expires_in)
+        for i in range(start, start + count)
+    )
+    db.commit()
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    keys = [f"jti:{i}" for i in range(1000)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+
+
+def test_bloom_filter_false_positive_rate_near_target():
+    bloom = BloomFilter(capacity=2000, error_rate=0.01)
+    for i in range(2000):
+        bloom.add(f"jti:{i}")
+    false_positives = sum(f"other:{i}" in bloom for i in range(20000))
+    assert false_positives / 20000 < 0.02
+
+
+def test_bloom_filter_keeps_capacity():
+    assert BloomFilter(capacity=500, error_rate=0.01).capacity == 500
+    assert BloomFilter(capacity=0, error_rate=0.01).capacity == 1
+
+
+def test_rebuild_sizes_filter_to_live_rows(db, session_factory):
+    add_tokens(db, 30)
+    add_tokens(db, 5, start=100, expires_in=timedelta(days=-1))
+    revocations = TokenRevocationList(capacity=10, error_rate=0.01, sync_interval=30, session_factory=session_factory)
+
+    revocations.rebuild(db)
+
+    assert db.query(RevokedToken).count() == 30
+    assert revocations._filter.capacity == 60
+    assert revocations._count == 30
+    assert all(f"jti:{i}" in revocations._filter for i in range(30))
+
+
+def test_sync_adds_new_rows_without_rebuilding(db, session_factory):
+    revocations = TokenRevocationList(capacity=100, error_rate=0.01, sync_interval=30, session_factory=session_factory)
+    revocations.rebuild(db)
+    add_tokens(db, 10)
+
+    revocations.sync(db)
+
+    assert revocations._count == 10
+    assert revocations._rebuild_thread is None
+    assert "jti:9" in revocations._filter
+
+
+def test_overfull_filter_is_rebuilt_once_in_background(db, session_factory):
+    revocations = TokenRevocationList(capacity=10, error_rate=0.01, sync_interval=30, session_factory=session_factory)
+    revocations.rebuild(db)
+    add_tokens(db, 25)
+
+    revocations.sync(db)
+    thread = revocations._rebuild_thread
+    assert thread is not None
+    thread.join(timeout=5)
+
+    assert revocations._filter.capacity == 50
+    assert revocations._count == 25
+    # Живых записей больше исходной ёмкости, но новый фильтр не переполнен:
+    # следующая синхронизация перестройку не запускает
+    revocations.sync(db)
+    assert revocations._rebuild_thread is thread
+
+
+def test_is_revoked_checks_database_only_for_filter_hits(db, engine, session_factory):
+    revocations = TokenRevocationList(capacity=100, error_rate=0.001, sync_interval=30, session_factory=session_factory)
+    revocations.rebuild(db)
+    revocations.revoke(db, "jti:abc", 1, datetime.utcnow() + timedelta(hours=1))
+    revocations.revoke_user(db, 2, timedelta(hours=1))
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    assert not revocations.is_revoked(db, {"jti": "other", "sub": "1"})
+    assert statements == []
+    assert revocations.is_revoked(db, {"jti": "abc", "sub": "1"})
+    assert len(statements) == 1
+    assert revocations.is_revoked(db, {"jti": "x", "sub": "2", "iat": int(time.time()) - 60})
+    assert not revocations.is_revoked(db, {"jti": "y", "sub": "2", "iat": int(time.time()) + 60})
+
+
+def test_user_revocation_compares_iat_in_milliseconds(db, session_factory):
+    revocations = TokenRevocationList(capacity=100, error_rate=0.001, sync_interval=30, session_factory=session_factory)
+    revocations.rebuild(db)
+    revocations.revoke_user(db, 3, timedelta(hours=1))
+    revoked_at = db.query(RevokedToken.revoked_at).filter(RevokedToken.key == "user:3").scalar()
+    revoked_ms = (revoked_at - datetime(1970, 1, 1)) // timedelta(milliseconds=1)
+
+    assert revocations.is_revoked(db, {"sub": "3", "iat": revoked_ms / 1000})
+    assert not revocations.is_revoked(db, {"sub": "3", "iat": (revoked_ms + 1) / 1000})
+    # Старые токены с iat в целых секундах из секунды отзыва остаются отозванными
+    assert revocations.is_revoked(db, {"sub": "3", "iat": revoked_ms // 1000})
+
+
+def test_concurrent_revoke_of_same_key_updates_existing_row(db, session_factory):
+    revocations = TokenRevocationList(capacity=100, error_rate=0.001, sync_interval=30, session_factory=session_factory)
+    expires_at = datetime.utcnow() + timedelta(hours=1)
+
+    def competing_logout(session, flush_context, instances):
+        # Параллельный запрос успел вставить ту же запись
+        session.connection().execute(insert(RevokedToken).values(
+            key="user:4", user_id=4, revoked_at=datetime.utcnow(), expires_at=expires_at
+        ))
+
+    event.listen(db, "before_flush", competing_logout, once=True)
+    revocations.revoke(db, "user:4", 4, expires_at)
+
+    assert db.query(RevokedToken).filter(RevokedToken.key == "user:4").count() == 1
+    assert "user:4" in revocations._filter
@@ -0,0 +1,161 @@
+import asyncio
+from collections import Counter
+import pytest
+from sqlalchemy import func
+from sqlalchemy.orm import sessionmaker
+from app.crud import note as crud_note
+from app.crud import user as crud_user
+from app.models.habit import Habit, HabitCompletion
+from app.models.job import Job
+from app.models.note import Note
+from app.models.note_words import NoteWords
+from app.models.user import User
+from app.models.user_shard import UserShard
+from app.replicas import ReplicaSet, RoutingSession
+from app.schemas.user import UserCreate
+from app.services import jobs, sharding
+from app.sharding import DEFAULT_SHARD, HashRing, ShardMap
+from conftest import make_sqlite_engine
+
+LONG = "Длинный текст заметки для сжатия. " * 200
+
+
+def test_hash_ring_is_stable_and_balanced():
+    ring = HashRing(["a", "b", "c"], vnodes=64)
+    placement = {key: ring.get(key) for key in range(3000)}
+
+    assert placement == {key: HashRing(["c", "a", "b"], vnodes=64).get(key) for key in range(3000)}
+    counts = Counter(placement.values())
+    assert set(counts) == {"a", "b", "c"}
+    assert min(counts.values()) > 3000 / 3 * 0.7
+
+
+def test_hash_ring_moves_only_keys_of_new_shard():
+    before = HashRing(["a", "b"], vnodes=64)
+    after = HashRing(["a", "b", "c"], vnodes=64)
+
+    moved = [key for key in range(3000) if before.get(key) != after.get(key)]
+
+    assert all(after.get(key) == "c" for key in moved)
+    assert 3000 / 3 * 0.7 < len(moved) < 3000 / 3 * 1.3
+
+
+@pytest.fixture
+def shards(monkeypatch):
+    engines = {DEFAULT_SHARD: make_sqlite_engine(), "s1": make_sqlite_engine()}
+    shard_map = ShardMap(engines, vnodes=64, ttl_seconds=0, max_users=100)
+    factory = sessionmaker(
+        class_=RoutingSession,
+        replicas=ReplicaSet([]),
+        shards=shard_map,
+        autoflush=False,
+        bind=engines[DEFAULT_SHARD]
+    )
+    for module in (sharding, crud_user, jobs):
+        monkeypatch.setattr(module, "shard_map", shard_map)
+    monkeypatch.setattr(sharding, "SessionLocal", factory)
+    yield shard_map, factory
+    for engine in engines.values():
+        engine.dispose()
+
+
+def make_user(factory, shard_map, shard: str) -> int:
+    with factory(primary_only=True) as db:
+        db_user = User(email="move@example.com", username="move", hashed_password="-")
+        db.add(db_user)
+        db.flush()
+        db.add(UserShard(user_id=db_user.id, shard=shard))
+        db.commit()
+        db.refresh(db_user)
+        if shard != DEFAULT_SHARD:
+            crud_user.copy_user_row(db_user, shard)
+        user_id = db_user.id
+    with factory(user_id=user_id) as db:
+        habit = Habit(user_id=user_id, title="Привычка")
+        db.add_all([habit, Note(user_id=user_id, title="Короткая", content="текст"),
+                    Note(user_id=user_id, title="Длинная", content=LONG)])
+        db.flush()
+        db.add(HabitCompletion(habit_id=habit.id))
+        db.commit()
+    shard_map.forget(user_id)
+    return user_id
+
+
+def count(factory, shard, model, user_id) -> int:
+    with factory(shard=shard, primary_only=True) as db:
+        return db.query(func.count()).select_from(model).filter(model.user_id == user_id).scalar()
+
+
+def test_migrate_user_moves_data_and_cleans_source(shards):
+    shard_map, factory = shards
+    user_id = make_user(factory, shard_map, "s1")
+
+    moved = sharding.migrate_user(user_id, DEFAULT_SHARD)
+
+    assert moved == {"habit": 1, "note": 2, "task": 0, "mood": 0, "habit_completion": 1}
+    assert shard_map.shard_for(user_id) == DEFAULT_SHARD
+    assert not shard_map.is_moving(user_id)
+    assert count(factory, "s1", Note, user_id) == 0
+    with factory(shard="s1", primary_only=True) as db:
+        assert db.query(NoteWords).count() == 0
+    with factory(user_id=user_id) as db:
+        assert [note.title for note in crud_note.search_notes(db, user_id, "сжатия")] == ["Длинная"]
+    with factory(user_id=user_id) as db:
+        notes = {note.title: note.content for note in db.query(Note).filter(Note.user_id == user_id)}
+    assert notes == {"Короткая": "текст", "Длинная": LONG}
+    # Копия строки users на старом шарде тоже удалена (users - общая таблица,
+    # сессия отправила бы запрос в основную БД)
+    with shard_map.engines["s1"].connect() as conn:
+        assert conn.execute(User.__table__.select()).first() is None
+
+
+def test_migrate_user_refuses_while_jobs_are_unfinished(shards):
+    shard_map, factory = shards
+    user_id = make_user(factory, shard_map, "s1")
+    with factory(primary_only=True) as db:
+        db.add(Job(id="j1", type="import", user_id=user_id, status="pending", params={}, progress={}))
+        db.commit()
+
+    with pytest.raises(ValueError):
+        sharding.migrate_user(user_id, DEFAULT_SHARD)
+
+    assert shard_map.shard_for(user_id) == "s1"
+    assert not shard_map.is_moving(user_id)
+    assert count(factory, "s1", Note, user_id) == 2
+
+
+def test_jobs_of_moving_user_are_deferred(shards, monkeypatch):
+    shard_map, factory = shards
+    user_id = make_user(factory, shard_map, "s1")
+    with factory(primary_only=True) as db:
+        db.get(UserShard, user_id).moving_to = DEFAULT_SHARD
+        db.commit()
+    runner = jobs.JobRunner()
+    calls = []
+    runner.register("touch")(lambda ctx: calls.append(ctx.user_id))
+    monkeypatch.setattr(runner, "update_job", lambda job_id, **values: calls.append(values))
+    monkeypatch.setattr(jobs, "MOVING_RETRY_SECONDS", 0)
+
+    async def run():
+        runner._loop = asyncio.get_running_loop()
+        runner._queue = asyncio.Queue()
+        runner._execute("j1", "touch", user_id, {})
+        return await asyncio.wait_for(runner._queue.get(), timeout=1)
+
+    assert asyncio.run(run()) == "j1"
+    assert calls == []
+
+
+def test_create_user_is_removed_when_shard_copy_fails(shards, monkeypatch):
+    shard_map, factory = shards
+    monkeypatch.setattr(shard_map, "place", lambda user_id: "s1")
+
+    def fail(db_user, shard):
+        raise RuntimeError("shard is down")
+
+    monkeypatch.setattr(crud_user, "copy_user_row", fail)
+    with factory(primary_only=True) as db:
+        with pytest.raises(RuntimeError):
+            crud_user.create_user(db, UserCreate(email="new@example.com", username="newuser", password="secret1"))
+        assert db.query(User).count() == 0
+        assert db.query(UserShard).count() == 0
@@ -0,0 +1,33 @@
+from datetime import datetime
+from app.services.suggest import TitleIndex
+
+ITEMS = [
+    ("note", 1, "Morning run", datetime(2026, 1, 1)),
+    ("task", 2, "Run errands", datetime(2026, 1, 3)),
+    ("habit", 3, "Read a book", datetime(2026, 1, 2)),
+    ("note", 4, "Рунический алфавит", None),
+]
+
+
+def test_build_matches_incremental_adds():
+    built = TitleIndex.build(ITEMS)
+    incremental = TitleIndex()
+    for item in ITEMS:
+        incremental.add(*item)
+    assert built._keys == incremental._keys
+    assert built._entries == incremental._entries
+
+
+def test_search_by_word_prefix_newest_first():
+    index = TitleIndex.build(ITEMS)
+    assert [item["id"] for item in index.search("run", 10)] == [2, 1]
+    assert [item["id"] for item in index.search("ру", 10)] == [4]
+
+
+def test_add_replaces_and_remove_drops_keys():
+    index = TitleIndex.build(ITEMS)
+    index.add("task", 2, "Buy milk", datetime(2026, 1, 4))
+    assert [item["id"] for item in index.search("run", 10)] == [1]
+    index.remove("note", 1)
+    assert index.search("run", 10) == []
+    assert len(index) == 3
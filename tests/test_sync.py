@@ -0,0 +1,139 @@
+import json
+from datetime import datetime, timedelta
+import pytest
+from app.api.sync import sync_changes
+from app.config import settings
+from app.crud import note as crud_note
+from app.crud import task as crud_task
+from app.crud import sync as crud_sync
+from app.models.change_log import ChangeLog
+from app.models.user import User
+from app.schemas.note import NoteCreate
+from app.schemas.task import TaskCreate
+
+
+@pytest.fixture(autouse=True)
+def settled(monkeypatch):
+    # Все записи журнала считаются устоявшимися, если тест не задаст иное
+    monkeypatch.setattr(settings, "SYNC_SETTLE_SECONDS", -60.0)
+
+
+@pytest.fixture
+def user_id(db):
+    user = User(email="sync@example.com", username="sync", hashed_password="-")
+    db.add(user)
+    db.commit()
+    return user.id
+
+
+def call(db, user_id, since=0, limit=500, page_token=None) -> dict:
+    response = sync_changes(user_id=user_id, since=since, limit=limit, page_token=page_token, db=db)
+    return json.loads(response.body)
+
+
+def add_notes(db, user_id, count):
+    return [
+        crud_note.create_note(db, NoteCreate(title=f"Заметка {i}", content="текст"), user_id=user_id).id
+        for i in range(count)
+    ]
+
+
+def test_snapshot_for_user_without_changes_has_nonzero_cursor(db, user_id):
+    first = call(db, user_id)
+    assert first["full"] and not first["has_more"]
+    assert first["cursor"] >= 1
+
+    delta = call(db, user_id, since=first["cursor"])
+    assert not delta["full"]
+    assert delta["cursor"] == first["cursor"]
+
+
+def test_delta_returns_upserts_and_tombstones(db, user_id):
+    cursor = call(db, user_id)["cursor"]
+    note_ids = add_notes(db, user_id, 3)
+    crud_note.delete_note(db, note_ids[0], user_id=user_id)
+
+    delta = call(db, user_id, since=cursor)
+    assert sorted(note["id"] for note in delta["notes"]) == note_ids[1:]
+    assert delta["deleted"] == [{"entity": "note", "id": note_ids[0], "deleted_at": delta["deleted"][0]["deleted_at"]}]
+
+    again = call(db, user_id, since=delta["cursor"])
+    assert again["notes"] == [] and again["deleted"] == []
+    assert again["cursor"] == delta["cursor"]
+
+
+def test_delta_pages_by_limit(db, user_id):
+    cursor = call(db, user_id)["cursor"]
+    note_ids = add_notes(db, user_id, 5)
+
+    seen = []
+    for _ in range(5):
+        page = call(db, user_id, since=cursor, limit=2)
+        seen += [note["id"] for note in page["notes"]]
+        cursor = page["cursor"]
+        if not page["has_more"]:
+            break
+    assert seen == note_ids
+
+
+def test_cursor_does_not_pass_unsettled_changes(db, user_id, monkeypatch):
+    cursor = call(db, user_id)["cursor"]
+    add_notes(db, user_id, 2)
+    entries = db.query(ChangeLog).filter(ChangeLog.user_id == user_id).order_by(ChangeLog.seq).all()
+    # Первая запись устоялась, вторая - нет (её транзакция могла обогнать чужую)
+    entries[0].changed_at = datetime.utcnow() - timedelta(hours=1)
+    db.commit()
+    monkeypatch.setattr(settings, "SYNC_SETTLE_SECONDS", 600.0)
+
+    delta = call(db, user_id, since=cursor)
+    assert len(delta["notes"]) == 2
+    assert delta["cursor"] == entries[0].seq + 1
+
+    # Неустоявшаяся запись приходит повторно
+    repeat = call(db, user_id, since=delta["cursor"])
+    assert [note["id"] for note in repeat["notes"]] == [entries[1].entity_id]
+    assert repeat["cursor"] == delta["cursor"]
+
+
+def test_late_commit_with_lower_seq_is_not_skipped(db, user_id, monkeypatch):
+    monkeypatch.setattr(settings, "SYNC_SETTLE_SECONDS", 600.0)
+    cursor = call(db, user_id)["cursor"]
+    early, late = add_notes(db, user_id, 2)
+    # Транзакция с меньшим seq "ещё не зафиксирована": её записи не видно
+    hidden = db.query(ChangeLog).filter(ChangeLog.entity_id == early).one()
+    hidden_seq = hidden.seq
+    db.delete(hidden)
+    db.commit()
+
+    delta = call(db, user_id, since=cursor)
+    assert [note["id"] for note in delta["notes"]] == [late]
+    assert delta["cursor"] <= hidden_seq
+
+    db.add(ChangeLog(seq=hidden_seq, user_id=user_id, entity="note", entity_id=early, op="upsert"))
+    db.commit()
+    after = call(db, user_id, since=delta["cursor"])
+    assert early in [note["id"] for note in after["notes"]]
+
+
+def test_snapshot_pages_share_one_cursor(db, user_id):
+    note_ids = add_notes(db, user_id, 5)
+    task_ids = [
+        crud_task.create_task(db, TaskCreate(title=f"Задача {i}"), user_id=user_id).id
+        for i in range(3)
+    ]
+
+    page = call(db, user_id, limit=3)
+    cursor = page["cursor"]
+    notes, tasks, pages = [], [], 0
+    while True:
+        pages += 1
+        assert page["full"] and page["cursor"] == cursor
+        notes += [note["id"] for note in page["notes"]]
+        tasks += [task["id"] for task in page["tasks"]]
+        if not page["has_more"]:
+            break
+        page = call(db, user_id, limit=3, page_token=page["page_token"])
+
+    assert notes == note_ids and tasks == task_ids
+    assert pages == 3
+    assert cursor == crud_sync.get_snapshot_cursor(db, user_id)